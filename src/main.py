@@ -1,5 +1,7 @@
 import sys
 import os
+import json
+import argparse
 # --------------------------
 # 关键：将项目根目录加入 Python 搜索路径
 # --------------------------
@@ -15,18 +17,77 @@ log("项目根目录已加入 Python 搜索路径", 1, __file__)
 
 # --------------------------
 # 后续所有模块都能直接绝对导入
+# Receiver（及其依赖的 worker / dashscope）在 run_chat 中才导入，缩短冷启动时间
 # --------------------------
-from src.qwen.receiver import Receiver  
 
-def run_chat():
+def run_chat(profile: str = None, profile_interval: float = None, profile_every: int = None,
+             warmup: bool = None, sink: str = None):
     """
     运行一个简单的命令行聊天循环
+    :param warmup: 是否在接收输入前执行启动预热（默认读取环境变量 WARMUP，默认开启）
+    :param profile: 性能剖析模式（sample / cprofile），默认读取环境变量 ECS_PROFILE，为空则不剖析
+    :param profile_interval: 栈采样间隔（秒）
+    :param profile_every: 每多少轮对话输出一次剖析结果，0 表示会话结束时输出
+    :param sink: 回复输出端配置（console / file:路径 / tcp:主机:端口），默认读取环境变量 RESPONSE_SINK
     """
-    acceptant = Receiver()
+    from src.qwen.receiver import Receiver
+    from src.utils.metrics import metrics
+    from src.utils.profiler import profiler_from_env
+    from src.qwen.model_router import usage_tracker, format_usage
+    from src.qwen.warmup import warm_up, readiness, WARMUP_ENABLED
+    from src.utils.response import create_response_sink
+
+    # 预热完成（服务就绪）后才开始接收用户输入
+    if WARMUP_ENABLED if warmup is None else warmup:
+        warm_up()
+    else:
+        readiness.mark_ready()
+    acceptant = Receiver(sink=create_response_sink(sink) if sink else None)
+    acceptant.profiler = profiler_from_env(acceptant.session_id, profile, profile_interval, profile_every)
     print("聊天机器人已启动。(输入 'exit' 退出)")
-    
-    acceptant.execute()
+
+    if acceptant.profiler is not None:
+        acceptant.profiler.start()
+    try:
+        acceptant.execute()
+    finally:
+        if acceptant.profiler is not None:
+            acceptant.profiler.stop()
+        readiness.reset()
+        acceptant.sink.close()
+    # 退出前记录本次运行的指标（缓存命中率、节省字节数等）
+    log(f"运行指标：{json.dumps(metrics.snapshot(), ensure_ascii=False)}", 3, __file__)
+    usage = usage_tracker.snapshot()
+    if usage:
+        log(f"大模型用量（按函数、模型）：\n{format_usage(usage)}", 3, __file__)
+
+def parse_args(argv=None):
+    """
+    解析命令行参数
+    """
+    parser = argparse.ArgumentParser(description="智能电商客服机器人")
+    parser.add_argument("--bench-startup", action="store_true",
+                        help="测量各模块冷启动导入耗时与初始化耗时后退出")
+    parser.add_argument("--bench-repeat", type=int, default=5,
+                        help="--bench-startup 每项的重复测量次数（默认5次，取中位数）")
+    parser.add_argument("--profile", choices=["sample", "cprofile"],
+                        help="开启性能剖析（也可用环境变量 ECS_PROFILE），结果写入 logs/profile")
+    parser.add_argument("--profile-interval", type=float,
+                        help="sample 模式的采样间隔（秒），默认 0.02")
+    parser.add_argument("--profile-every", type=int,
+                        help="每多少轮对话输出一次剖析结果，默认会话结束时输出")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="跳过启动预热（也可用环境变量 WARMUP=0）")
+    parser.add_argument("--sink",
+                        help="回复输出端：console / file:路径 / tcp:主机:端口（也可用环境变量 RESPONSE_SINK）")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    # 运行
-    run_chat()
\ No newline at end of file
+    args = parse_args()
+    if args.bench_startup:
+        from src.utils.startup import bench_startup, print_startup_report
+        print_startup_report(bench_startup(repeat=args.bench_repeat))
+    else:
+        # 运行
+        run_chat(args.profile, args.profile_interval, args.profile_every, warmup=False if args.no_warmup else None,
+                 sink=args.sink)
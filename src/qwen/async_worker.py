@@ -0,0 +1,324 @@
+import os
+import json
+import time
+from pathlib import Path
+from typing import Optional, Callable
+from src.utils.log import log
+from src.utils.lazy import LazyImport
+from src.utils.config import load_config_async, config_digest, CONFIG_DIR
+from src.utils.semantic_cache import get_semantic_cache
+from src.utils.singleflight import AsyncSingleFlight
+from src.utils.admission import record_llm_latency
+from src.qwen.model_router import get_default_router
+from src.qwen.prompt_codec import encode_intents
+from src.qwen import worker
+
+# worker.py 中各函数的协程版本：大模型调用走 dashscope 的 AioGeneration（aiohttp，非阻塞），
+# 配置文件读取未命中缓存时放到线程池执行，参数、返回值和异常语义与同步版本一致。
+# 提示词、响应解析、缓存（推荐缓存、语义缓存、配置缓存）与同步版本共用。
+AioGeneration = LazyImport("dashscope", "AioGeneration")
+
+_intent_flight = AsyncSingleFlight("recognize_intent_async")
+_recommendation_flight = AsyncSingleFlight("product_recommendation_async")
+
+async def _call_llm_async(function: str, validate: Optional[Callable[[str], bool]] = None, **kwargs):
+    """
+    worker._call_llm 的协程版本：模型路由、失败 / 输出不合格时升级、用量记账与延迟上报均相同
+    """
+    messages = kwargs.get("messages") or []
+    router = get_default_router()
+    models = router.candidates(function, messages, routes=await router.routes_async())
+    if not models:
+        raise ValueError(f"{function} 没有可用的模型")
+    for index, model in enumerate(models):
+        last = index == len(models) - 1
+        response = None
+        start = time.perf_counter()
+        try:
+            response = await AioGeneration.call(model=model, **kwargs)
+        except Exception as e:
+            if last:
+                raise
+            log(f"{function} 调用 {model} 失败，升级到 {models[index + 1]}：{str(e)}", 2, __file__)
+            continue
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            record_llm_latency(latency_ms)
+            ok = worker._response_ok(response, validate)
+            worker._record_usage(function, model, messages, response, latency_ms, ok, escalated=not ok and not last)
+        if ok or last:
+            return response
+        log(f"{function} 使用 {model} 的输出不合格，升级到 {models[index + 1]}", 2, __file__)
+
+async def aclose():
+    """
+    关闭当前事件循环上 dashscope 共享的 aiohttp 会话（宿主程序退出前调用，避免 "Unclosed client session" 警告）
+    """
+    try:
+        from dashscope.api_entities.aio_session import close_shared_aio_session
+    except ImportError:
+        # 旧版本 dashscope 每次调用自行创建并关闭会话
+        return
+    await close_shared_aio_session()
+
+def _api_key() -> Optional[str]:
+    api_key = os.getenv("DASHSCOPE_API_KEY")
+    if not api_key or not api_key.strip():
+        log("环境变量DASHSCOPE_API_KEY未设置或为空", 1, __file__)
+        return None
+    return api_key
+
+async def recognize_intent_async(user_input: str, intent_dict: dict, context: Optional[str] = None,
+                                 previous_intent: Optional[str] = None) -> Optional[str]:
+    """
+    worker.recognize_intent 的协程版本
+    """
+    if not isinstance(user_input, str) or not user_input.strip():
+        log("用户输入为空或非字符串类型", 2, __file__)
+        return None
+    if not isinstance(intent_dict, dict) or not intent_dict:
+        log("意图字典为空或非字典类型", 2, __file__)
+        return None
+
+    try:
+        intent_json_str = encode_intents(intent_dict)
+    except (TypeError, ValueError) as e:
+        log(f"意图字典JSON序列化失败：{str(e)}，字典内容：{intent_dict}", 1, __file__)
+        return None
+
+    semantic_cache = get_semantic_cache("recognize_intent")
+    cache_scope = worker._intent_cache_scope(intent_json_str, previous_intent)
+    if semantic_cache is not None:
+        hit = semantic_cache.lookup(user_input, scope=cache_scope)
+        if hit is not None and hit[0] in intent_dict:
+            log(f"意图识别命中语义缓存（相似度{hit[1]}）：{hit[0]}", 3, __file__)
+            return hit[0]
+
+    async def call():
+        api_key = _api_key()
+        if api_key is None:
+            return None
+        response = await _call_llm_async(
+            "recognize_intent",
+            validate=lambda content: content in intent_dict,
+            api_key=api_key,
+            messages=worker._intent_messages(user_input, intent_json_str, context),
+            result_format="message",
+        )
+        detected_intent = worker._intent_from_response(response, intent_dict)
+        if detected_intent is None:
+            return "DEFAULT"
+        if semantic_cache is not None:
+            semantic_cache.add(user_input, detected_intent, scope=cache_scope)
+        return detected_intent
+
+    return await _intent_flight.do((user_input.strip(), cache_scope), call)
+
+async def recognize_intent_with_slots_async(user_input: str, intent_dict: dict) -> Optional[dict]:
+    """
+    worker.recognize_intent_with_slots 的协程版本
+    """
+    if not isinstance(user_input, str) or not user_input.strip():
+        log("用户输入为空或非字符串类型", 2, __file__)
+        return None
+    if not isinstance(intent_dict, dict) or not intent_dict:
+        log("意图字典为空或非字典类型", 2, __file__)
+        return None
+    api_key = _api_key()
+    if api_key is None:
+        return None
+
+    response = await _call_llm_async(
+        "recognize_intent_with_slots",
+        validate=lambda content: worker._parse_json_reply(content) is not None,
+        api_key=api_key,
+        messages=worker._intent_slots_messages(user_input, intent_dict),
+        result_format="message",
+    )
+    return worker._slots_from_response(response, intent_dict)
+
+async def pharse_phone_number_async(user_input: str) -> Optional[str]:
+    """
+    worker.pharse_phone_number 的协程版本
+    """
+    if not isinstance(user_input, str) or not user_input.strip():
+        log("用户输入为空或非字符串类型", 2, __file__)
+        return None
+    api_key = _api_key()
+    if api_key is None:
+        return None
+
+    response = await _call_llm_async(
+        "pharse_phone_number",
+        validate=worker._is_phone_reply,
+        api_key=api_key,
+        messages=worker._phone_messages(user_input),
+        result_format="message",
+    )
+    phone_number = response.output.choices[0].message.content.strip()
+    return phone_number or None
+
+async def get_order_info_async(phone_number: str) -> Optional[dict]:
+    """
+    worker.get_order_info 的协程版本
+    """
+    phone_number = phone_number.strip()
+    if not phone_number.isdigit() or len(phone_number) != 11:
+        log("手机号码格式不正确", 2, __file__)
+        return None
+
+    if worker._use_shared_index("orders"):
+        order = worker._shared_lookup("orders", phone_number)
+        if order is None:
+            log(f"未查询到手机号 {phone_number} 对应的订单", 2, __file__)
+        return order
+
+    order_file_path = os.path.join(CONFIG_DIR, "user_orders.json")
+    if not os.path.exists(order_file_path):
+        log(f"订单配置文件不存在 - {order_file_path}", 1, __file__)
+        return None
+
+    try:
+        order_data = await load_config_async(order_file_path)
+        if phone_number in order_data:
+            return order_data[phone_number].copy()
+        log(f"未查询到手机号 {phone_number} 对应的订单", 2, __file__)
+        return None
+    except json.JSONDecodeError as e:
+        log(f"订单配置文件格式无效 - {str(e)}", 1, __file__)
+        return None
+    except PermissionError:
+        log(f"无权限访问订单配置文件 - {order_file_path}", 1, __file__)
+        return None
+    except Exception as e:
+        log(f"获取订单信息失败：{str(e)}", 1, __file__)
+        return None
+
+async def query_details_async(complaint: str) -> Optional[str]:
+    """
+    worker.query_details 的协程版本
+    """
+    complaint = complaint.strip()
+    if not complaint:
+        log("投诉内容为空", 2, __file__)
+        return None
+
+    api_key = _api_key()
+    if api_key is None:
+        return None
+
+    response = await _call_llm_async(
+        "query_details",
+        validate=bool,
+        api_key=api_key,
+        messages=worker._complaint_messages(complaint),
+        result_format="message",
+    )
+    complaint_summary = response.output.choices[0].message.content.strip()
+    if complaint_summary == "":
+        return None
+    return complaint_summary
+
+async def product_recommendation_async(preferences: str, context: Optional[str] = None) -> Optional[str]:
+    """
+    worker.product_recommendation 的协程版本（与同步版本共用推荐结果缓存）
+    """
+    if not preferences:
+        log("用户偏好描述为空", 2, __file__)
+        return None
+
+    if worker._use_shared_index("products"):
+        product_list, catalog_version = worker._shared_catalog()
+    else:
+        product_list, catalog_version = await _load_catalog_async()
+    if product_list is None or not worker._check_product_list(product_list):
+        return None
+
+    answer, product_list = worker._structured_recommendation(preferences, product_list, catalog_version)
+    if answer is not None:
+        return answer
+
+    cache_key = worker._recommendation_cache_key(preferences, catalog_version, context)
+    recommendation = worker._cached_recommendation(cache_key)
+    if recommendation is not None:
+        return recommendation
+
+    async def call():
+        api_key = _api_key()
+        if api_key is None:
+            return None
+        messages = worker._recommendation_messages(preferences, context, product_list)
+        try:
+            response = await _call_llm_async("product_recommendation", validate=bool, api_key=api_key,
+                                             messages=messages, **worker.RECOMMENDATION_PARAMS)
+            return worker._recommendation_from_response(response, messages, cache_key)
+        except Exception as e:
+            log(f"产品推荐过程中发生未知错误：{str(e)}", 2, __file__)
+            return None
+
+    flight_key = (worker._normalize_preferences(preferences), catalog_version, context or "")
+    return await _recommendation_flight.do(flight_key, call)
+
+async def _load_catalog_async() -> tuple:
+    """
+    worker._load_catalog 的协程版本
+    """
+    products_json_path = os.path.join(CONFIG_DIR, "products.json")
+    try:
+        if not os.path.exists(products_json_path):
+            log(f"产品配置文件不存在：{products_json_path}", 2, __file__)
+            return None, None
+        try:
+            product_list = await load_config_async(products_json_path)
+        except json.JSONDecodeError as e:
+            log(f"products.json解析失败：{str(e)}", 2, __file__)
+            return None, None
+    except Exception as e:
+        log(f"读取产品文件时发生错误：{str(e)}", 2, __file__)
+        return None, None
+    return product_list, config_digest(products_json_path)
+
+async def summarize_conversation_async(summary: str, turns: list) -> Optional[str]:
+    """
+    worker.summarize_conversation 的协程版本
+    """
+    if not turns:
+        return summary or None
+    api_key = _api_key()
+    if api_key is None:
+        return None
+
+    response = await _call_llm_async(
+        "summarize_conversation",
+        validate=lambda content: 0 < len(content) <= worker.SUMMARY_MAX_CHARS,
+        api_key=api_key,
+        messages=worker._summary_messages(summary, turns),
+        result_format="message",
+    )
+    new_summary = response.output.choices[0].message.content.strip()
+    return new_summary or None
+
+async def get_membership_info_async(phone_number: str) -> Optional[dict]:
+    """
+    worker.get_membership_info 的协程版本
+    """
+    if worker._use_shared_index("members"):
+        return worker._shared_lookup("members", phone_number.strip())
+
+    json_file_path = Path(CONFIG_DIR) / "userMemberList.json"
+    if not json_file_path.exists():
+        log(f"警告：会员信息文件不存在 - {json_file_path}", 1, __file__)
+        return None
+
+    try:
+        data = await load_config_async(json_file_path)
+        return worker._find_member(data, phone_number)
+    except json.JSONDecodeError as e:
+        log(f"错误：JSON文件解析失败 - {e}", 2, __file__)
+        return None
+    except PermissionError:
+        log(f"错误：没有读取文件的权限 - {json_file_path}", 2, __file__)
+        return None
+    except Exception as e:
+        log(f"错误：获取会员信息时发生异常 - {str(e)}", 2, __file__)
+        return None
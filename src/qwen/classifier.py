@@ -0,0 +1,274 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from itertools import islice
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator
+from src.utils.log import log
+from src.utils.lazy import LazyImport
+from src.utils.config import load_config, CONFIG_DIR
+from src.utils.semantic_cache import HashedNgramVectorizer
+
+# numpy 仅在批量分类时使用，延迟导入
+np = LazyImport("numpy")
+yaml = LazyImport("yaml")
+
+# 默认参数
+DEFAULT_DIM = 1024             # 哈希特征维度（批量矩阵运算用稠密矩阵，维度不宜过大）
+DEFAULT_CHUNK_SIZE = 2000      # 每批处理的文本条数，决定峰值内存
+DEFAULT_THRESHOLD = 0.55       # 本地分类置信度（与最相似样例的余弦相似度）低于该值时交给大模型
+DEFAULT_MIN_MARGIN = 0.1       # 第一名与第二名的差距低于该值时也视为低置信
+DEFAULT_CONCURRENCY = 4        # 大模型兜底调用的最大并发数
+MAX_LEARNED_EXAMPLES = 5000    # 大模型结果回填为本地样例的上限
+
+# 意图描述中引号里的内容视为样例，如：用户发起问候（如"你好"、"嗨"）
+_EXAMPLE_PATTERN = re.compile(r"[\"“]([^\"”]+)[\"”]")
+
+
+def load_intent_descriptions(intents_path: str = None) -> dict:
+    """
+    读取意图配置，返回 {意图标签: 描述}（与 Receiver._extract_intents_for_nlp 的结果一致）
+    """
+    intents_path = intents_path or os.path.join(CONFIG_DIR, "intents.yaml")
+    intents = load_config(intents_path, loader=yaml.safe_load) or {}
+    return {key: value["description"] for key, value in intents.items()
+            if isinstance(value, dict) and "description" in value}
+
+
+class LocalIntentClassifier:
+    """
+    本地意图分类器：把每个意图的样例句向量化为原型矩阵，
+    批量分类时用一次矩阵乘法算出所有文本与所有样例的相似度，再按意图取最大值
+    """
+
+    def __init__(self, intent_dict: dict, examples: dict = None, dim: int = DEFAULT_DIM):
+        """
+        :param intent_dict: {意图标签: 描述}，描述中引号内的文字作为样例
+        :param examples: 额外的标注样例 {意图标签: [文本, ...]}
+        :param dim: 哈希特征维度
+        """
+        self.intent_dict = intent_dict
+        self.vectorizer = HashedNgramVectorizer(dim=dim)
+        self.labels = list(intent_dict.keys())
+        self._examples = {label: [] for label in self.labels}
+        for label, description in intent_dict.items():
+            self._examples[label].extend(_EXAMPLE_PATTERN.findall(description))
+        for label, texts in (examples or {}).items():
+            if label in self._examples:
+                self._examples[label].extend(texts)
+        self._learned = 0
+        self._lock = threading.Lock()
+        # 每个意图的样例向量只计算一次，追加样例时只向量化新增部分
+        self._vectors = {label: self.vectorize(self._clean(texts)) for label, texts in self._examples.items()}
+        self._build()
+
+    @staticmethod
+    def _clean(texts: list) -> list:
+        return [text for text in texts if text.strip()]
+
+    def _build(self):
+        """
+        构建原型矩阵：行按意图分组排列，记录每个意图的起始行，用于 reduceat 按组取最大值
+        """
+        blocks, label_index, offsets, total = [], [], [], 0
+        for i, label in enumerate(self.labels):
+            block = self._vectors[label]
+            if not len(block):
+                continue
+            offsets.append(total)
+            label_index.append(i)
+            blocks.append(block)
+            total += len(block)
+        if blocks:
+            self._prototypes = np.vstack(blocks)
+        else:
+            self._prototypes = np.zeros((0, self.vectorizer.dim), dtype=np.float32)
+        self._label_index = np.array(label_index, dtype=np.int64)
+        self._offsets = np.array(offsets, dtype=np.int64)
+
+    def vectorize(self, texts: list):
+        """
+        把一批文本转为行归一化的稠密矩阵 (len(texts), dim)
+        """
+        matrix = np.zeros((len(texts), self.vectorizer.dim), dtype=np.float32)
+        row_ids, col_ids, values = [], [], []
+        for row, text in enumerate(texts):
+            for col, value in self.vectorizer.transform(text).items():
+                row_ids.append(row)
+                col_ids.append(col)
+                values.append(value)
+        if values:
+            np.add.at(matrix, (np.array(row_ids), np.array(col_ids)), np.array(values, dtype=np.float32))
+        return matrix
+
+    def learn(self, pairs: list):
+        """
+        追加标注样例（例如大模型的兜底结果），累计超过上限后不再追加
+        :param pairs: [(文本, 意图标签), ...]
+        """
+        added = {}
+        with self._lock:
+            for text, label in pairs:
+                if label not in self._examples or not text.strip() or self._learned >= MAX_LEARNED_EXAMPLES:
+                    continue
+                self._examples[label].append(text)
+                added.setdefault(label, []).append(text)
+                self._learned += 1
+            if not added:
+                return
+            for label, texts in added.items():
+                self._vectors[label] = np.vstack([self._vectors[label], self.vectorize(texts)])
+            self._build()
+
+    def predict(self, texts: list):
+        """
+        批量预测
+        :return: (意图标签数组, 置信度数组, 第一名与第二名的差距数组)
+        """
+        if not len(self._offsets):
+            size = len(texts)
+            return np.array(["DEFAULT"] * size, dtype=object), np.zeros(size), np.zeros(size)
+        matrix = self.vectorize(texts)
+        with self._lock:
+            prototypes, offsets, label_index = self._prototypes, self._offsets, self._label_index
+        similarity = matrix @ prototypes.T                            # (文本数, 样例数)
+        per_label = np.maximum.reduceat(similarity, offsets, axis=1)   # (文本数, 有样例的意图数)
+        order = np.argsort(per_label, axis=1)
+        best = order[:, -1]
+        rows = np.arange(len(texts))
+        confidence = per_label[rows, best]
+        if per_label.shape[1] > 1:
+            margin = confidence - per_label[rows, order[:, -2]]
+        else:
+            margin = confidence.copy()
+        labels = np.array(self.labels, dtype=object)[label_index[best]]
+        return labels, confidence, margin
+
+
+def classify_batch(texts: Iterable[str], intent_dict: dict = None, classifier: LocalIntentClassifier = None,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE, threshold: float = DEFAULT_THRESHOLD,
+                   min_margin: float = DEFAULT_MIN_MARGIN, llm_fallback: bool = True,
+                   max_concurrency: int = DEFAULT_CONCURRENCY, learn: bool = True) -> Iterator[dict]:
+    """
+    批量意图分类（流式）：按块读取输入、按块输出结果，内存占用与总条数无关
+    - 每块先用本地分类器做一次矩阵运算
+    - 低置信的行（同一块内相同文本只调用一次）以有限并发交给 worker.recognize_intent 兜底
+    :param texts: 任意可迭代的文本序列（列表、文件行迭代器等）
+    :param intent_dict: {意图标签: 描述}，默认读取 config/intents.yaml
+    :param classifier: 复用的本地分类器，默认按 intent_dict 新建
+    :param chunk_size: 每块条数
+    :param threshold: 本地置信度阈值
+    :param min_margin: 第一名与第二名的最小差距
+    :param llm_fallback: 是否对低置信行调用大模型
+    :param max_concurrency: 大模型兜底的最大并发数
+    :param learn: 是否把大模型结果回填为本地样例（后续相似文本可直接本地命中）
+    :return: 逐条产出 {"text", "intent", "confidence", "source"}，顺序与输入一致
+             source 取值：local / llm / local_low_confidence（低置信且未能得到大模型结果）
+    """
+    intent_dict = intent_dict or load_intent_descriptions()
+    classifier = classifier or LocalIntentClassifier(intent_dict)
+    iterator = iter(texts)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_concurrency)) if llm_fallback else None
+
+    def ask_llm(text):
+        from src.qwen import worker
+        try:
+            return worker.recognize_intent(text, intent_dict)
+        except Exception as e:
+            log(f"批量分类大模型兜底失败：{str(e)}", 2, __file__)
+            return None
+
+    try:
+        while True:
+            chunk = [text if isinstance(text, str) else str(text) for text in islice(iterator, chunk_size)]
+            if not chunk:
+                break
+            labels, confidence, margin = classifier.predict(chunk)
+            low = (confidence < threshold) | (margin < min_margin)
+
+            llm_results = {}
+            if executor is not None and low.any():
+                pending = {text for text, is_low in zip(chunk, low) if is_low and text.strip()}
+                futures = {text: executor.submit(ask_llm, text) for text in pending}
+                llm_results = {text: future.result() for text, future in futures.items()}
+                if learn:
+                    classifier.learn([(text, label) for text, label in llm_results.items()
+                                      if label and label != "DEFAULT"])
+
+            for i, text in enumerate(chunk):
+                record = {"text": text, "intent": labels[i], "confidence": round(float(confidence[i]), 4)}
+                if not low[i]:
+                    record["source"] = "local"
+                elif llm_results.get(text):
+                    record["intent"] = llm_results[text]
+                    record["source"] = "llm"
+                else:
+                    record["source"] = "local_low_confidence"
+                yield record
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def _read_texts(stream, text_field: str) -> Iterator[str]:
+    """
+    逐行读取输入：JSON 行取 text_field 字段，其余行按纯文本处理，空行跳过
+    """
+    for line in stream:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        if line.lstrip().startswith("{"):
+            try:
+                yield str(json.loads(line).get(text_field, ""))
+                continue
+            except (json.JSONDecodeError, AttributeError):
+                pass
+        yield line
+
+
+def main(argv=None):
+    """
+    命令行入口：python -m src.qwen.classifier --input history.txt --output result.jsonl
+    """
+    parser = argparse.ArgumentParser(description="批量意图分类（本地向量化分类 + 低置信行大模型兜底）")
+    parser.add_argument("--input", default="-", help="输入文件（每行一条文本或一个JSON对象），默认标准输入")
+    parser.add_argument("--output", default="-", help="输出 JSONL 文件，默认标准输出")
+    parser.add_argument("--text-field", default="text", help="输入为 JSON 行时的文本字段名")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--no-llm", action="store_true", help="只使用本地分类器，不调用大模型")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == "-" else open(args.input, "r", encoding="utf-8")
+    sink = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    stats = Counter()
+    start = time.perf_counter()
+    try:
+        for record in classify_batch(_read_texts(source, args.text_field), chunk_size=args.chunk_size,
+                                     threshold=args.threshold, llm_fallback=not args.no_llm,
+                                     max_concurrency=args.concurrency):
+            sink.write(json.dumps(record, ensure_ascii=False) + "\n")
+            stats[record["source"]] += 1
+            stats["total"] += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+    elapsed = time.perf_counter() - start
+    summary = ", ".join(f"{key}={value}" for key, value in sorted(stats.items()))
+    rate = stats["total"] / elapsed if elapsed > 0 else 0.0
+    print(f"分类完成：{summary}，耗时 {elapsed:.2f}s（{rate:.0f} 条/秒）", file=sys.stderr)
+    log(f"批量意图分类完成：{summary}，耗时 {elapsed:.2f}s", 3, __file__)
+
+
+if __name__ == "__main__":
+    main()
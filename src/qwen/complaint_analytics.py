@@ -0,0 +1,317 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from src.utils.log import log
+from src.utils.config import CONFIG_DIR
+
+try:
+    import fcntl  # 仅类 Unix 系统可用，用于多进程合并写快照时加锁
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# 投诉原始记录与统计快照文件
+COMPLAINT_FILE = os.path.join(CONFIG_DIR, "complain_summary.json")
+SNAPSHOT_FILE = os.path.join(CONFIG_DIR, "complaint_stats.json")
+
+# 投诉分类规则：按顺序匹配关键词，第一个命中的类别生效
+CATEGORY_RULES = [
+    ("物流配送", ["快递", "物流", "配送", "发货", "送货", "派送", "包裹", "签收"]),
+    ("商品质量", ["质量", "破损", "损坏", "坏了", "瑕疵", "假货", "故障", "不能用"]),
+    ("退款售后", ["退款", "退货", "换货", "售后", "退钱", "维修"]),
+    ("服务态度", ["客服", "态度", "服务", "回复"]),
+    ("价格优惠", ["价格", "优惠", "太贵", "降价", "优惠券", "差价"]),
+]
+DEFAULT_CATEGORY = "其他"
+
+# 时间窗口粒度：格式化方式与保留的窗口个数
+WINDOW_SPECS = {
+    "hour": ("%Y-%m-%d %H", 24 * 7),
+    "day": ("%Y-%m-%d", 90),
+}
+
+TOP_K = 20                 # 对外提供的热词个数
+TERM_CAPACITY = TOP_K * 10  # 热词计数器容量（Space-Saving 算法，内存固定）
+# 统计热词时跳过的字（语气词、虚词等）
+_SKIP_CHARS = set("的了是在和与及或也就都而且被把对为用户有无没不很太过于其他这那个我你您们吗呢吧啊。，、；：！？,.;:!?（）() ")
+
+
+def classify_complaint(text: str) -> str:
+    """
+    按关键词规则给投诉归类
+    """
+    for category, keywords in CATEGORY_RULES:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return DEFAULT_CATEGORY
+
+
+def extract_terms(text: str) -> list:
+    """
+    抽取热词候选：相邻两个有效汉字/字母组成的二元组（无需分词器）
+    """
+    chars = [ch for ch in text if ch not in _SKIP_CHARS and not ch.isdigit()]
+    return list({a + b for a, b in zip(chars, chars[1:])})
+
+
+class ComplaintAnalytics:
+    """
+    投诉增量统计：每条投诉到达时更新计数，查询只读取已聚合的结果，不再扫描历史投诉
+    - 累计计数：按类别
+    - 时间窗口计数：按小时 / 按天，每个粒度只保留最近若干个窗口
+    - 热词：Space-Saving 算法维护固定容量的计数器，近似 top-k
+    - 状态以紧凑 JSON 快照持久化（先写临时文件再原子替换）；
+      多个进程共用一个快照：写入时加文件锁，读取磁盘上的最新快照并合并本进程上次写入后新增的投诉，不覆盖其他进程的计数
+    """
+
+    def __init__(self, snapshot_path: str = SNAPSHOT_FILE, autosave: bool = True):
+        self.snapshot_path = snapshot_path
+        self.autosave = autosave
+        self._lock = threading.Lock()
+        self._pending = []  # 上次写快照之后新增、尚未合并到快照的投诉
+        self._reset()
+
+    def _reset(self):
+        self.total = 0
+        self.by_category = {}
+        self.windows = {name: OrderedDict() for name in WINDOW_SPECS}
+        self.terms = {}
+        self.last_timestamp = None
+        self._top_cache = None
+
+    # --------------------------
+    # 更新
+    # --------------------------
+    def record(self, complaint_data: dict):
+        """
+        记录一条投诉（字段同 complain_summary.json：timestamp / original_complaint / summary）
+        """
+        with self._lock:
+            self._apply(complaint_data)
+            self._pending.append(complaint_data)
+            if self.autosave:
+                self._save_locked()
+
+    def _apply(self, complaint_data: dict):
+        text = complaint_data.get("summary") or complaint_data.get("original_complaint") or ""
+        category = classify_complaint(text + " " + complaint_data.get("original_complaint", ""))
+        try:
+            moment = datetime.strptime(complaint_data.get("timestamp", ""), "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            moment = datetime.now()
+
+        self.total += 1
+        self.by_category[category] = self.by_category.get(category, 0) + 1
+        for name, (fmt, keep) in WINDOW_SPECS.items():
+            windows = self.windows[name]
+            key = moment.strftime(fmt)
+            counters = windows.get(key)
+            if counters is None:
+                latest = next(reversed(windows), None)
+                counters = windows[key] = {}
+                # 新窗口一般是最新的；历史数据乱序时重新排序
+                if latest is not None and latest > key:
+                    self.windows[name] = windows = OrderedDict(sorted(windows.items()))
+                while len(windows) > keep:
+                    windows.popitem(last=False)
+            counters[category] = counters.get(category, 0) + 1
+            counters["_total"] = counters.get("_total", 0) + 1
+        for term in extract_terms(text):
+            self._count_term(term)
+        self._top_cache = None
+        stamp = moment.strftime("%Y-%m-%d %H:%M:%S")
+        if self.last_timestamp is None or stamp > self.last_timestamp:
+            self.last_timestamp = stamp
+
+    def _count_term(self, term: str):
+        """
+        Space-Saving：计数器满时替换计数最小的词，新词继承其计数（保证高频词不会被漏掉）
+        """
+        if term in self.terms:
+            self.terms[term] += 1
+        elif len(self.terms) < TERM_CAPACITY:
+            self.terms[term] = 1
+        else:
+            smallest = min(self.terms, key=self.terms.get)
+            self.terms[term] = self.terms.pop(smallest) + 1
+
+    # --------------------------
+    # 查询（只读取聚合结果，代价与历史投诉数量无关）
+    # --------------------------
+    def top_terms(self, k: int = TOP_K) -> list:
+        with self._lock:
+            if self._top_cache is None:
+                self._top_cache = sorted(self.terms.items(), key=lambda item: (-item[1], item[0]))[:TOP_K]
+            return self._top_cache[:k]
+
+    def window_counts(self, granularity: str = "hour", last: int = 24) -> list:
+        """
+        :return: 最近 last 个窗口 [{"window": ..., "total": ..., "by_category": {...}}, ...]
+        """
+        with self._lock:
+            windows = list(self.windows[granularity].items())[-last:]
+        return [{"window": key, "total": counters.get("_total", 0),
+                 "by_category": {k: v for k, v in counters.items() if k != "_total"}}
+                for key, counters in windows]
+
+    def summary(self, top: int = 10) -> dict:
+        with self._lock:
+            result = {
+                "total": self.total,
+                "by_category": dict(sorted(self.by_category.items(), key=lambda item: -item[1])),
+                "last_timestamp": self.last_timestamp,
+            }
+        result["top_terms"] = self.top_terms(top)
+        return result
+
+    # --------------------------
+    # 持久化
+    # --------------------------
+    def to_dict(self) -> dict:
+        return {
+            "version": 1,
+            "total": self.total,
+            "by_category": self.by_category,
+            "windows": {name: list(windows.items()) for name, windows in self.windows.items()},
+            "terms": self.terms,
+            "last_timestamp": self.last_timestamp,
+        }
+
+    def _save_locked(self, merge: bool = True):
+        """
+        :param merge: True 时以磁盘上的最新快照为基础，重放本进程未写入的投诉后再写回（内存状态同时更新为合并结果）；
+                      False 时直接以内存状态覆盖（全量重建）
+        """
+        lock_file = None
+        try:
+            directory = os.path.dirname(self.snapshot_path)
+            os.makedirs(directory, exist_ok=True)
+            if fcntl is not None:
+                lock_file = open(self.snapshot_path + ".lock", "w")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            data = self._read_snapshot() if merge else None
+            if data is not None:
+                self._load_dict(data)
+                for complaint_data in self._pending:
+                    self._apply(complaint_data)
+            temp_path = f"{self.snapshot_path}.tmp.{os.getpid()}"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(temp_path, self.snapshot_path)
+            self._pending = []
+        except Exception as e:
+            # 写入失败时保留未写入的投诉，下次写快照时再合并
+            log(f"保存投诉统计快照失败：{str(e)}", 2, __file__)
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+
+    def save(self):
+        with self._lock:
+            self._save_locked()
+
+    def load(self) -> bool:
+        """
+        从快照恢复
+        :return: 快照存在且有效时返回True
+        """
+        data = self._read_snapshot()
+        if data is None:
+            return False
+        with self._lock:
+            self._load_dict(data)
+            self._pending = []
+        return True
+
+    def _read_snapshot(self):
+        """
+        :return: 快照内容，不存在或无法读取时返回 None
+        """
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            log(f"投诉统计快照无法读取，将重新统计：{str(e)}", 2, __file__)
+            return None
+        return data if isinstance(data, dict) else None
+
+    def _load_dict(self, data: dict):
+        self._reset()
+        self.total = data.get("total", 0)
+        self.by_category = data.get("by_category", {})
+        for name, items in data.get("windows", {}).items():
+            if name in self.windows:
+                self.windows[name] = OrderedDict((key, counters) for key, counters in items)
+        self.terms = data.get("terms", {})
+        self.last_timestamp = data.get("last_timestamp")
+
+    def rebuild(self, complaint_file: str = COMPLAINT_FILE):
+        """
+        从投诉原始记录全量重建（仅在没有快照或快照损坏时使用）
+        """
+        records = []
+        if os.path.exists(complaint_file) and os.path.getsize(complaint_file) > 0:
+            with open(complaint_file, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            if not isinstance(records, list):
+                records = [records]
+        with self._lock:
+            self._reset()
+            for complaint_data in records:
+                if isinstance(complaint_data, dict):
+                    self._apply(complaint_data)
+            self._pending = []
+            self._save_locked(merge=False)
+        log(f"投诉统计已从原始记录重建，共 {len(records)} 条", 3, __file__)
+
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+
+def get_complaint_analytics() -> ComplaintAnalytics:
+    """
+    进程内共享的投诉统计实例：优先加载快照，没有快照时从原始记录重建一次
+    """
+    global _analytics
+    with _analytics_lock:
+        if _analytics is None:
+            # 调用时读取模块级路径，便于替换（如测试中 patch SNAPSHOT_FILE）
+            analytics = ComplaintAnalytics(SNAPSHOT_FILE)
+            if not analytics.load():
+                analytics.rebuild(COMPLAINT_FILE)
+            _analytics = analytics
+        return _analytics
+
+
+def main(argv=None):
+    """
+    命令行入口：python -m src.qwen.complaint_analytics --window hour --last 24
+    """
+    parser = argparse.ArgumentParser(description="投诉趋势统计（读取增量统计快照）")
+    parser.add_argument("--window", choices=list(WINDOW_SPECS), default="day", help="时间窗口粒度")
+    parser.add_argument("--last", type=int, default=7, help="输出最近多少个窗口")
+    parser.add_argument("--top", type=int, default=10, help="输出多少个热词")
+    parser.add_argument("--rebuild", action="store_true", help="从 complain_summary.json 全量重建快照")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    analytics = ComplaintAnalytics()
+    if args.rebuild or not analytics.load():
+        analytics.rebuild()
+    result = analytics.summary(top=args.top)
+    result["windows"] = analytics.window_counts(args.window, args.last)
+    result["query_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
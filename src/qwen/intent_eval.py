@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from contextlib import ExitStack
+from src.utils.log import log
+from src.utils.config import CONFIG_DIR
+from src.utils.tokens import estimate_tokens
+from src.utils.overrides import override_attr, override_env
+from src.utils.startup import _pad, _rjust
+from src.utils.semantic_cache import SEMANTIC_CACHE_SETTINGS, configure_semantic_cache
+from src.qwen import worker
+from src.qwen.model_router import MODEL_PRICES
+from src.qwen.classifier import LocalIntentClassifier, classify_batch, load_intent_descriptions
+
+DEFAULT_DATASET = os.path.join(CONFIG_DIR, "intent_eval_sample.jsonl")
+
+# 参与评估的分类路径
+# llm：每条都调用大模型识别意图（关闭语义缓存），模型按 config/model_routing.yaml 中 recognize_intent 的路由选择
+# local：本地向量化分类器，不调用大模型
+# cache：recognize_intent + 语义缓存（从空缓存开始，随评估过程逐步命中）
+# hybrid：本地分类器 + 低置信时大模型兜底（classify_batch）
+# combined：一次调用同时识别意图和手机号（recognize_intent_with_slots）
+EVAL_PATHS = ("llm", "local", "cache", "hybrid", "combined")
+
+def load_dataset(path: str) -> list:
+    """
+    读取标注数据（JSONL，每行 {"text", "intent", 可选 "phone_number"}）
+    """
+    samples = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if "text" not in item or "intent" not in item:
+                raise ValueError(f"{path} 第 {line_number} 行缺少 text 或 intent 字段")
+            samples.append(item)
+    return samples
+
+
+class UsageRecorder:
+    """
+    包装 Generation.call：按模型累计调用次数和 token 用量；可选把每次调用录制为桩服务的 fixtures
+    """
+
+    def __init__(self, call, record_path: str = None):
+        self._call = call
+        self._lock = threading.Lock()
+        self._record = open(record_path, "a", encoding="utf-8") if record_path else None
+        self.usage = {}
+
+    def __call__(self, **kwargs):
+        response = self._call(**kwargs)
+        model = kwargs.get("model", "")
+        usage = getattr(response, "usage", None)
+        input_tokens = getattr(usage, "input_tokens", None)
+        output_tokens = getattr(usage, "output_tokens", None)
+        content = ""
+        try:
+            content = response.output.choices[0].message.content
+        except (AttributeError, IndexError, TypeError):
+            pass
+        if not isinstance(input_tokens, int):
+            # 响应中没有用量时本地估算
+            input_tokens = sum(estimate_tokens(m.get("content", "")) for m in kwargs.get("messages", []))
+            output_tokens = estimate_tokens(content or "")
+        with self._lock:
+            stat = self.usage.setdefault(model, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+            stat["calls"] += 1
+            stat["input_tokens"] += input_tokens
+            stat["output_tokens"] += output_tokens or 0
+            if self._record is not None and content is not None:
+                self._record.write(json.dumps({"model": model, "messages": kwargs.get("messages", []),
+                                               "reply": content}, ensure_ascii=False) + "\n")
+                self._record.flush()
+        return response
+
+    def take(self) -> dict:
+        with self._lock:
+            usage, self.usage = self.usage, {}
+        return usage
+
+    def close(self):
+        if self._record is not None:
+            self._record.close()
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return round(sorted_values[index], 3)
+
+
+def estimate_cost(usage: dict, prices: dict = None) -> float:
+    prices = prices or MODEL_PRICES
+    cost = 0.0
+    for model, stat in usage.items():
+        input_price, output_price = prices.get(model, (0.0, 0.0))
+        cost += stat["input_tokens"] / 1000 * input_price + stat["output_tokens"] / 1000 * output_price
+    return round(cost, 6)
+
+
+def summarize(path: str, samples: list, predictions: list, latencies: list, usage: dict,
+              slots: list = None, prices: dict = None) -> dict:
+    """
+    汇总一条分类路径的结果：准确率、按意图准确率（召回）、混淆矩阵、延迟分位数、token 用量与估算费用
+    """
+    labels = sorted({sample["intent"] for sample in samples} | {p for p in predictions if p})
+    confusion = {truth: {label: 0 for label in labels} for truth in labels}
+    per_intent = {}
+    correct = 0
+    for sample, predicted in zip(samples, predictions):
+        truth = sample["intent"]
+        predicted = predicted or "NONE"
+        if predicted not in confusion[truth]:
+            for row in confusion.values():
+                row.setdefault(predicted, 0)
+        confusion[truth][predicted] += 1
+        stat = per_intent.setdefault(truth, {"total": 0, "correct": 0})
+        stat["total"] += 1
+        if predicted == truth:
+            stat["correct"] += 1
+            correct += 1
+    for stat in per_intent.values():
+        stat["accuracy"] = round(stat["correct"] / stat["total"], 4)
+
+    ordered = sorted(latencies)
+    report = {
+        "path": path,
+        "samples": len(samples),
+        "accuracy": round(correct / len(samples), 4) if samples else 0.0,
+        "per_intent": dict(sorted(per_intent.items())),
+        "confusion": confusion,
+        "latency_ms": {"p50": _percentile(ordered, 0.5), "p90": _percentile(ordered, 0.9),
+                       "p99": _percentile(ordered, 0.99), "max": round(ordered[-1], 3) if ordered else 0.0},
+        "usage": usage,
+        "tokens": sum(stat["input_tokens"] + stat["output_tokens"] for stat in usage.values()),
+        "llm_calls": sum(stat["calls"] for stat in usage.values()),
+        "estimated_cost": estimate_cost(usage, prices),
+    }
+    if slots is not None:
+        labeled = [(sample.get("phone_number"), slot) for sample, slot in zip(samples, slots)
+                   if "phone_number" in sample]
+        report["slot_accuracy"] = (round(sum(1 for truth, slot in labeled if truth == slot) / len(labeled), 4)
+                                   if labeled else None)
+    return report
+
+
+def _set_semantic_cache(enabled: bool) -> dict:
+    previous = {name: settings.get("enabled") for name, settings in SEMANTIC_CACHE_SETTINGS.items()}
+    for name in previous:
+        configure_semantic_cache(name, enabled=enabled and previous[name])
+    return previous
+
+
+def run_path(path: str, samples: list, intent_dict: dict, recorder: UsageRecorder, prices: dict = None) -> dict:
+    """
+    在一条分类路径上跑完整个数据集（每条路径都从空缓存开始，结果可复现）
+    """
+    worker.clear_caches()
+    recorder.take()
+    predictions, latencies, slots = [], [], None
+    previous = _set_semantic_cache(path == "cache")
+    try:
+        if path in ("local", "hybrid"):
+            classifier = LocalIntentClassifier(intent_dict)
+            for sample in samples:
+                start = time.perf_counter()
+                if path == "local":
+                    labels, _, _ = classifier.predict([sample["text"]])
+                    predicted = str(labels[0])
+                else:
+                    record = next(classify_batch([sample["text"]], intent_dict, classifier=classifier, chunk_size=1,
+                                                 max_concurrency=1))
+                    predicted = record["intent"]
+                latencies.append((time.perf_counter() - start) * 1000)
+                predictions.append(predicted)
+        elif path in ("llm", "cache"):
+            for sample in samples:
+                start = time.perf_counter()
+                predictions.append(worker.recognize_intent(sample["text"], intent_dict))
+                latencies.append((time.perf_counter() - start) * 1000)
+        elif path == "combined":
+            slots = []
+            for sample in samples:
+                start = time.perf_counter()
+                result = worker.recognize_intent_with_slots(sample["text"], intent_dict) or {}
+                latencies.append((time.perf_counter() - start) * 1000)
+                predictions.append(result.get("intent"))
+                slots.append(result.get("phone_number"))
+        else:
+            raise ValueError(f"未知的分类路径：{path}，可选 {EVAL_PATHS}")
+    finally:
+        for name, enabled in previous.items():
+            configure_semantic_cache(name, enabled=enabled)
+    return summarize(path, samples, predictions, latencies, recorder.take(), slots, prices)
+
+
+def evaluate(samples: list, paths=EVAL_PATHS, intent_dict: dict = None, backend: str = "stub",
+             fixtures: str = None, record: str = None, seed: int = 0, prices: dict = None) -> list:
+    """
+    运行评估
+    :param backend: stub（本地桩服务，规则应答）/ recorded（桩服务 + 录制数据回放）/ live（真实接口）
+    :param fixtures: recorded 模式下的录制数据文件
+    :param record: 把本次所有大模型调用录制到该文件（可用于之后的 recorded 回放）
+    :return: 每条路径一个报告
+    """
+    intent_dict = intent_dict or load_intent_descriptions()
+    with ExitStack() as stack:
+        if backend in ("stub", "recorded"):
+            from src.utils.dashscope_stub import DashScopeStubServer, use_stub, load_fixtures
+            if backend == "recorded" and not fixtures:
+                raise ValueError("recorded 模式需要指定录制数据文件")
+            server = stack.enter_context(DashScopeStubServer(
+                seed=seed, fixtures=load_fixtures(fixtures) if fixtures else None))
+            stack.enter_context(use_stub(server.base_url))
+            stack.enter_context(override_env(DASHSCOPE_API_KEY=os.getenv("DASHSCOPE_API_KEY") or "stub-key"))
+        elif backend != "live":
+            raise ValueError(f"未知的后端：{backend}")
+        recorder = UsageRecorder(worker.Generation.call, record)
+        stack.callback(recorder.close)
+        stack.enter_context(override_attr(worker.Generation, "call", recorder))
+        reports = [run_path(path, samples, intent_dict, recorder, prices) for path in paths]
+    worker.clear_caches()
+    return reports
+
+
+def print_report(reports: list, stream=sys.stdout):
+    """
+    打印各路径对比表和混淆矩阵
+    """
+    # 表头含中文，按终端显示宽度与数据行使用相同的列宽
+    stream.write(f"{_pad('路径', 12)}{_rjust('准确率', 8)}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}"
+                 f"{_rjust('调用数', 10)}{'tokens':>10}{_rjust('估算费用', 14)}\n")
+    for report in reports:
+        latency = report["latency_ms"]
+        stream.write(f"{report['path']:<12}{report['accuracy']:>8.2%}{latency['p50']:>10}{latency['p90']:>10}"
+                     f"{latency['p99']:>10}{report['llm_calls']:>10}{report['tokens']:>10}"
+                     f"{report['estimated_cost']:>14.6f}\n")
+    for report in reports:
+        stream.write(f"\n[{report['path']}] 按意图准确率："
+                     + "，".join(f"{intent} {stat['accuracy']:.0%}" for intent, stat in report["per_intent"].items())
+                     + "\n")
+        if report.get("slot_accuracy") is not None:
+            stream.write(f"[{report['path']}] 手机号抽取准确率：{report['slot_accuracy']:.0%}\n")
+        labels = list(report["confusion"].keys())
+        columns = sorted({label for row in report["confusion"].values() for label in row})
+        stream.write(_pad("真实\\预测", 24) + "".join(f"{label[:10]:>12}" for label in columns) + "\n")
+        for truth in labels:
+            stream.write(f"{truth:<24}" + "".join(f"{report['confusion'][truth].get(label, 0):>12}"
+                                                  for label in columns) + "\n")
+
+
+def main(argv=None):
+    """
+    命令行入口：python -m src.qwen.intent_eval --dataset config/intent_eval_sample.jsonl --backend stub
+    """
+    parser = argparse.ArgumentParser(description="意图分类评估：准确率 / 延迟 / token 花费对比")
+    parser.add_argument("--dataset", default=DEFAULT_DATASET, help="标注数据 JSONL")
+    parser.add_argument("--paths", nargs="+", choices=EVAL_PATHS, default=list(EVAL_PATHS), help="参与评估的路径")
+    parser.add_argument("--backend", choices=["stub", "recorded", "live"], default="stub")
+    parser.add_argument("--fixtures", help="recorded 模式的录制数据（JSONL）")
+    parser.add_argument("--record", help="把大模型调用录制到该文件")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prices", help="模型单价 JSON：{模型: [输入单价, 输出单价]}（元/千token）")
+    parser.add_argument("--output", help="把完整报告写入 JSON 文件")
+    args = parser.parse_args(argv)
+
+    prices = {model: tuple(price) for model, price in json.loads(args.prices).items()} if args.prices else None
+    samples = load_dataset(args.dataset)
+    reports = evaluate(samples, args.paths, backend=args.backend, fixtures=args.fixtures, record=args.record,
+                       seed=args.seed, prices=prices)
+    print_report(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+    summary = ", ".join(f"{report['path']}={report['accuracy']}" for report in reports)
+    log(f"意图分类评估完成：{summary}", 3, __file__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+from src.utils.log import log
+from src.utils.tokens import estimate_tokens, truncate_to_tokens
+
+# 默认参数（可通过环境变量调整）
+DEFAULT_MAX_TURNS = int(os.getenv("MEMORY_MAX_TURNS", "6"))          # 原文保留的最近轮数
+DEFAULT_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "600"))  # 上下文总 token 预算
+SUMMARY_TOKEN_RATIO = 0.4                                            # 摘要最多占预算的比例
+
+ROLE_NAMES = {"user": "用户", "assistant": "客服"}
+
+# 所有会话共用的后台摘要线程池（按需创建）
+_summary_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _summary_executor
+    with _executor_lock:
+        if _summary_executor is None:
+            _summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+        return _summary_executor
+
+
+def _format_turn(turn: tuple) -> str:
+    role, text = turn
+    return f"{ROLE_NAMES.get(role, role)}：{text}"
+
+
+class ConversationMemory:
+    """
+    单个会话的对话记忆：
+    - 最近 max_turns 轮原文保留
+    - 更早的轮次在后台增量折叠进滚动摘要（每次只把新溢出的轮次与旧摘要合并）
+    - context() 输出的上下文始终不超过 token_budget，长会话下提示词长度保持平稳
+    """
+
+    def __init__(self, max_turns: int = DEFAULT_MAX_TURNS, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 summarizer: Optional[Callable[[str, list], Optional[str]]] = None):
+        """
+        :param max_turns: 原文保留的最近轮数
+        :param token_budget: 上下文总 token 预算
+        :param summarizer: 摘要函数 (旧摘要, [(角色, 文本), ...]) -> 新摘要，默认使用 worker.summarize_conversation
+        """
+        self.max_turns = max(1, max_turns)
+        self.token_budget = max(1, token_budget)
+        self.summary = ""
+        self._summarizer = summarizer
+        self._turns = deque()     # 原文保留的最近轮次
+        self._pending = []        # 已溢出、等待折叠进摘要的轮次
+        self._lock = threading.Lock()
+        self._folding = False     # 是否已有后台摘要任务在运行
+        self._generation = 0      # load_dict / clear 整体替换状态时递增，进行中的摘要结果随之作废
+        self._future = None
+
+    @property
+    def summary_budget(self) -> int:
+        return max(1, int(self.token_budget * SUMMARY_TOKEN_RATIO))
+
+    def add(self, role: str, text: str):
+        """
+        记录一轮对话，超出原文保留轮数的部分交给后台摘要
+        :param role: "user" 或 "assistant"
+        :param text: 对话内容
+        """
+        text = (text or "").strip()
+        if not text:
+            return
+        with self._lock:
+            self._turns.append((role, text))
+            while len(self._turns) > self.max_turns:
+                self._pending.append(self._turns.popleft())
+            if self._pending and not self._folding:
+                self._folding = True
+                self._future = _get_executor().submit(self._fold_pending)
+
+    def _summarize(self, summary: str, turns: list) -> Optional[str]:
+        summarizer = self._summarizer
+        if summarizer is None:
+            from src.qwen import worker
+            summarizer = worker.summarize_conversation
+        return summarizer(summary, turns)
+
+    def _fold_pending(self):
+        """
+        后台任务：把等待中的轮次增量合并进摘要，直到没有新的溢出轮次
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._folding = False
+                    return
+                batch = list(self._pending)
+                summary = self.summary
+                generation = self._generation
+
+            try:
+                new_summary = self._summarize(summary, batch)
+            except Exception as e:
+                log(f"对话摘要生成失败，使用本地截断代替：{str(e)}", 2, __file__)
+                new_summary = None
+            if not new_summary:
+                # 摘要失败时退化为本地拼接（保留最新内容）
+                pieces = [summary] if summary else []
+                pieces.extend(_format_turn(turn) for turn in batch)
+                new_summary = "；".join(pieces)
+            new_summary = truncate_to_tokens(new_summary, self.summary_budget, keep="tail")
+
+            with self._lock:
+                if generation != self._generation:
+                    # 摘要期间状态已被整体替换（如其他进程推进了会话），丢弃这次结果，按新状态重新折叠
+                    continue
+                self.summary = new_summary
+                del self._pending[:len(batch)]
+
+    def wait(self, timeout: Optional[float] = None):
+        """
+        等待后台摘要完成（测试或会话结束前持久化时使用）
+        """
+        future = self._future
+        if future is not None:
+            future.result(timeout=timeout)
+
+    def context(self) -> str:
+        """
+        生成供大模型参考的对话上下文（摘要 + 最近轮次原文），不超过 token 预算
+        预算不足时优先丢弃最旧的轮次，最后才截断摘要
+        """
+        with self._lock:
+            summary = self.summary
+            # 还未折叠进摘要的轮次按原文处理，避免摘要进行中丢失上下文
+            turns = list(self._pending) + list(self._turns)
+
+        budget = self.token_budget
+        summary_part = ""
+        if summary:
+            summary_part = "历史摘要：" + truncate_to_tokens(summary, self.summary_budget, keep="tail")
+            budget -= estimate_tokens(summary_part)
+        budget -= estimate_tokens("最近对话：")
+
+        lines = []
+        for turn in reversed(turns):
+            line = _format_turn(turn)
+            cost = estimate_tokens(line)
+            if cost > budget:
+                if not lines:
+                    # 最近一轮本身超预算时截断保留结尾
+                    line = truncate_to_tokens(line, budget, keep="tail")
+                    if line:
+                        lines.append(line)
+                break
+            lines.append(line)
+            budget -= cost
+        lines.reverse()
+
+        parts = []
+        if summary_part:
+            parts.append(summary_part)
+        if lines:
+            parts.append("最近对话：\n" + "\n".join(lines))
+        return "\n".join(parts)
+
+    def to_dict(self) -> dict:
+        """
+        导出记忆状态（可 JSON 序列化），用于写入会话存储
+        """
+        with self._lock:
+            return {
+                "summary": self.summary,
+                "pending": [list(turn) for turn in self._pending],
+                "turns": [list(turn) for turn in self._turns],
+            }
+
+    def load_dict(self, data: dict):
+        """
+        从会话存储恢复记忆状态；尚未折叠的轮次继续交给后台摘要
+        """
+        with self._lock:
+            self._generation += 1
+            self.summary = data.get("summary", "")
+            self._pending = [tuple(turn) for turn in data.get("pending", [])]
+            self._turns = deque(tuple(turn) for turn in data.get("turns", []))
+            while len(self._turns) > self.max_turns:
+                self._pending.append(self._turns.popleft())
+            if self._pending and not self._folding:
+                self._folding = True
+                self._future = _get_executor().submit(self._fold_pending)
+
+    def clear(self):
+        """
+        清空会话记忆
+        """
+        with self._lock:
+            self._generation += 1
+            self._turns.clear()
+            self._pending.clear()
+            self.summary = ""
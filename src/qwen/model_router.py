@@ -0,0 +1,195 @@
+import os
+import threading
+from src.utils.log import log
+from src.utils.lazy import LazyImport
+from src.utils.config import load_config, load_config_async, CONFIG_DIR
+from src.utils.metrics import metrics
+from src.utils.tokens import estimate_tokens
+from src.utils.startup import _pad, _rjust
+
+# yaml 只在第一次路由时读取配置用到，延迟导入
+yaml = LazyImport("yaml")
+
+ROUTING_CONFIG = os.getenv("LLM_ROUTING_CONFIG", os.path.join(CONFIG_DIR, "model_routing.yaml"))
+
+# 配置文件缺失或格式错误时使用的路由规则（与仓库自带的 config/model_routing.yaml 一致）
+DEFAULT_ROUTES = {
+    "default_model": "qwen-plus",
+    "functions": {
+        "recognize_intent": {"model": "tongyi-intent-detect-v3"},
+        "recognize_intent_with_slots": {"model": "qwen-plus"},
+        "pharse_phone_number": {"model": "qwen-turbo", "escalate": ["qwen-plus"]},
+        "query_details": {"model": "qwen-turbo", "max_input_tokens": 200, "escalate": ["qwen-plus"]},
+        "summarize_conversation": {"model": "qwen-turbo", "max_input_tokens": 400, "escalate": ["qwen-plus"]},
+        "product_recommendation": {"model": "qwen-plus"},
+    },
+}
+
+# 估算费用用的单价（元 / 千 token，输入、输出）
+MODEL_PRICES = {
+    "tongyi-intent-detect-v3": (0.0004, 0.001),
+    "qwen-turbo": (0.0003, 0.0006),
+    "qwen-plus": (0.0008, 0.002),
+    "qwen-max": (0.0024, 0.0096),
+}
+
+
+class UsageTracker:
+    """
+    大模型调用记账（线程安全）：按 (函数, 模型) 累计调用次数、失败 / 升级次数、token 用量和延迟
+    响应中没有 usage 时按本地估算的 token 数记账（estimated 计数）
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, function: str, model: str, input_tokens: int, output_tokens: int, latency_ms: float,
+               ok: bool = True, escalated: bool = False, estimated: bool = False):
+        with self._lock:
+            stat = self._stats.setdefault((function, model), {
+                "calls": 0, "failures": 0, "escalations": 0, "estimated": 0,
+                "input_tokens": 0, "output_tokens": 0, "latency_ms_sum": 0.0, "latency_ms_max": 0.0})
+            stat["calls"] += 1
+            stat["failures"] += 0 if ok else 1
+            stat["escalations"] += 1 if escalated else 0
+            stat["estimated"] += 1 if estimated else 0
+            stat["input_tokens"] += input_tokens
+            stat["output_tokens"] += output_tokens
+            stat["latency_ms_sum"] += latency_ms
+            stat["latency_ms_max"] = max(stat["latency_ms_max"], latency_ms)
+        metrics.incr("llm.calls")
+        metrics.incr("llm.input_tokens", input_tokens)
+        metrics.incr("llm.output_tokens", output_tokens)
+        if escalated:
+            metrics.incr("llm.escalations")
+
+    def snapshot(self) -> dict:
+        """
+        :return: {函数: {模型: {calls, failures, escalations, input_tokens, output_tokens, avg_latency_ms,
+                 max_latency_ms, estimated_cost}}}
+        """
+        with self._lock:
+            items = [(key, dict(stat)) for key, stat in self._stats.items()]
+        result = {}
+        for (function, model), stat in sorted(items):
+            latency_sum = stat.pop("latency_ms_sum")
+            stat["avg_latency_ms"] = round(latency_sum / stat["calls"], 3) if stat["calls"] else 0.0
+            stat["max_latency_ms"] = round(stat.pop("latency_ms_max"), 3)
+            stat["estimated_cost"] = estimate_cost(model, stat["input_tokens"], stat["output_tokens"])
+            result.setdefault(function, {})[model] = stat
+        return result
+
+    def totals(self) -> dict:
+        """
+        所有函数、模型的合计
+        """
+        totals = {"calls": 0, "failures": 0, "escalations": 0, "input_tokens": 0, "output_tokens": 0,
+                  "estimated_cost": 0.0}
+        for models in self.snapshot().values():
+            for stat in models.values():
+                for field in totals:
+                    totals[field] += stat[field]
+        totals["estimated_cost"] = round(totals["estimated_cost"], 6)
+        return totals
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int, prices: dict = None) -> float:
+    input_price, output_price = (prices or MODEL_PRICES).get(model, (0.0, 0.0))
+    return round(input_tokens / 1000 * input_price + output_tokens / 1000 * output_price, 6)
+
+
+# 全局记账实例
+usage_tracker = UsageTracker()
+
+
+class ModelRouter:
+    """
+    按函数选择模型：返回依次尝试的模型列表（首选模型 + 升级模型）
+    路由规则读取自 config/model_routing.yaml（文件变更后自动生效），读取失败时使用 DEFAULT_ROUTES
+    """
+
+    def __init__(self, config_path: str = ROUTING_CONFIG):
+        self.config_path = config_path
+
+    def routes(self) -> dict:
+        try:
+            routes = load_config(self.config_path, loader=yaml.safe_load)
+        except Exception as e:
+            log(f"读取模型路由配置失败，使用默认路由：{str(e)}", 2, __file__)
+            return DEFAULT_ROUTES
+        return self._checked(routes)
+
+    async def routes_async(self) -> dict:
+        """
+        routes 的异步版本（需要读盘时不阻塞事件循环）
+        """
+        try:
+            routes = await load_config_async(self.config_path, loader=yaml.safe_load)
+        except Exception as e:
+            log(f"读取模型路由配置失败，使用默认路由：{str(e)}", 2, __file__)
+            return DEFAULT_ROUTES
+        return self._checked(routes)
+
+    def _checked(self, routes) -> dict:
+        if not isinstance(routes, dict) or not isinstance(routes.get("functions"), dict):
+            log(f"模型路由配置格式无效，使用默认路由：{self.config_path}", 2, __file__)
+            return DEFAULT_ROUTES
+        return routes
+
+    def candidates(self, function: str, messages: list = None, routes: dict = None) -> list:
+        """
+        :param function: 调用方函数名
+        :param messages: 本次调用的消息列表，用于按用户输入长度路由
+        :param routes: 已读取的路由规则（异步调用方先用 routes_async 读取），默认读取配置文件
+        :return: 依次尝试的模型列表（至少一个）
+        """
+        routes = routes if routes is not None else self.routes()
+        default_model = routes.get("default_model") or DEFAULT_ROUTES["default_model"]
+        rule = routes["functions"].get(function)
+        if isinstance(rule, str) and rule:
+            return [rule]
+        if not isinstance(rule, dict):
+            return [default_model]
+        escalate = rule.get("escalate") or []
+        if isinstance(escalate, str):
+            escalate = [escalate]
+        models = [rule.get("model") or default_model] + [model for model in escalate if model]
+
+        max_input_tokens = rule.get("max_input_tokens")
+        if max_input_tokens and len(models) > 1:
+            user_text = "".join(message.get("content", "") for message in messages or []
+                                if message.get("role") == "user")
+            if estimate_tokens(user_text) > max_input_tokens:
+                models = models[1:]
+        # 去除空的模型名，去重并保持顺序
+        return list(dict.fromkeys(model for model in models if model)) or [default_model]
+
+
+_default_router = None
+
+
+def get_default_router() -> ModelRouter:
+    global _default_router
+    if _default_router is None:
+        _default_router = ModelRouter()
+    return _default_router
+
+
+def format_usage(snapshot: dict) -> str:
+    """
+    把 usage_tracker.snapshot() 格式化为便于阅读的表格
+    """
+    # 表头含中文，按终端显示宽度与数据行使用相同的列宽
+    lines = [f"{_pad('函数', 30)}{_pad('模型', 28)}{_rjust('调用', 6)}{_rjust('失败', 6)}{_rjust('升级', 6)}"
+             f"{_rjust('输入tokens', 14)}{_rjust('输出tokens', 14)}{_rjust('平均延迟ms', 14)}{_rjust('估算费用', 14)}"]
+    for function, models in snapshot.items():
+        for model, stat in models.items():
+            lines.append(f"{function:<30}{model:<28}{stat['calls']:>6}{stat['failures']:>6}{stat['escalations']:>6}"
+                         f"{stat['input_tokens']:>14}{stat['output_tokens']:>14}{stat['avg_latency_ms']:>14}"
+                         f"{stat['estimated_cost']:>14.6f}")
+    return "\n".join(lines)
@@ -0,0 +1,140 @@
+import os
+import copy
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional
+from src.utils.log import log
+from src.utils.metrics import metrics
+from src.qwen import worker
+
+# 会话级预取：手机号验证通过后，立即在后台加载该用户的订单、会员信息以及后续可能用到的数据，
+# 之后同一会话中的订单查询、会员查询直接从内存取结果，不再同步读取数据文件。
+# 所有会话共用一个有界线程池；排队的预取任务超过上限时不再预取（回退为同步查询），
+# 会话更换手机号或结束时取消尚未开始的任务，已开始的任务结果直接丢弃。
+PREFETCH_ENABLED = os.getenv("PREFETCH", "1") == "1"
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))          # 预取线程数
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", "64"))  # 所有会话合计未完成的预取任务上限
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "60"))                # 预取结果的有效期（秒），过期后重新查询
+
+# 预取项 -> (worker 中的查询函数名, 是否以手机号为参数)
+# catalog 为后续推荐轮次会用到的产品库（读入配置缓存），不依赖手机号
+PREFETCH_TASKS = {
+    "order": ("get_order_info", True),
+    "membership": ("get_membership_info", True),
+    "catalog": ("_load_catalog", False),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(max(1, PREFETCH_MAX_PENDING))
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max(1, PREFETCH_WORKERS), thread_name_prefix="prefetch")
+    return _executor
+
+
+def _call(name: str, phone_number: str):
+    function_name, with_phone = PREFETCH_TASKS[name]
+    # 调用时再取函数，便于替换（如测试中 patch worker.get_order_info）
+    function = getattr(worker, function_name)
+    return function(phone_number) if with_phone else function()
+
+
+class SessionPrefetcher:
+    """
+    一个会话的预取状态：当前手机号、各预取项的 Future 与开始时间
+    """
+
+    def __init__(self, tasks: tuple = tuple(PREFETCH_TASKS), ttl: float = PREFETCH_TTL,
+                 enabled: bool = PREFETCH_ENABLED):
+        self.tasks = tasks
+        self.ttl = ttl
+        self.enabled = enabled
+        self.phone_number = None
+        self._futures = {}
+        self._started_at = 0.0
+        self._lock = threading.Lock()
+
+    def start(self, phone_number: str):
+        """
+        手机号验证通过后调用：取消旧手机号的预取，提交新手机号的预取任务（已在预取同一手机号时不重复提交）
+        """
+        if not self.enabled or not phone_number:
+            return
+        with self._lock:
+            if phone_number == self.phone_number and self._futures and not self._expired():
+                return
+            self._cancel_locked()
+            self.phone_number = phone_number
+            self._started_at = time.monotonic()
+            for name in self.tasks:
+                if not _pending.acquire(blocking=False):
+                    metrics.incr("prefetch.shed")
+                    log(f"预取任务过多，跳过 {name} 的预取", 3, __file__)
+                    continue
+                try:
+                    future = _get_executor().submit(_call, name, phone_number)
+                except RuntimeError:
+                    # 解释器退出时线程池已关闭
+                    _pending.release()
+                    continue
+                future.add_done_callback(lambda _: _pending.release())
+                self._futures[name] = future
+                metrics.incr("prefetch.submitted")
+
+    def fetch(self, name: str, phone_number: str):
+        """
+        取预取结果：同一手机号的预取已完成时直接返回（副本），正在执行时等待其完成；
+        未预取、已过期或预取失败时同步查询；预取任务仍在排队时取消它并同步查询（不排在其他会话的预取之后）。
+        同步查询的结果同样保存，本会话后续轮次直接复用
+        """
+        future = self._future_for(name, phone_number)
+        if future is not None and not future.cancel():
+            try:
+                result = future.result()
+            except Exception as e:
+                log(f"预取 {name} 失败，改为同步查询：{str(e)}", 2, __file__)
+            else:
+                metrics.incr("prefetch.hits")
+                return copy.deepcopy(result)
+        metrics.incr("prefetch.misses")
+        result = _call(name, phone_number)
+        self._store(name, phone_number, result)
+        return copy.deepcopy(result)
+
+    def _store(self, name: str, phone_number: str, result):
+        with self._lock:
+            if phone_number != self.phone_number or self._expired():
+                return
+            future = Future()
+            future.set_result(result)
+            self._futures[name] = future
+
+    def _future_for(self, name: str, phone_number: str) -> Optional[Future]:
+        with self._lock:
+            if phone_number != self.phone_number or self._expired():
+                return None
+            return self._futures.get(name)
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._started_at > self.ttl
+
+    def cancel(self):
+        """
+        取消本会话尚未开始的预取任务（会话结束或手机号变更时调用）
+        """
+        with self._lock:
+            self._cancel_locked()
+            self.phone_number = None
+
+    def _cancel_locked(self):
+        for future in self._futures.values():
+            if future.cancel():
+                metrics.incr("prefetch.cancelled")
+        self._futures = {}
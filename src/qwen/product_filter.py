@@ -0,0 +1,344 @@
+import os
+import re
+from typing import Optional
+from src.utils.lazy import LazyImport
+from src.utils.cache import LRUCache
+
+# 产品推荐的本地结构化筛选：
+# 先从用户偏好中解析出价格、品牌、产品类型、好评率、排序方式等硬性条件，
+# 再在按列存放的产品库（每个字段一个 numpy 数组）上一次向量化运算完成过滤与排序。
+# 条件全部可结构化时直接给出推荐结果，否则只把筛选后的候选产品交给大模型。
+np = LazyImport("numpy")
+
+HIGH_RATING = float(os.getenv("PRODUCT_HIGH_RATING", "95"))            # "好评率高"对应的最低好评率（%）
+PRICE_TOLERANCE = float(os.getenv("PRODUCT_PRICE_TOLERANCE", "0.2"))   # "3000左右"的上下浮动比例
+RESULT_LIMIT = int(os.getenv("PRODUCT_RESULT_LIMIT", "5"))             # 直接回答时最多列出的产品数
+CANDIDATE_LIMIT = int(os.getenv("PRODUCT_CANDIDATE_LIMIT", "20"))      # 交给大模型的候选产品上限
+
+SORT_HEAT, SORT_PRICE, SORT_RATING = "热度", "价格", "好评率"
+
+# 产品类型的口语说法 -> 产品库中的类型（产品库中包含该说法的类型也会匹配，如"手机"匹配"智能手机"）
+CATEGORY_ALIASES = {
+    "充电宝": ["移动电源"],
+    "平板": ["平板电脑"],
+    "净化器": ["空气净化器"],
+}
+BRAND_ALIASES = {
+    "huawei": "华为", "apple": "苹果", "iphone": "苹果", "xiaomi": "小米", "samsung": "三星",
+    "dyson": "戴森", "anker": "安克", "midea": "美的",
+}
+
+_NUMBER = r"(\d+(?:\.\d+)?)\s*(万|千|[kK])?\s*(?:元|块钱|块)?"
+_UNITS = {"万": 10000, "千": 1000, "k": 1000, "K": 1000}
+_CHINESE_DIGITS = {"两": 2, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+# 否定词：必须先于价格、品牌条件识别，否则"不要超过3000"会被当成"超过3000"
+_NEGATION = r"(?:不要|不想要|不想|不能|不可以|别)"
+_RATING_VALUE = re.compile(r"好评率?\s*(?:在|不低于|不少于|高于|大于|" + _NEGATION + r"\s*(?:低于|少于|小于))?"
+                           r"\s*(\d+(?:\.\d+)?)\s*%?\s*(?:及?以上)?")
+_RATING_HIGH = re.compile(r"好评率?(?:高|多|好)|口碑(?:好|佳)|评价(?:好|高)")
+_PRICE_RANGE = re.compile(_NUMBER + r"\s*(?:-|~|～|到|至)\s*" + _NUMBER + r"\s*(?:之间)?")
+# "不要超过 / 别高于 3000" 为上限，"不要低于 1000" 为下限
+_PRICE_NEGATED = re.compile(_NEGATION + r"\s*(超过|高于|大于|多于|贵于|低于|小于|少于|便宜于)\s*" + _NUMBER)
+# "不低于 / 不少于 1000" 为下限：上限的"低于 / 小于 / 少于"不匹配前面带"不"的情况
+_PRICE_MAX = re.compile(r"(?:不超过|不高于|不大于|(?<!不)(?:低于|小于|少于)|最多|不到|预算)\s*" + _NUMBER
+                        + r"\s*(?:以内|以下|之内)?")
+_PRICE_MIN = re.compile(r"(?:(?<!不)(?:高于|大于|超过)|至少|不低于|不少于|不小于)\s*" + _NUMBER)
+_PRICE_SUFFIX = re.compile(_NUMBER + r"\s*(以内|以下|之内|内|左右|上下|以上|起)")
+_PRICE_ABOUT = re.compile(r"(\d+(?:\.\d+)?)\s*(万|千|[kK])?\s*(?:元|块钱|块)")
+_SORT_PRICE = re.compile(r"最?便宜|性价比|实惠|低价")
+_SORT_HEAT = re.compile(r"热门|最火|热度高|最热|爆款|销量高|畅销")
+_LIMIT = re.compile(r"([2-9两二三四五六七八九十])\s*(?:款|个|台|件|部)")
+# 去掉条件后剩下的客套话、虚词；仍有其他内容（如"拍照好"）说明偏好没有被完全结构化
+_FILLER = re.compile(r"我|想|要|买|给|帮|推荐|介绍|一下|一款|一个|一台|一部|款|个|有没有|有什么|什么|哪些|哪个|哪款"
+                     r"|的|吗|呢|吧|啊|请|价格|价位|价钱|预算|品牌|牌子|产品|商品|东西|和|或者|或|还有|也|都|看看|找"
+                     r"|来|元|块|最好|比较|一些|点|[\s,，.。!！?？、~～]")
+# 排除品牌的前缀 / 后缀（"不是华为的"、"华为以外的"）
+_BRAND_EXCLUDE_PREFIX = r"(不要|不想要|不考虑|不是|不买|别买|别|除了|排除|非)?"
+_BRAND_EXCLUDE_SUFFIX = r"(以外|之外)?"
+# 条件识别之后仍残留的否定词：说明有否定没有被正确理解，此时不做本地筛选，避免把条件理解反
+_UNRESOLVED_NEGATION = re.compile(r"不|别|没|非|以外|之外|除")
+
+
+def _to_price(number: str, unit: Optional[str]) -> float:
+    return float(number) * _UNITS.get(unit or "", 1)
+
+
+def _parse_rating(value) -> float:
+    """
+    "96.8%" / 96.8 / "0.968" -> 96.8；无法解析返回 NaN
+    """
+    try:
+        rating = float(str(value).strip().rstrip("%"))
+    except (TypeError, ValueError):
+        return float("nan")
+    return rating * 100 if rating <= 1 else rating
+
+
+def _parse_number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class PreferenceConstraints:
+    """
+    从偏好描述中解析出的结构化条件
+    """
+
+    def __init__(self):
+        self.min_price = None
+        self.max_price = None
+        self.min_rating = None
+        self.brands = []
+        self.excluded_brands = []
+        self.categories = []
+        self.sort = None
+        self.limit = None
+        # 去掉条件和虚词后剩下的文字，非空说明还有无法结构化的偏好
+        self.residual = ""
+        # 残留中仍有否定词（如"不要太大的"），结构化条件可能与原意相反
+        self.unresolved_negation = False
+
+    @property
+    def empty(self) -> bool:
+        return not self.describe() and self.sort is None
+
+    @property
+    def fully_structured(self) -> bool:
+        """
+        偏好全部可结构化，且除产品类型外至少还有一个筛选或排序条件（只说"推荐手机"时仍交给大模型挑选并说明理由）
+        """
+        has_condition = any(value is not None for value in (self.min_price, self.max_price, self.min_rating,
+                                                               self.sort)) or self.brands or self.excluded_brands
+        return not self.residual and not self.unresolved_negation and bool(has_condition)
+
+    def describe(self) -> list:
+        """
+        条件的中文描述，用于直接回答时说明推荐依据
+        """
+        parts = []
+        if self.min_price is not None and self.max_price is not None:
+            parts.append(f"价格{self.min_price:g}-{self.max_price:g}元")
+        elif self.max_price is not None:
+            parts.append(f"价格{self.max_price:g}元以内")
+        elif self.min_price is not None:
+            parts.append(f"价格{self.min_price:g}元以上")
+        if self.brands:
+            parts.append("品牌为" + "/".join(self.brands))
+        if self.excluded_brands:
+            parts.append("排除" + "/".join(self.excluded_brands))
+        if self.categories:
+            parts.append("类型为" + "/".join(self.categories))
+        if self.min_rating is not None:
+            parts.append(f"好评率{self.min_rating:g}%以上")
+        return parts
+
+    def __repr__(self):
+        return (f"PreferenceConstraints({'，'.join(self.describe()) or '无条件'}，排序={self.sort}，"
+                f"数量={self.limit}，剩余={self.residual!r})")
+
+
+class ProductTable:
+    """
+    按列存放的产品库：价格、热度、好评率为 float 数组（缺失为 NaN），品牌、产品类型编码为整数数组
+    """
+
+    def __init__(self, product_list: list):
+        self.products = [product for product in product_list if isinstance(product, dict)]
+        self.price = np.array([_parse_number(product.get("价格")) for product in self.products], dtype=np.float64)
+        self.heat = np.array([_parse_number(product.get("热度")) for product in self.products], dtype=np.float64)
+        self.rating = np.array([_parse_rating(product.get("好评率")) for product in self.products], dtype=np.float64)
+        self.brands = sorted({str(product.get("品牌", "")) for product in self.products} - {""})
+        self.categories = sorted({str(product.get("产品类型", "")) for product in self.products} - {""})
+        brand_codes = {brand: code for code, brand in enumerate(self.brands)}
+        category_codes = {category: code for code, category in enumerate(self.categories)}
+        self.brand_code = np.array([brand_codes.get(str(product.get("品牌", "")), -1)
+                                    for product in self.products], dtype=np.int32)
+        self.category_code = np.array([category_codes.get(str(product.get("产品类型", "")), -1)
+                                       for product in self.products], dtype=np.int32)
+        self._brand_codes = brand_codes
+        self._category_codes = category_codes
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def rank(self, constraints: PreferenceConstraints) -> list:
+        """
+        一次向量化运算完成过滤与排序
+        :return: 满足全部硬性条件的产品，按排序条件（默认热度）从高到低；价格等字段缺失的产品不满足对应条件
+        """
+        mask = np.ones(len(self.products), dtype=bool)
+        # NaN 参与比较的结果为 False，字段缺失的产品自然被过滤掉
+        if constraints.min_price is not None:
+            mask &= self.price >= constraints.min_price
+        if constraints.max_price is not None:
+            mask &= self.price <= constraints.max_price
+        if constraints.min_rating is not None:
+            mask &= self.rating >= constraints.min_rating
+        if constraints.brands:
+            mask &= np.isin(self.brand_code, [self._brand_codes[brand] for brand in constraints.brands])
+        if constraints.excluded_brands:
+            mask &= ~np.isin(self.brand_code, [self._brand_codes[brand] for brand in constraints.excluded_brands])
+        if constraints.categories:
+            mask &= np.isin(self.category_code,
+                            [self._category_codes[category] for category in constraints.categories])
+
+        # lexsort 以最后一个键为主键；缺失值排在最后
+        heat = np.nan_to_num(self.heat, nan=-np.inf)
+        if constraints.sort == SORT_PRICE:
+            keys = (-heat, np.nan_to_num(self.price, nan=np.inf))
+        elif constraints.sort == SORT_RATING:
+            keys = (-heat, -np.nan_to_num(self.rating, nan=-np.inf))
+        else:
+            keys = (-np.nan_to_num(self.rating, nan=-np.inf), -heat)
+        order = np.lexsort(keys)
+        return [self.products[i] for i in order[mask[order]]]
+
+
+def parse_preferences(text: str, table: ProductTable) -> PreferenceConstraints:
+    """
+    解析偏好描述中的硬性条件（品牌、产品类型只识别产品库中存在的取值）
+    """
+    constraints = PreferenceConstraints()
+    remaining = [text or ""]
+
+    def take(pattern, handler):
+        def replace(match):
+            handler(match)
+            return " "
+        remaining[0] = pattern.sub(replace, remaining[0])
+
+    def set_rating(match):
+        constraints.min_rating = _parse_rating(match.group(1))
+        constraints.sort = constraints.sort or SORT_RATING
+
+    def set_high_rating(match):
+        constraints.min_rating = HIGH_RATING if constraints.min_rating is None else constraints.min_rating
+        constraints.sort = constraints.sort or SORT_RATING
+
+    def set_range(match):
+        low, high = _to_price(match.group(1), match.group(2) or match.group(4)), _to_price(match.group(3), match.group(4))
+        constraints.min_price, constraints.max_price = min(low, high), max(low, high)
+
+    def set_negated(match):
+        price = _to_price(match.group(2), match.group(3))
+        if match.group(1) in ("超过", "高于", "大于", "多于", "贵于"):
+            constraints.max_price = price
+        else:
+            constraints.min_price = price
+
+    def set_max(match):
+        constraints.max_price = _to_price(match.group(1), match.group(2))
+
+    def set_min(match):
+        constraints.min_price = _to_price(match.group(1), match.group(2))
+
+    def set_suffix(match):
+        price, qualifier = _to_price(match.group(1), match.group(2)), match.group(3)
+        if qualifier in ("以上", "起"):
+            constraints.min_price = price
+        elif qualifier in ("左右", "上下"):
+            constraints.min_price, constraints.max_price = price * (1 - PRICE_TOLERANCE), price * (1 + PRICE_TOLERANCE)
+        else:
+            constraints.max_price = price
+
+    def set_about(match):
+        price = _to_price(match.group(1), match.group(2))
+        constraints.min_price, constraints.max_price = price * (1 - PRICE_TOLERANCE), price * (1 + PRICE_TOLERANCE)
+
+    def set_limit(match):
+        value = match.group(1)
+        constraints.limit = int(value) if value.isdigit() else _CHINESE_DIGITS[value]
+
+    take(_RATING_VALUE, set_rating)
+    take(_RATING_HIGH, set_high_rating)
+    take(_PRICE_NEGATED, set_negated)
+    take(_PRICE_RANGE, set_range)
+    take(_PRICE_MAX, set_max)
+    take(_PRICE_MIN, set_min)
+    take(_PRICE_SUFFIX, set_suffix)
+    take(_PRICE_ABOUT, set_about)
+    take(_SORT_PRICE, lambda match: setattr(constraints, "sort", SORT_PRICE))
+    take(_SORT_HEAT, lambda match: setattr(constraints, "sort", SORT_HEAT))
+    take(_LIMIT, set_limit)
+
+    # 品牌：产品库中的品牌名及英文别名，前面带"不要""不是""除了"等词或后面带"以外"时视为排除
+    brand_words = {brand: brand for brand in table.brands}
+    brand_words.update({alias: brand for alias, brand in BRAND_ALIASES.items() if brand in table.brands})
+    for word in sorted(brand_words, key=len, reverse=True):
+        pattern = re.compile(_BRAND_EXCLUDE_PREFIX + r"\s*" + re.escape(word) + r"\s*" + _BRAND_EXCLUDE_SUFFIX,
+                             re.IGNORECASE)
+        for match in pattern.finditer(remaining[0]):
+            brand = brand_words[word]
+            target = constraints.excluded_brands if match.group(1) or match.group(2) else constraints.brands
+            if brand not in target:
+                target.append(brand)
+        remaining[0] = pattern.sub(" ", remaining[0])
+
+    # 产品类型：产品库中的类型名、口语别名，或被产品库类型包含的说法（"手机" -> "智能手机"）
+    category_words = {category: [category] for category in table.categories}
+    for alias, targets in CATEGORY_ALIASES.items():
+        matched = [category for category in targets if category in table.categories]
+        if matched:
+            category_words.setdefault(alias, matched)
+    for word in sorted(_category_candidates(remaining[0], table.categories) | set(category_words),
+                       key=len, reverse=True):
+        if word in remaining[0]:
+            for category in category_words.get(word) or [c for c in table.categories if word in c]:
+                if category not in constraints.categories:
+                    constraints.categories.append(category)
+            remaining[0] = remaining[0].replace(word, " ")
+
+    constraints.residual = _FILLER.sub("", remaining[0])
+    constraints.unresolved_negation = bool(_UNRESOLVED_NEGATION.search(constraints.residual))
+    return constraints
+
+
+def _category_candidates(text: str, categories: list) -> set:
+    """
+    产品库类型的后缀中在文本里出现的部分（至少两个字），如"智能手机" -> "手机"
+    """
+    candidates = set()
+    for category in categories:
+        for start in range(1, len(category) - 1):
+            suffix = category[start:]
+            if suffix in text:
+                candidates.add(suffix)
+    return candidates
+
+
+def format_recommendation(products: list, constraints: PreferenceConstraints) -> str:
+    """
+    结构化条件下的直接回答（格式与大模型的推荐结果一致：分点列出名字、品牌和推荐理由）
+    """
+    if not products:
+        return "未找到符合您偏好的产品，建议尝试其他描述"
+    reasons = constraints.describe()
+    lines = []
+    for i, product in enumerate(products[:constraints.limit or RESULT_LIMIT], start=1):
+        details = []
+        if product.get("价格") is not None:
+            details.append(f"价格{product['价格']}元")
+        if product.get("好评率") is not None:
+            details.append(f"好评率{product['好评率']}")
+        if product.get("热度") is not None:
+            details.append(f"热度{product['热度']}")
+        reason = f"符合{'、'.join(reasons)}，" if reasons else ""
+        lines.append(f"{i}. {product.get('名字', '')}（{product.get('品牌', '')}）：{reason}{'，'.join(details)}")
+    return "\n".join(lines)
+
+
+# 按产品库版本缓存列式表，产品库不变时只构建一次
+_tables = LRUCache(maxsize=4)
+
+
+def get_product_table(product_list: list, catalog_version: Optional[str] = None) -> ProductTable:
+    if catalog_version is None:
+        return ProductTable(product_list)
+    table = _tables.get(catalog_version)
+    if table is None:
+        table = ProductTable(product_list)
+        _tables.set(catalog_version, table)
+    return table
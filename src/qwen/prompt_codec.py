@@ -0,0 +1,144 @@
+import os
+import json
+from typing import Optional
+from src.utils.metrics import metrics
+from src.utils.tokens import estimate_tokens, truncate_to_tokens
+
+# 提示词的紧凑编码与 token 预算：
+# 意图字典、产品库以无空白的 JSON 写入提示词，产品字段用单字别名（提示词开头给出一次对照表），
+# 过长的描述、功能列表裁剪后再发送；每个函数的提示词有各自的 token 预算，超出时按内容的重要程度截断，
+# 实际 token 数和截断次数记录到 metrics（prompt.<函数>.tokens / prompt.<函数>.truncated）。
+
+# 各函数提示词（system + user）的 token 预算，可用环境变量 PROMPT_BUDGET_<函数名大写> 覆盖，0 表示不限制
+DEFAULT_PROMPT_BUDGETS = {
+    "recognize_intent": 1200,
+    "recognize_intent_with_slots": 1200,
+    "pharse_phone_number": 400,
+    "query_details": 800,
+    "product_recommendation": 3000,
+    "summarize_conversation": 1200,
+}
+PROMPT_BUDGETS = {function: int(os.getenv(f"PROMPT_BUDGET_{function.upper()}", str(budget)))
+                  for function, budget in DEFAULT_PROMPT_BUDGETS.items()}
+DESCRIPTION_MAX_TOKENS = int(os.getenv("PROMPT_DESCRIPTION_MAX_TOKENS", "40"))  # 单个产品描述的上限
+FEATURES_MAX_ITEMS = int(os.getenv("PROMPT_FEATURES_MAX_ITEMS", "4"))           # 单个产品最多保留的功能条数
+
+# 产品字段 -> 提示词中的别名（按此顺序输出，未列出的字段不发送）
+PRODUCT_FIELD_ALIASES = {
+    "名字": "名", "品牌": "牌", "产品类型": "类", "价格": "价", "热度": "热", "好评率": "评",
+    "规格": "规", "功能": "能", "描述": "述",
+}
+ELLIPSIS = "…"
+
+
+def prompt_budget(function: str) -> Optional[int]:
+    """
+    :return: 函数的提示词 token 预算，未配置或为 0 时返回None（不限制）
+    """
+    return PROMPT_BUDGETS.get(function) or None
+
+
+def compact_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def fit_text(text: str, budget: int, keep: str = "head") -> str:
+    """
+    把文本截断到 budget 个 token 以内，截断处加省略号
+    :param keep: "head" 保留开头，"tail" 保留结尾（如对话上下文，越近越重要）
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    if budget <= 1:
+        return ""
+    piece = truncate_to_tokens(text, budget - 1, keep=keep)
+    return piece + ELLIPSIS if keep == "head" else ELLIPSIS + piece
+
+
+def fit_section(function: str, text: str, budget: Optional[int], keep: str = "head") -> str:
+    """
+    按预算裁剪提示词中的一段可变内容（上下文、对话记录等），发生截断时计入 prompt.<函数>.truncated
+    :param budget: 这一段可用的 token 数，None 表示不限制
+    """
+    if budget is None or estimate_tokens(text) <= budget:
+        return text
+    metrics.incr(f"prompt.{function}.truncated")
+    return fit_text(text, max(budget, 0), keep=keep)
+
+
+def remaining_budget(function: str, messages: list) -> Optional[int]:
+    """
+    已构建的固定部分之外还剩多少 token 可用于可变内容，未配置预算返回None
+    """
+    budget = prompt_budget(function)
+    return None if budget is None else budget - messages_tokens(messages)
+
+
+def encode_intents(intent_dict: dict) -> str:
+    """
+    意图字典的紧凑编码（描述中的示例是分类依据，不裁剪）
+    """
+    return compact_json(intent_dict)
+
+
+def _compact_product(product: dict) -> dict:
+    compact = {}
+    for field, alias in PRODUCT_FIELD_ALIASES.items():
+        value = product.get(field)
+        if value is None or value == "" or value == []:
+            continue
+        if field == "描述" and isinstance(value, str):
+            value = fit_text(value, DESCRIPTION_MAX_TOKENS)
+        elif field == "功能" and isinstance(value, list):
+            value = value[:FEATURES_MAX_ITEMS]
+        compact[alias] = value
+    return compact
+
+
+def encode_products(product_list: list, budget: Optional[int] = None) -> tuple:
+    """
+    产品库的紧凑编码：第一行为字段对照表，之后每行一个产品
+    :param product_list: 产品列表（已按优先级排序时，超出预算会从末尾开始舍弃）
+    :param budget: token 上限，None 表示不限制；至少保留一个产品
+    :return: (编码后的文本, 实际发送的产品数)
+    """
+    rows = [compact_json(_compact_product(product)) for product in product_list if isinstance(product, dict)]
+    used_aliases = [f"{alias}={field}" for field, alias in PRODUCT_FIELD_ALIASES.items()
+                    if any(f'"{alias}":' in row for row in rows)]
+    header = "字段：" + "，".join(used_aliases)
+    if budget is not None:
+        # 换行符也计 1 个 token
+        remaining = budget - estimate_tokens(header) - 1
+        kept = 0
+        for row in rows:
+            cost = estimate_tokens(row) + 1
+            if kept and cost > remaining:
+                break
+            remaining -= cost
+            kept += 1
+        rows = rows[:kept]
+    return "\n".join([header] + rows), len(rows)
+
+
+def messages_tokens(messages: list) -> int:
+    return sum(estimate_tokens(message.get("content", "")) for message in messages)
+
+
+def enforce_budget(function: str, messages: list, budget: Optional[int] = None) -> list:
+    """
+    提示词的最后一道预算检查：仍超出预算时截断用户消息（保留开头），并记录 token 数与截断次数
+    （各函数在构建提示词时已按内容优先级裁剪上下文、产品列表等可变部分，这里只兜底）
+    """
+    budget = prompt_budget(function) if budget is None else budget
+    total = messages_tokens(messages)
+    if budget is not None and total > budget:
+        user_index = next((i for i in range(len(messages) - 1, -1, -1) if messages[i].get("role") == "user"), None)
+        if user_index is not None:
+            message = messages[user_index]
+            allowed = max(budget - (total - estimate_tokens(message["content"])), 1)
+            messages = list(messages)
+            messages[user_index] = dict(message, content=fit_text(message["content"], allowed))
+            total = messages_tokens(messages)
+        metrics.incr(f"prompt.{function}.truncated")
+    metrics.observe(f"prompt.{function}.tokens", total)
+    return messages
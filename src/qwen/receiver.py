@@ -1,16 +1,73 @@
-import yaml
 from pathlib import Path
-from src.utils.log import log
+from src.utils.log import log, set_log_session
+from src.utils.lazy import LazyImport
+from src.utils.config import load_config
 from src.qwen import worker
+from src.qwen.memory import ConversationMemory
+from src.qwen.prefetch import SessionPrefetcher
+from src.qwen import complaint_analytics
+from src.utils.session_store import SessionStore, get_default_store
+from src.utils.admission import AdmissionController, Overloaded, SHED_SESSION_BUSY, get_default_controller
+from src.utils.metrics import metrics
+from src.utils.response import ResponseBuilder, ResponseSink, compile_templates, get_default_sink
 import os
 import json
+import contextlib
 from datetime import datetime
 import time
 import sys
 import threading
+import uuid
+
+# yaml 仅在初始化读取意图配置时使用，延迟导入以缩短进程冷启动时间
+yaml = LazyImport("yaml")
+
+MEMBERSHIP_RULE = "=" * 50
+# 回复模板，导入时校验占位符；处理函数通过 self.response.render(名称, ...) 追加回复
+REPLY_TEMPLATES = compile_templates({
+    "goodbye": "机器人: 再见！",
+    "timeout": "\n\n[系统提示] 用户操作超时（30秒），系统即将退出...",
+    "unknown_action": "机器人: 抱歉，我无法执行动作 '{action}'。",
+    "greet": "Hello! How can I assist you today?",
+    "ask_phone": "机器人: 请提供您的手机号码。",
+    "invalid_phone": "机器人: 抱歉，未能识别有效的手机号码。请重试。",
+    "order_info": "机器人: 您的订单信息如下：\n用户名：{user_name}\n订单状态：{order_status}",
+    "order_missing": "机器人: 抱歉，未能获取到您的订单信息。",
+    "ask_complaint": "机器人: 十分抱歉给您带来了不好的体验，我们愿意倾听您的意见，请您详细描述您遇到的问题，我们会尽快处理。",
+    "empty_complaint": "机器人: 您的输入不能为空，请重新描述您遇到的问题。",
+    "complaint_recorded": "机器人: 您的投诉内容已经记录，感谢您的反馈！",
+    "complaint_failed": "机器人: 抱歉，未能归纳总结您的投诉内容，请您重新描述您遇到的问题。",
+    "ask_preferences": "机器人: 请问您对商品有什么特殊要求吗？",
+    "recommendation": "机器人: 为您推荐以下商品：{recommendation}",
+    "recommendation_failed": "机器人: 抱歉，未能推荐商品。",
+    "membership_header": "机器人: 您的会员信息如下：",
+    "membership_missing": "机器人: 抱歉，未能获取到您的会员信息。",
+    "membership_card": "\n".join([
+        MEMBERSHIP_RULE,
+        "🎯 会员信息查询结果",
+        MEMBERSHIP_RULE,
+        "👤 用户名：{username}",
+        "📱 绑定手机号：{masked_phone}",
+        "🏷️  会员等级：{member_type}",
+        "{validity_desc}",
+        "📅 平台注册时间：{register_time}",
+        "{points_desc}",
+        MEMBERSHIP_RULE,
+    ]),
+    "apology": "很抱歉，我不明白你在说什么，请您再说一遍",
+    "shed_busy": "机器人: 您的上一个问题还在处理中，请稍候。",
+    "shed_overloaded": "机器人: 当前咨询人数较多，请您稍后再试。",
+})
 
 class Receiver:
-    def __init__(self):
+    def __init__(self, session_id: str = None, store: SessionStore = None,
+                 admission: AdmissionController = None, sink: ResponseSink = None):
+        """
+        :param session_id: 会话ID，传入已有会话ID即可接续该会话（可由任意进程处理），默认新建会话
+        :param store: 会话状态存储，默认使用进程共享的存储（环境变量 SESSION_STORE 配置）
+        :param admission: 准入控制器，默认使用进程共享的控制器（所有会话共用处理能力上限）
+        :param sink: 回复输出端，默认使用进程共享的输出端（环境变量 RESPONSE_SINK 配置，默认控制台）
+        """
         # 1. 获取当前文件的 Path 对象
         current_file_path = Path(__file__) # .../src/qwen/receiver.py
         log("QwenReceiver init", 3, str(current_file_path))
@@ -27,8 +84,8 @@ class Receiver:
             # 4. 使用 / 运算符拼接路径 (pathlib 的特性)
             intentsFilePath = project_root / 'config' / 'intents.yaml'
             
-            with open(intentsFilePath, 'r') as file:
-                self.intents = yaml.safe_load(file)
+            # 意图配置带缓存：同一进程内创建多个 Receiver 时不重复解析
+            self.intents = load_config(intentsFilePath, loader=yaml.safe_load)
 
             self.intents_type = self._extract_intents_for_nlp()
             self.intent_actions_map = self._extract_actions_for_nlp()
@@ -37,10 +94,22 @@ class Receiver:
             log(f"Error: intentions.yaml file not found in {intentsFilePath}", 1, str(current_file_path))
             self.intents = {}
 
-        #记录用户相关信息
-        self.phone_number=None
-        self.preferences=None
+        #记录用户相关信息（手机号、偏好等存放在会话存储中，见 phone_number / preferences 属性）
+        self.store = store or get_default_store()
+        self.session_id = session_id or uuid.uuid4().hex[:12]  # 会话ID，同时写入每条结构化日志
+        self.admission = admission or get_default_controller()
+        self._admitted = False  # 当前是否占用准入名额（等待用户输入期间释放）
         self.input_timeout = 30
+        self.profiler = None  # 可选的 SessionProfiler，由入口程序按需设置
+        # 本轮回复先写入缓冲，每轮结束或向用户提问前一次性输出
+        self.sink = sink or get_default_sink()
+        self.response = ResponseBuilder(REPLY_TEMPLATES)
+        # 会话记忆：最近若干轮原文 + 更早轮次的滚动摘要，总长度受 token 预算约束
+        self.memory = ConversationMemory()
+        self._memory_version = 0
+        self._restore_memory()
+        # 会话级预取：手机号验证通过后在后台加载订单、会员等数据，后续轮次直接从内存取
+        self.prefetcher = SessionPrefetcher()
 
         #意图行为字典
         self.action_handlers = {
@@ -55,6 +124,82 @@ class Receiver:
             "appology": self._appology
         }
 
+    @property
+    def phone_number(self):
+        return self.store.get_value(self.session_id, "phone_number")
+
+    @phone_number.setter
+    def phone_number(self, value):
+        self.store.set_value(self.session_id, "phone_number", value)
+
+    @property
+    def preferences(self):
+        return self.store.get_value(self.session_id, "preferences")
+
+    @preferences.setter
+    def preferences(self, value):
+        self.store.set_value(self.session_id, "preferences", value)
+
+    @property
+    def last_intent(self):
+        return self.store.get_value(self.session_id, "last_intent")
+
+    @last_intent.setter
+    def last_intent(self, value):
+        self.store.set_value(self.session_id, "last_intent", value)
+
+    def _restore_memory(self):
+        """
+        会话存储中的对话记忆比本地新时（例如上一轮由其他进程处理），加载到本地
+        """
+        state = self.store.get_value(self.session_id, "memory")
+        if state and state.get("version", 0) != self._memory_version:
+            self.memory.load_dict(state)
+            self._memory_version = state.get("version", 0)
+
+    def _save_memory(self):
+        """
+        每轮结束后把对话记忆写回会话存储
+        """
+        self._memory_version += 1
+        state = self.memory.to_dict()
+        state["version"] = self._memory_version
+        self.store.set_value(self.session_id, "memory", state)
+
+    def flush_response(self):
+        """
+        把缓冲的回复一次性写到输出端；输出端出错（如 socket 断开）只记录日志，不影响本轮的处理结果
+        """
+        try:
+            self.response.flush(self.sink, self.session_id)
+        except Exception as e:
+            metrics.incr("response.errors")
+            log(f"回复输出失败：{str(e)}", 1, __file__)
+
+    def _ask(self, prompt: str) -> str:
+        # 等待用户输入前先输出已缓冲的回复（其中通常包含提问）
+        self.flush_response()
+        with self._waiting_for_input():
+            return self._timeout_input(prompt)
+
+    @contextlib.contextmanager
+    def _waiting_for_input(self):
+        """
+        等待用户输入期间：不占用准入名额（全局并发与本会话的名额），输入后重新申请，申请被拒绝时抛出 Overloaded；
+        同时暂停性能剖析，剖析结果不含用户思考、输入的时间
+        """
+        admitted = self._admitted
+        if admitted:
+            self.admission.release(self.session_id)
+            self._admitted = False
+        try:
+            with self.profiler.paused() if self.profiler is not None else contextlib.nullcontext():
+                yield
+        finally:
+            if admitted:
+                self.admission.acquire(self.session_id)
+                self._admitted = True
+
     def _timeout_input(self, prompt: str = "请输入：", timeout: int = 30) -> str:
         """
         带超时的输入函数。
@@ -96,7 +241,8 @@ class Receiver:
         if t.is_alive():
             # 如果线程还活着，说明超时了
             # 先打印一个换行，避免光标停留在输入行
-            print("\n\n[系统提示] 用户操作超时（30秒），系统即将退出...")
+            self.response.render("timeout")
+            self.flush_response()
             
             # 强制退出整个程序
             # 注意：这里必须使用 os._exit 而不是 sys.exit
@@ -146,18 +292,50 @@ class Receiver:
         return actions_map
 
     def execute(self):
+        set_log_session(self.session_id)
         while True:
             user_input=self._timeout_input("您: ").strip()
             if user_input.lower() == 'exit':
-                print("机器人: 再见！")
+                self.response.render("goodbye")
+                self.flush_response()
+                self.prefetcher.cancel()
                 break
             if not user_input:
                 continue
-            user_intent = worker.recognize_intent(user_input, self.intents_type)
-            if user_intent is None:
-                user_intent = "DEFAULT"
-            self.handle_intent(user_intent)
+            self.process_turn(user_input)
+
+    def process_turn(self, user_input: str):
+        """
+        处理一轮对话：经过准入控制后识别意图并执行对应动作；系统过载时快速回复而不是排队等待
+        """
+        try:
+            self.admission.acquire(self.session_id)
+            self._admitted = True
+            with self._profile_turn():
+                self._restore_memory()
+                # 上下文只包含此前的对话，当前输入单独传入
+                context = self.memory.context()
+                user_intent = worker.recognize_intent(user_input, self.intents_type, context=context or None,
+                                                      previous_intent=self.last_intent)
+                self.memory.add("user", user_input)
+                if user_intent is None:
+                    user_intent = "DEFAULT"
+                self.last_intent = user_intent
+                self.handle_intent(user_intent)
+                self._save_memory()
+        except Overloaded as e:
+            log(f"系统繁忙，本轮请求被拒绝：{e.reason}", 2, __file__)
+            self._shed(e.reason)
+        finally:
+            if self._admitted:
+                self.admission.release(self.session_id)
+                self._admitted = False
+            self.flush_response()
             
+    def _profile_turn(self):
+        # 开启性能剖析时（见 src/utils/profiler.py）只剖析对话轮次的处理过程；轮次中等待用户输入的时间由 _ask 暂停剖析
+        return self.profiler.turn() if self.profiler is not None else contextlib.nullcontext()
+
     def handle_intent(self, intent: str):
         actions = self.intent_actions_map.get(intent)
         if not actions:
@@ -165,59 +343,59 @@ class Receiver:
             return
         for action in actions:
             func=self.action_handlers.get(action)
-            log(f"意图: {intent}, 动作: {action}, 函数: {func}", 2, __file__)
             if func:
-                func()
+                start = time.perf_counter()
+                try:
+                    func()
+                finally:
+                    # 动作抛出异常（如等待输入时系统过载）时同样记录耗时
+                    log(f"意图: {intent}, 动作: {action}, 函数: {func}", 2, __file__,
+                        duration_ms=(time.perf_counter() - start) * 1000)
             else:
                 log(f"未找到动作处理函数 '{action}'。", 2, __file__)
-                print(f"机器人: 抱歉，我无法执行动作 '{action}'。")
+                self.response.render("unknown_action", action=action)
 
     def _greet(self):
-        print("Hello! How can I assist you today?")
+        self.response.render("greet")
 
     def _check_phone_number(self):
         while not self.phone_number:
-            print("机器人: 请提供您的手机号码。")
-            phone = self._timeout_input("您（请输入手机号码）: ").strip()
+            self.response.render("ask_phone")
+            phone = self._ask("您（请输入手机号码）: ").strip()
             res=worker.pharse_phone_number(phone).strip()
             if res and res.isdigit() and len(res) == 11:
                 self.phone_number=res
             else:
-                print("机器人: 抱歉，未能识别有效的手机号码。请重试。")
+                self.response.render("invalid_phone")
+        # 手机号已确认（包括接续会话时已存在的手机号），预取该用户的数据；已在预取时不重复提交
+        self.prefetcher.start(self.phone_number)
                 
     def _get_order_info(self):
-        order_info = worker.get_order_info(self.phone_number)
+        order_info = self.prefetcher.fetch("order", self.phone_number)
         if order_info:
-            print(f"机器人: 您的订单信息如下：")
-            print(f"用户名：{order_info['user_name']}")
-            print(f"订单状态：{order_info['order_status']}")
+            self.response.render("order_info", user_name=order_info['user_name'],
+                                 order_status=order_info['order_status'])
         else:
-            print("机器人: 抱歉，未能获取到您的订单信息。")
+            self.response.render("order_missing")
 
     def _query_details(self):
-        # 动态计算JSON文件路径（基于当前文件的相对路径，不硬编码绝对路径）
-        # 当前文件（receiver.py）的绝对路径
-        current_file_path = os.path.abspath(__file__)
-        # 当前文件所在目录（src/qwen）
-        current_dir = os.path.dirname(current_file_path)
-        # 项目根目录（Intelligent_E-Commerce_Customer_Service）- 向上两级目录
-        project_root = os.path.abspath(os.path.join(current_dir, "../../"))
-        # 目标JSON文件路径（根目录/config/complain_summary.json）
-        json_path = os.path.join(project_root, "config", "complain_summary.json")
+        # 目标JSON文件路径（根目录/config/complain_summary.json，与投诉统计读取的原始记录为同一文件）
+        json_path = complaint_analytics.COMPLAINT_FILE
         
-        print("机器人: 十分抱歉给您带来了不好的体验，我们愿意倾听您的意见，请您详细描述您遇到的问题，我们会尽快处理。")
-        complaint = self._timeout_input("您（请输入投诉内容）: ").strip()
+        self.response.render("ask_complaint")
+        complaint = self._ask("您（请输入投诉内容）: ").strip()
         
         while True:
             # 确保用户输入不为空
             if not complaint:
-                print("机器人: 您的输入不能为空，请重新描述您遇到的问题。")
-                complaint = self._timeout_input("您（请输入投诉内容）: ").strip()
+                self.response.render("empty_complaint")
+                complaint = self._ask("您（请输入投诉内容）: ").strip()
                 continue
             
             complaint_summary = worker.query_details(complaint)
             if complaint_summary:
-                print(f"机器人: 您的投诉内容已经记录，感谢您的反馈！")
+                self.memory.add("user", complaint)
+                self.response.render("complaint_recorded")
                 
                 # 准备要写入的数据（包含时间戳、原始投诉、总结，便于后续分析）
                 complaint_data = {
@@ -226,6 +404,10 @@ class Receiver:
                     "summary": complaint_summary  # 投诉总结
                 }
                 
+                # 先加载投诉统计（没有快照时从原始记录重建）再追加原始记录，
+                # 否则首次重建会读到本条投诉，随后 record 又计一次
+                analytics = self._complaint_analytics()
+
                 # 处理JSON文件追加
                 try:
                     # 检查目录是否存在，不存在则创建
@@ -263,6 +445,7 @@ class Receiver:
                         json.dump(data_list, f, ensure_ascii=False, indent=2)
                     
                     log(f"投诉总结已成功保存至: {json_path}", 2, __file__)
+                    self._record_complaint_stats(analytics, complaint_data)
                     break
                 except Exception as e:
                     # 捕获所有异常，确保程序不崩溃
@@ -270,36 +453,56 @@ class Receiver:
                     break
             
             # 总结失败时提示用户重新输入
-            print("机器人: 抱歉，未能归纳总结您的投诉内容，请您重新描述您遇到的问题。")
-            complaint = self._timeout_input("您（请输入投诉内容）: ").strip()
+            self.response.render("complaint_failed")
+            complaint = self._ask("您（请输入投诉内容）: ").strip()
+
+    def _complaint_analytics(self):
+        # 统计失败不影响投诉记录本身
+        try:
+            return complaint_analytics.get_complaint_analytics()
+        except Exception as e:
+            log(f"加载投诉统计失败：{str(e)}", 2, __file__)
+            return None
+
+    def _record_complaint_stats(self, analytics, complaint_data: dict):
+        # 增量更新投诉统计（统计失败不影响投诉记录本身）
+        if analytics is None:
+            return
+        try:
+            analytics.record(complaint_data)
+        except Exception as e:
+            log(f"更新投诉统计失败：{str(e)}", 2, __file__)
 
     def _asking_preferences(self):
         while True:
             if not self.preferences:
-                print("机器人: 请问您对商品有什么特殊要求吗？")
-                self.preferences = self._timeout_input("您（请输入特殊要求）: ").strip()
+                self.response.render("ask_preferences")
+                self.preferences = self._ask("您（请输入特殊要求）: ").strip()
+                self.memory.add("user", self.preferences)
                 continue
             else:
                 break
 
     def _product_recommendation(self):
+        # 只按用户偏好推荐，不带本会话的对话上下文：不同会话的相同偏好共用推荐缓存
         res=worker.product_recommendation(self.preferences)
         if res:
-            print(f"机器人: 为您推荐以下商品：{res}")
+            self.memory.add("assistant", res)
+            self.response.render("recommendation", recommendation=res)
         else:
-            print("机器人: 抱歉，未能推荐商品。")
+            self.response.render("recommendation_failed")
             
     def _get_membership_info(self):
-        membership_info = worker.get_membership_info(self.phone_number)
+        membership_info = self.prefetcher.fetch("membership", self.phone_number)
         if membership_info:
-            print(f"机器人: 您的会员信息如下：")
+            self.response.render("membership_header")
             self._describe_membership_info(membership_info)
         else:
-            print("机器人: 抱歉，未能获取到您的会员信息。")
+            self.response.render("membership_missing")
             
     def _describe_membership_info(self, membership_info: dict):
         """
-        直接打印输出查询到的用户会员信息，格式清晰、友好易懂
+        输出查询到的用户会员信息（写入本轮回复），格式清晰、友好易懂
         兼顾隐私保护和信息完整性，处理字段缺失场景
         
         参数:
@@ -337,17 +540,16 @@ class Receiver:
         else:
             points_desc += "（可通过购物、完成平台任务累积，解锁更多福利）"
         
-        # 打印输出（分隔线+结构化信息，易读性强）
-        print("=" * 50)
-        print(f"🎯 会员信息查询结果")
-        print("=" * 50)
-        print(f"👤 用户名：{username}")
-        print(f"📱 绑定手机号：{masked_phone}")
-        print(f"🏷️  会员等级：{member_type}")
-        print(validity_desc)
-        print(f"📅 平台注册时间：{register_time}")
-        print(points_desc)
-        print("=" * 50)
+        # 输出（分隔线+结构化信息，易读性强）
+        self.response.render("membership_card", username=username, masked_phone=masked_phone,
+                             member_type=member_type, validity_desc=validity_desc,
+                             register_time=register_time, points_desc=points_desc)
         
     def _appology(self):
-        print("很抱歉，我不明白你在说什么，请您再说一遍")
\ No newline at end of file
+        self.response.render("apology")
+
+    def _shed(self, reason: str):
+        if reason == SHED_SESSION_BUSY:
+            self.response.render("shed_busy")
+        else:
+            self.response.render("shed_overloaded")
\ No newline at end of file
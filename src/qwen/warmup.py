@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+from urllib.parse import urlparse
+from src.utils.log import log
+from src.utils.lazy import LazyImport
+from src.utils.metrics import metrics
+from src.utils.config import load_config, CONFIG_DIR
+
+# 启动预热：部署后的第一位用户不再承担配置解析、提示词构建、DNS / TLS 建连和冷缓存的开销。
+# warm_up 依次执行各步骤（单步失败只记录日志，不阻止服务就绪），全部完成后才标记就绪：
+#   config   读取并解析全部配置数据，构建产品列式表；开启共享索引时挂接 / 发布索引
+#   prompts  导入 dashscope，按真实数据构建各函数的提示词（正则、编码器、token 估算等一并预热）
+#   connect  解析大模型服务域名并通过 SDK 共享的连接池预先建立连接
+#   replay   （可选）用一组常见输入走一遍完整的对话轮次，预热语义缓存、推荐缓存等
+WARMUP_ENABLED = os.getenv("WARMUP", "1") == "1"
+WARMUP_PRECONNECT = os.getenv("WARMUP_PRECONNECT", "1") == "1"
+WARMUP_CONNECT_TIMEOUT = float(os.getenv("WARMUP_CONNECT_TIMEOUT", "3"))  # 秒
+# 回放会真实调用大模型，默认关闭
+WARMUP_REPLAY = os.getenv("WARMUP_REPLAY", "0") == "1"
+WARMUP_REPLAY_FILE = os.getenv("WARMUP_REPLAY_FILE", os.path.join(CONFIG_DIR, "warmup_inputs.txt"))
+# 就绪后写入该文件（内容为各步骤耗时），供部署系统的就绪探针检查；为空则不写
+READY_FILE = os.getenv("READY_FILE", "")
+
+DEFAULT_BASE_URL = "https://dashscope.aliyuncs.com/api/v1"
+
+yaml = LazyImport("yaml")
+
+
+class Readiness:
+    """
+    就绪状态：预热完成前为未就绪，入口程序在就绪后才开始接收请求
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self.report = {}
+
+    def is_ready(self) -> bool:
+        return self._event.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._event.wait(timeout)
+
+    def mark_ready(self, report: dict = None, ready_file: str = None):
+        self.report = report or {}
+        self._event.set()
+        ready_file = READY_FILE if ready_file is None else ready_file
+        if ready_file:
+            directory = os.path.dirname(os.path.abspath(ready_file))
+            os.makedirs(directory, exist_ok=True)
+            temp_path = f"{ready_file}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.report, f, ensure_ascii=False)
+            os.replace(temp_path, ready_file)
+
+    def reset(self, ready_file: str = None):
+        """
+        恢复为未就绪（进程退出前调用，删除就绪文件）
+        """
+        self._event.clear()
+        ready_file = READY_FILE if ready_file is None else ready_file
+        if ready_file and os.path.exists(ready_file):
+            os.remove(ready_file)
+
+
+# 全局就绪状态
+readiness = Readiness()
+metrics.register_gauge("ready", lambda: 1 if readiness.is_ready() else 0)
+
+
+def _warm_config() -> dict:
+    from src.qwen import worker
+    from src.qwen.product_filter import get_product_table
+    from src.qwen.model_router import get_default_router
+    from src.utils.config import config_digest
+
+    files = 0
+    for name in sorted(os.listdir(CONFIG_DIR)):
+        path = os.path.join(CONFIG_DIR, name)
+        if name.endswith(".json"):
+            load_config(path)
+        elif name.endswith((".yaml", ".yml")):
+            load_config(path, loader=yaml.safe_load)
+        else:
+            continue
+        files += 1
+    get_default_router().routes()
+    product_list = load_config(os.path.join(CONFIG_DIR, "products.json"))
+    get_product_table(product_list, config_digest(os.path.join(CONFIG_DIR, "products.json")))
+    if worker.USE_SHARED_INDEX:
+        from src.utils.shared_index import get_shared_index, INDEX_SPECS
+        for name in INDEX_SPECS:
+            get_shared_index(name).refresh()
+    return {"files": files, "products": len(product_list)}
+
+
+def _warm_prompts() -> dict:
+    from src.qwen import worker
+    from src.qwen.classifier import load_intent_descriptions
+    from src.qwen.prompt_codec import encode_intents, messages_tokens
+
+    # 触发 dashscope 的延迟导入（首次调用大模型时的额外开销）
+    worker.Generation.call
+    intent_dict = load_intent_descriptions()
+    product_list = load_config(os.path.join(CONFIG_DIR, "products.json"))
+    prompts = [
+        worker._intent_messages("查一下我的订单", encode_intents(intent_dict), "用户：你好"),
+        worker._intent_slots_messages("查一下我的订单", intent_dict),
+        worker._phone_messages("我的手机号是13800000000"),
+        worker._complaint_messages("快递太慢了"),
+        worker._recommendation_messages("推荐手机", None, product_list),
+        worker._summary_messages("", [("user", "你好"), ("assistant", "您好")]),
+    ]
+    worker._structured_recommendation("3000以内的手机", product_list, None)
+    return {"prompts": len(prompts), "tokens": sum(messages_tokens(messages) for messages in prompts)}
+
+
+def _warm_connection() -> dict:
+    """
+    解析域名并通过 dashscope 的共享 requests 会话发一个轻量请求，使 TCP / TLS 连接留在连接池中
+    """
+    import dashscope
+    base_url = getattr(dashscope, "base_http_api_url", None) or DEFAULT_BASE_URL
+    parsed = urlparse(base_url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+    try:
+        from dashscope.api_entities.http_request import _get_shared_sync_session
+    except ImportError:
+        # 旧版本 dashscope 每次调用新建连接，只能预热 DNS
+        return {"host": parsed.hostname, "pooled": False}
+    # 任意状态码（404 等）都说明连接已建立
+    response = _get_shared_sync_session().get(base_url, timeout=WARMUP_CONNECT_TIMEOUT)
+    response.close()
+    return {"host": parsed.hostname, "pooled": True, "status": response.status_code}
+
+
+class _ReplayInputRequested(Exception):
+    pass
+
+
+def _replay_inputs(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def _warm_replay(inputs: list) -> dict:
+    """
+    用独立的会话存储和准入控制器回放常见输入；需要用户再次输入的动作（如投诉）在提问处中止，不产生副作用
+    """
+    from src.qwen.receiver import Receiver
+    from src.utils.session_store import InMemorySessionStore
+    from src.utils.admission import AdmissionController
+    from src.utils.response import MemorySink
+
+    class WarmupReceiver(Receiver):
+        def _timeout_input(self, prompt: str = "请输入：", timeout: int = 30) -> str:
+            raise _ReplayInputRequested(prompt)
+
+    order_data = load_config(os.path.join(CONFIG_DIR, "user_orders.json"))
+    completed = aborted = 0
+    # 回复写入内存，不输出到控制台
+    receiver = WarmupReceiver(session_id="warmup", store=InMemorySessionStore(), admission=AdmissionController(),
+                              sink=MemorySink())
+    receiver.phone_number = next(iter(order_data), None)
+    for text in inputs:
+        receiver.preferences = text
+        try:
+            receiver.process_turn(text)
+            completed += 1
+        except _ReplayInputRequested:
+            aborted += 1
+    receiver.prefetcher.cancel()
+    return {"inputs": len(inputs), "completed": completed, "aborted": aborted}
+
+
+def warm_up(replay: bool = None, preconnect: bool = None, replay_inputs: list = None,
+            ready_file: str = None) -> dict:
+    """
+    执行启动预热并标记就绪
+    :param replay: 是否回放常见输入，默认读取环境变量 WARMUP_REPLAY
+    :param preconnect: 是否预先连接大模型服务，默认读取环境变量 WARMUP_PRECONNECT
+    :param replay_inputs: 回放的输入，默认读取 WARMUP_REPLAY_FILE
+    :param ready_file: 就绪文件路径，默认读取环境变量 READY_FILE
+    :return: {步骤: {"ms": 耗时, "ok": 是否成功, ...步骤结果}}
+    """
+    replay = WARMUP_REPLAY if replay is None else replay
+    preconnect = WARMUP_PRECONNECT if preconnect is None else preconnect
+    steps = [("config", _warm_config), ("prompts", _warm_prompts)]
+    if preconnect:
+        steps.append(("connect", _warm_connection))
+    if replay:
+        inputs = replay_inputs if replay_inputs is not None else _replay_inputs(WARMUP_REPLAY_FILE)
+        steps.append(("replay", lambda: _warm_replay(inputs)))
+
+    report = {}
+    total_start = time.perf_counter()
+    for name, step in steps:
+        start = time.perf_counter()
+        try:
+            result = {"ok": True, **(step() or {})}
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+            log(f"预热步骤 {name} 失败：{str(e)}", 2, __file__)
+        result["ms"] = round((time.perf_counter() - start) * 1000, 2)
+        metrics.observe(f"warmup.{name}_ms", result["ms"])
+        report[name] = result
+    report["total_ms"] = round((time.perf_counter() - total_start) * 1000, 2)
+    readiness.mark_ready(report, ready_file)
+    log(f"启动预热完成，服务就绪：{json.dumps(report, ensure_ascii=False)}", 2, __file__)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="执行启动预热并输出各步骤耗时")
+    parser.add_argument("--replay", action="store_true", help="回放常见输入（会真实调用大模型）")
+    parser.add_argument("--no-connect", action="store_true", help="不预先连接大模型服务")
+    parser.add_argument("--ready-file", help="就绪后写入的文件")
+    args = parser.parse_args(argv)
+    report = warm_up(replay=args.replay, preconnect=not args.no_connect, ready_file=args.ready_file)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if all(step.get("ok", True) for step in report.values() if isinstance(step, dict)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,151 @@
 import os
 import json
-from typing import Optional
-from dashscope import Generation
+import time
+import hashlib
+import unicodedata
+from typing import Optional, Callable
 from src.utils.log import log
+from src.utils.lazy import LazyImport
+from src.utils.config import load_config, config_digest, clear_config_cache
+from src.utils.cache import LRUCache
+from src.utils.metrics import metrics
+from src.utils.semantic_cache import get_semantic_cache, clear_semantic_caches
+from src.utils.singleflight import SingleFlight
+from src.utils.admission import record_llm_latency
+from src.utils.tokens import estimate_tokens
+from src.utils.shared_index import get_shared_index, INDEX_SPECS
+from src.qwen.prompt_codec import (encode_intents, encode_products, enforce_budget, fit_section,
+                                    remaining_budget)
+from src.qwen.product_filter import get_product_table, parse_preferences, format_recommendation, CANDIDATE_LIMIT
+from src.qwen.model_router import get_default_router, usage_tracker
 from http import HTTPStatus
 from pathlib import Path
 
-def recognize_intent(user_input: str, intent_dict: dict) -> Optional[str]:
+# dashscope 导入耗时较长，延迟到第一次调用大模型时再真正导入
+Generation = LazyImport("dashscope", "Generation")
+
+# 产品推荐结果缓存：key = (归一化后的偏好, products.json 内容摘要)，产品库一改动旧结果自动失效
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "256"))
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "600"))  # 秒
+_recommendation_cache = LRUCache(maxsize=RECOMMENDATION_CACHE_SIZE, ttl=RECOMMENDATION_CACHE_TTL)
+metrics.register_gauge("recommendation_cache.hit_rate", _recommendation_cache.hit_rate)
+metrics.register_gauge("recommendation_cache.size", lambda: len(_recommendation_cache))
+
+# 多进程部署时设置 SHARED_INDEX=1：订单、会员、产品数据从共享的只读索引（mmap）查询，
+# 各进程不再各自解析并持有整份 JSON，源文件变化后自动发布新版本（见 src/utils/shared_index.py）
+USE_SHARED_INDEX = os.getenv("SHARED_INDEX", "0") == "1"
+# 数据文件超过该大小（MB）时即使未设置 SHARED_INDEX 也走共享索引：索引由流式解析构建，不再整份 json.load 进内存
+LARGE_DATA_FILE_BYTES = int(float(os.getenv("LARGE_DATA_FILE_MB", "64")) * 1024 * 1024)
+
+# 产品推荐前先在本地解析偏好中的价格、品牌、类型、好评率等条件并筛选排序（见 src/qwen/product_filter.py），
+# 条件全部可结构化时直接回答，不调用大模型；设置 STRUCTURED_RECOMMENDATION=0 关闭
+STRUCTURED_RECOMMENDATION = os.getenv("STRUCTURED_RECOMMENDATION", "1") == "1"
+
+# 产品推荐的生成参数
+RECOMMENDATION_PARAMS = {
+    "result_format": "message",
+    "temperature": 0.3,  # 降低随机性，确保推荐结果更精准
+    "top_p": 0.8,        # 控制生成的多样性
+}
+
+# 对话摘要超过该长度视为不合格（提示词要求不超过100字），按路由配置升级模型重新生成
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "200"))
+
+# 进行中请求合并：同一输入的并发请求共享一次大模型调用
+_intent_flight = SingleFlight("recognize_intent")
+_recommendation_flight = SingleFlight("product_recommendation")
+
+def _response_content(response) -> Optional[str]:
+    """
+    取出大模型回复文本，响应结构不完整时返回None
+    """
+    try:
+        content = response.output.choices[0].message.content
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return None
+    return content if isinstance(content, str) else None
+
+def _response_failed(response) -> bool:
+    """
+    接口返回了错误状态码（dashscope 出错时不抛异常，而是返回非 200 的响应）
+    """
+    status_code = getattr(response, "status_code", HTTPStatus.OK)
+    return isinstance(status_code, int) and status_code != HTTPStatus.OK
+
+def _response_ok(response, validate: Optional[Callable[[str], bool]]) -> bool:
+    """
+    本次调用是否成功且输出合格（不合格时按路由配置升级模型）
+    """
+    if response is None or _response_failed(response):
+        return False
+    if validate is None:
+        return True
+    content = _response_content(response)
+    return content is not None and validate(content.strip())
+
+def _record_usage(function: str, model: str, messages: list, response, latency_ms: float, ok: bool,
+                  escalated: bool):
+    usage = getattr(response, "usage", None)
+    input_tokens = getattr(usage, "input_tokens", None)
+    output_tokens = getattr(usage, "output_tokens", None)
+    estimated = not isinstance(input_tokens, int) or not isinstance(output_tokens, int)
+    if estimated:
+        # 响应中没有用量（调用异常、桩数据等）时本地估算
+        input_tokens = sum(estimate_tokens(message.get("content", "")) for message in messages)
+        output_tokens = estimate_tokens(_response_content(response) or "") if response is not None else 0
+    usage_tracker.record(function, model, input_tokens, output_tokens, latency_ms, ok=ok, escalated=escalated,
+                         estimated=estimated)
+
+def _call_llm(function: str, validate: Optional[Callable[[str], bool]] = None, **kwargs):
+    """
+    调用通义千问（其余参数同 Generation.call，不需要传 model）：
+    - 按 config/model_routing.yaml 为 function 选择模型，首选模型调用失败或输出不合格（validate 返回False）时升级到下一个模型
+    - 按函数、模型记录 token 用量和延迟，并上报延迟供准入控制自适应调整并发
+    最后一个模型的异常直接抛出，输出不合格时也原样返回，由调用方按原有逻辑处理
+    """
+    messages = kwargs.get("messages") or []
+    models = get_default_router().candidates(function, messages)
+    if not models:
+        # 路由至少给出一个模型；为空时明确报错，而不是返回 None
+        raise ValueError(f"{function} 没有可用的模型")
+    for index, model in enumerate(models):
+        last = index == len(models) - 1
+        response = None
+        start = time.perf_counter()
+        try:
+            response = Generation.call(model=model, **kwargs)
+        except Exception as e:
+            if last:
+                raise
+            log(f"{function} 调用 {model} 失败，升级到 {models[index + 1]}：{str(e)}", 2, __file__)
+            continue
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            record_llm_latency(latency_ms)
+            ok = _response_ok(response, validate)
+            _record_usage(function, model, messages, response, latency_ms, ok, escalated=not ok and not last)
+        if ok or last:
+            return response
+        log(f"{function} 使用 {model} 的输出不合格，升级到 {models[index + 1]}", 2, __file__)
+
+def clear_caches():
+    """
+    清空 worker 使用的所有缓存（配置文件缓存、推荐结果缓存、语义缓存）
+    """
+    clear_config_cache()
+    _recommendation_cache.clear()
+    clear_semantic_caches()
+
+def recognize_intent(user_input: str, intent_dict: dict, context: Optional[str] = None,
+                     previous_intent: Optional[str] = None) -> Optional[str]:
     """
     识别用户输入的意图（从意图字典中选择最匹配的标签）
     
     参数:
         user_input: 用户输入的文本
         intent_dict: 意图字典，包含意图标签和描述（格式：{标签: 描述, ...}）
+        context: 可选的对话上下文（历史摘要 + 最近轮次），仅用于辅助理解当前输入
+        previous_intent: 可选，本会话上一轮的意图；作为粗粒度的上下文信号区分缓存（不按会话原文区分，不同会话可共用）
     返回:
         意图标签（字符串），仅在自身逻辑异常时返回None；第三方/未知异常直接抛出
     """
@@ -24,21 +157,40 @@ def recognize_intent(user_input: str, intent_dict: dict) -> Optional[str]:
         log("意图字典为空或非字典类型", 2, __file__)
         return None
 
-    # 2. 意图字典JSON序列化（自身逻辑异常：主动处理）
+    # 2. 意图字典紧凑序列化（自身逻辑异常：主动处理）
     try:
-        intent_json_str = json.dumps(intent_dict, ensure_ascii=False, indent=2)
-    except json.JSONEncodeError as e:
+        intent_json_str = encode_intents(intent_dict)
+    except (TypeError, ValueError) as e:
         log(f"意图字典JSON序列化失败：{str(e)}，字典内容：{intent_dict}", 1, __file__)
         return None
 
-    # 3. 构建系统提示和对话消息（无异常风险，不处理）
-    system_prompt = f"""你是意图识别工具，需从以下意图标签中选择最匹配的一个：
-    {intent_json_str}仅返回标签本身，不添加任何额外内容。"""
+    # 查询语义缓存：与历史输入语义相近（如换种说法）时直接复用意图，不同意图字典、不同的上一轮意图互不命中
+    semantic_cache = get_semantic_cache("recognize_intent")
+    cache_scope = _intent_cache_scope(intent_json_str, previous_intent)
+    if semantic_cache is not None:
+        hit = semantic_cache.lookup(user_input, scope=cache_scope)
+        if hit is not None and hit[0] in intent_dict:
+            log(f"意图识别命中语义缓存（相似度{hit[1]}）：{hit[0]}", 3, __file__)
+            return hit[0]
 
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_input.strip()}
-    ]
+    # 相同的请求正在调用大模型时（如同一时刻大量用户输入"查订单"），等待那一次的结果，不重复调用
+    flight_key = (user_input.strip(), cache_scope)
+    return _intent_flight.do(flight_key, lambda: _recognize_intent_llm(
+        user_input, intent_dict, intent_json_str, context, semantic_cache, cache_scope))
+
+def _intent_cache_scope(intent_json_str: str, previous_intent: Optional[str]) -> str:
+    """
+    意图缓存的 scope：意图字典 + 上一轮意图（同一句话如"好的"在不同的上一轮之后可能是不同意图）
+    """
+    return hashlib.sha1(f"{intent_json_str}\0{previous_intent or ''}".encode("utf-8")).hexdigest()
+
+def _recognize_intent_llm(user_input: str, intent_dict: dict, intent_json_str: str, context: Optional[str],
+                          semantic_cache, cache_scope: str) -> Optional[str]:
+    """
+    recognize_intent 未命中缓存时的大模型调用部分（同 key 的并发请求只执行一次）
+    """
+    # 3. 构建系统提示和对话消息（无异常风险，不处理）
+    messages = _intent_messages(user_input, intent_json_str, context)
 
     # 4. API密钥验证（自身逻辑异常：主动处理）
     api_key = os.getenv("DASHSCOPE_API_KEY")
@@ -50,32 +202,151 @@ def recognize_intent(user_input: str, intent_dict: dict) -> Optional[str]:
         return None
 
     # 5. 调用通义千问API（第三方异常：不捕获，直接抛出）
-    response = Generation.call(
+    response = _call_llm(
+        "recognize_intent",
+        validate=lambda content: content in intent_dict,
         api_key=api_key,
-        model="tongyi-intent-detect-v3",
         messages=messages,
         result_format="message",
     )
 
-    if response is None:
+    detected_intent = _intent_from_response(response, intent_dict)
+    if detected_intent is None:
         return "DEFAULT"
-    
-    # 6. 解析API响应（第三方响应格式异常：不捕获，直接抛出）
+    if semantic_cache is not None:
+        semantic_cache.add(user_input, detected_intent, scope=cache_scope)
+    return detected_intent
+
+def _intent_messages(user_input: str, intent_json_str: str, context: Optional[str]) -> list:
+    """
+    意图识别的消息体（同步 / 异步版本共用）
+    """
+    system_prompt = f"""你是意图识别工具，需从以下意图标签中选择最匹配的一个：
+    {intent_json_str}仅返回标签本身，不添加任何额外内容。"""
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_input.strip()}
+    ]
+    if context:
+        # 上下文超出预算时保留最近的部分
+        header = """
+    以下是此前的对话上下文，仅供理解用户当前这句话，请识别当前这句话的意图：
+    """
+        available = remaining_budget("recognize_intent", messages)
+        context = fit_section("recognize_intent", context,
+                              None if available is None else available - estimate_tokens(header), keep="tail")
+        if context:
+            messages[0]["content"] += header + context
+    return enforce_budget("recognize_intent", messages)
+
+def _intent_from_response(response, intent_dict: dict) -> Optional[str]:
+    """
+    解析意图识别的API响应（第三方响应格式异常：不捕获，直接抛出）
+    :return: 意图标签；无响应或意图不在字典中时返回None（调用方按 DEFAULT 处理，且不写入缓存）
+    """
+    if response is None:
+        return None
+
     # 检查响应结构完整性
     if not hasattr(response, "output"):
         raise AttributeError("API响应缺少output字段")
     if not response.output.choices:
         raise IndexError("API响应的choices列表为空")
-    
+
     detected_intent = response.output.choices[0].message.content.strip()
-    
+
     # 验证结果是否在意图字典中（自身逻辑校验：主动处理）
     if detected_intent not in intent_dict:
         log(f"API返回的意图不在字典中：{detected_intent}，可选意图：{list(intent_dict.keys())}", 1, __file__)
-        return "DEFAULT"
-
+        return None
     return detected_intent
 
+def recognize_intent_with_slots(user_input: str, intent_dict: dict) -> Optional[dict]:
+    """
+    一次调用同时识别意图并抽取手机号（替代 recognize_intent + pharse_phone_number 两次调用的候选方案）
+    
+    参数:
+        user_input: 用户输入的文本
+        intent_dict: 意图字典（格式：{标签: 描述, ...}）
+    返回:
+        {"intent": 意图标签, "phone_number": 手机号或None}；输入无效或模型输出无法解析时返回None
+    """
+    if not isinstance(user_input, str) or not user_input.strip():
+        log("用户输入为空或非字符串类型", 2, __file__)
+        return None
+    if not isinstance(intent_dict, dict) or not intent_dict:
+        log("意图字典为空或非字典类型", 2, __file__)
+        return None
+
+    messages = _intent_slots_messages(user_input, intent_dict)
+
+    api_key = os.getenv("DASHSCOPE_API_KEY")
+    if not api_key:
+        log("环境变量DASHSCOPE_API_KEY未设置或为空", 1, __file__)
+        return None
+
+    response = _call_llm(
+        "recognize_intent_with_slots",
+        validate=lambda content: _parse_json_reply(content) is not None,
+        api_key=api_key,
+        messages=messages,
+        result_format="message",
+    )
+
+    return _slots_from_response(response, intent_dict)
+
+def _intent_slots_messages(user_input: str, intent_dict: dict) -> list:
+    system_prompt = f"""你是意图识别与信息抽取工具，需从以下意图标签中选择最匹配的一个，并抽取用户提供的手机号码（11位数字）：
+    {encode_intents(intent_dict)}
+    仅返回JSON，格式为 {{"intent": "意图标签", "phone_number": "手机号码，没有则为空字符串"}}，不添加任何额外内容。"""
+    return enforce_budget("recognize_intent_with_slots", [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_input.strip()}
+    ])
+
+def _slots_from_response(response, intent_dict: dict) -> Optional[dict]:
+    content = response.output.choices[0].message.content.strip()
+    result = _parse_json_reply(content)
+    if result is None:
+        log(f"意图与手机号联合识别的输出不是合法JSON：{content}", 2, __file__)
+        return None
+
+    intent = result.get("intent")
+    if intent not in intent_dict:
+        log(f"API返回的意图不在字典中：{intent}", 2, __file__)
+        intent = "DEFAULT"
+    phone_number = str(result.get("phone_number") or "").strip()
+    if not (phone_number.isdigit() and len(phone_number) == 11):
+        phone_number = None
+    return {"intent": intent, "phone_number": phone_number}
+
+def _parse_json_reply(content: str) -> Optional[dict]:
+    """
+    解析模型输出的JSON对象（兼容用 ```json 代码块包裹的情况），无法解析时返回None
+    """
+    content = content.removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+    try:
+        result = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    return result if isinstance(result, dict) else None
+
+def _phone_messages(user_input: str) -> list:
+    system_prompt = f"""你是电话号码识别工具，需从以下聊天记录中识别出手机号码，仅返回手机号码本身，不添加任何额外内容。
+    假设手机号码为11位数字。若未找到手机号码，则返回空字符串。"""
+
+    return enforce_budget("pharse_phone_number", [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_input.strip()}
+    ])
+
+def _is_phone_reply(content: str) -> bool:
+    """
+    手机号抽取的输出是否合格：空字符串（未找到）或 11 位数字
+    """
+    return content == "" or (content.isdigit() and len(content) == 11)
+
 def pharse_phone_number(user_input: str) -> Optional[str]:
     """
     从文本中提取手机号码（假设手机号码为11位数字）
@@ -90,13 +361,7 @@ def pharse_phone_number(user_input: str) -> Optional[str]:
         log("用户输入为空或非字符串类型", 2, __file__)
         return None
     
-    system_prompt = f"""你是电话号码识别工具，需从以下聊天记录中识别出手机号码，仅返回手机号码本身，不添加任何额外内容。
-    假设手机号码为11位数字。若未找到手机号码，则返回空字符串。"""
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_input.strip()}
-    ]
+    messages = _phone_messages(user_input)
 
     # API密钥验证（自身逻辑异常：主动处理）
     api_key = os.getenv("DASHSCOPE_API_KEY")
@@ -108,9 +373,10 @@ def pharse_phone_number(user_input: str) -> Optional[str]:
         return None
 
     # 调用通义千问API（第三方异常：不捕获，直接抛出）
-    response = Generation.call(
+    response = _call_llm(
+        "pharse_phone_number",
+        validate=_is_phone_reply,
         api_key=api_key,
-        model="qwen-plus",
         messages=messages,
         result_format="message",
     )
@@ -135,6 +401,12 @@ def get_order_info(phone_number: str) -> Optional[dict]:
         log("手机号码格式不正确", 2, __file__)
         return None
     
+    if _use_shared_index("orders"):
+        order = _shared_lookup("orders", phone_number)
+        if order is None:
+            log(f"未查询到手机号 {phone_number} 对应的订单", 2, __file__)
+        return order
+    
     # 1. 动态获取项目根目录（基于当前文件的相对路径计算）
     # 当前文件路径：worker.py -> 所在目录：src/qwen/
     # 项目根目录 = worker.py目录 -> 上两级目录（src/ -> 项目根目录）
@@ -154,9 +426,8 @@ def get_order_info(phone_number: str) -> Optional[dict]:
         return None
     
     try:
-        # 读取JSON文件（指定utf-8编码避免中文乱码）
-        with open(order_file_path, 'r', encoding='utf-8') as f:
-            order_data = json.load(f)  # 加载JSON数据（电话号码为key）
+        # 读取JSON文件（带缓存，文件未变更时不重复解析）
+        order_data = load_config(order_file_path)  # 加载JSON数据（电话号码为key）
         
         # 主键查询：检查手机号是否存在
         if phone_number in order_data:
@@ -189,21 +460,18 @@ def query_details(complaint: str) -> Optional[str]:
         log("投诉内容为空", 2, __file__)
         return None
     
-    system_prompt = f"""你是投诉内容识别工具，需从以下聊天记录中归纳总结投诉内容，帮助客户经理快速理解用户需求，仅返回归纳总结后的投诉内容本身，不添加任何额外内容。"""
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": complaint.strip()}
-    ]
+    # 归纳结果作为该用户的投诉记录保存，不使用语义缓存（相似的投诉可能来自不同用户、内容细节不同）
+    messages = _complaint_messages(complaint)
     
     api_key = os.getenv("DASHSCOPE_API_KEY")
     if not api_key:
         log("环境变量DASHSCOPE_API_KEY未设置或为空", 1, __file__)
         return None
     
-    response = Generation.call(
+    response = _call_llm(
+        "query_details",
+        validate=bool,
         api_key=api_key,
-        model="qwen-plus",
         messages=messages,
         result_format="message",
     )
@@ -213,10 +481,27 @@ def query_details(complaint: str) -> Optional[str]:
         return None
     return complaint_summary
 
-def product_recommendation(preferences: str) -> str | None:
+def _complaint_messages(complaint: str) -> list:
+    system_prompt = f"""你是投诉内容识别工具，需从以下聊天记录中归纳总结投诉内容，帮助客户经理快速理解用户需求，仅返回归纳总结后的投诉内容本身，不添加任何额外内容。"""
+
+    return enforce_budget("query_details", [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": complaint.strip()}
+    ])
+
+def _normalize_preferences(preferences: str) -> str:
+    """
+    归一化用户偏好文本，作为缓存键：全半角统一、转小写、去掉空白和标点
+    例如 "推荐 手机！" 与 "推荐手机" 视为相同的偏好
+    """
+    text = unicodedata.normalize("NFKC", preferences).lower()
+    return "".join(ch for ch in text if not ch.isspace() and not unicodedata.category(ch).startswith("P"))
+
+def product_recommendation(preferences: str, context: Optional[str] = None) -> str | None:
     """
     根据用户偏好推荐产品
     :param preferences: 用户偏好描述字符串
+    :param context: 可选的对话上下文（历史摘要 + 最近轮次），帮助理解偏好
     :return: 通义千问返回的产品推荐结果，失败返回None
     """
 
@@ -224,6 +509,58 @@ def product_recommendation(preferences: str) -> str | None:
         log("用户偏好描述为空", 2, __file__)
         return None
     
+    product_list, catalog_version = _shared_catalog() if _use_shared_index("products") else _load_catalog()
+    if product_list is None or not _check_product_list(product_list):
+        return None
+    
+    # 本地结构化筛选：能直接回答时不调用大模型，否则只把候选产品发给大模型
+    answer, product_list = _structured_recommendation(preferences, product_list, catalog_version)
+    if answer is not None:
+        return answer
+    
+    # 查询推荐缓存（产品库版本号变化后旧缓存不会再命中）
+    cache_key = _recommendation_cache_key(preferences, catalog_version, context)
+    recommendation = _cached_recommendation(cache_key)
+    if recommendation is not None:
+        return recommendation
+    
+    # 相同偏好的推荐正在进行时，等待那一次的结果，不重复调用
+    flight_key = (_normalize_preferences(preferences), catalog_version, context or "")
+    return _recommendation_flight.do(flight_key, lambda: _product_recommendation_llm(
+        preferences, context, product_list, cache_key))
+
+def _structured_recommendation(preferences: str, product_list: list, catalog_version: Optional[str]) -> tuple:
+    """
+    解析偏好中的硬性条件，在列式产品库上一次完成过滤与排序
+    :return: (直接回答, 交给大模型的产品列表)；直接回答不为None时无需调用大模型
+    """
+    if not STRUCTURED_RECOMMENDATION:
+        return None, product_list
+    try:
+        table = get_product_table(product_list, catalog_version)
+        constraints = parse_preferences(preferences, table)
+        if constraints.empty or constraints.unresolved_negation:
+            # 没有条件，或有未能理解的否定（条件可能被理解反），交给大模型看完整产品库
+            return None, product_list
+        ranked = table.rank(constraints)
+    except Exception as e:
+        log(f"产品结构化筛选失败，使用完整产品库：{str(e)}", 2, __file__)
+        return None, product_list
+    log(f"产品偏好解析：{constraints}，匹配 {len(ranked)}/{len(table)} 个产品", 3, __file__)
+    if constraints.fully_structured:
+        metrics.incr("recommendation.structured_answers")
+        return format_recommendation(ranked, constraints), product_list
+    if not ranked:
+        # 还有未结构化的偏好，可能是条件解析有误，不据此直接回答"未找到"
+        return None, product_list
+    metrics.incr("recommendation.prefiltered")
+    return None, ranked[:CANDIDATE_LIMIT]
+
+def _load_catalog() -> tuple:
+    """
+    读取产品库 products.json
+    :return: (产品列表, 内容摘要作为版本号)；失败时返回 (None, None)
+    """
     # 1. 动态计算products.json路径（跨机器兼容，基于当前文件相对路径）
     current_file = os.path.abspath(__file__)
     current_dir = os.path.dirname(current_file)
@@ -234,31 +571,89 @@ def product_recommendation(preferences: str) -> str | None:
     try:
         if not os.path.exists(products_json_path):
             log(f"产品配置文件不存在：{products_json_path}", 2, __file__)
-            return None
+            return None, None
         
-        with open(products_json_path, 'r', encoding='utf-8') as f:
-            try:
-                product_list = json.load(f)
-                # 验证JSON格式是否为列表，且每个产品包含必填字段
-                required_fields = ["产品类型", "热度", "品牌", "名字", "描述", "功能"]
-                if not isinstance(product_list, list) or len(product_list) == 0:
-                    log("products.json格式错误：必须是非空列表", 2, __file__)
-                    return None
-                
-                # 验证每个产品的必填字段
-                for idx, product in enumerate(product_list):
-                    missing_fields = [field for field in required_fields if field not in product]
-                    if missing_fields:
-                        log(f"产品{idx+1}缺少必填字段：{','.join(missing_fields)}", 1, __file__)
-                        continue  # 跳过字段不完整的产品
-            
-            except json.JSONDecodeError as e:
-                log(f"products.json解析失败：{str(e)}", 2, __file__)
-                return None
+        try:
+            product_list = load_config(products_json_path)
+        except json.JSONDecodeError as e:
+            log(f"products.json解析失败：{str(e)}", 2, __file__)
+            return None, None
     except Exception as e:
         log(f"读取产品文件时发生错误：{str(e)}", 2, __file__)
+        return None, None
+    return product_list, config_digest(products_json_path)
+
+def _check_product_list(product_list) -> bool:
+    """
+    验证产品库格式：必须是非空列表；缺少必填字段的产品只记录日志
+    """
+    required_fields = ["产品类型", "热度", "品牌", "名字", "描述", "功能"]
+    if not isinstance(product_list, list) or len(product_list) == 0:
+        log("products.json格式错误：必须是非空列表", 2, __file__)
+        return False
+
+    # 验证每个产品的必填字段
+    for idx, product in enumerate(product_list):
+        missing_fields = [field for field in required_fields if field not in product]
+        if missing_fields:
+            log(f"产品{idx+1}缺少必填字段：{','.join(missing_fields)}", 1, __file__)
+            continue  # 跳过字段不完整的产品
+    return True
+
+def _recommendation_cache_key(preferences: str, catalog_version: Optional[str],
+                              context: Optional[str]) -> Optional[tuple]:
+    """
+    推荐缓存键：归一化的偏好 + 产品库版本，不同会话的相同偏好共用缓存
+    :return: 缓存键；产品库没有版本号，或带有对话上下文（提示词因会话而异，结果不能给其他会话复用）时返回None（不缓存）
+    """
+    if not catalog_version or context:
+        return None
+    return _normalize_preferences(preferences), catalog_version
+
+def _cached_recommendation(cache_key: Optional[tuple]) -> Optional[str]:
+    """
+    查询推荐缓存，命中时累计节省的字节数
+    """
+    if cache_key is None:
+        return None
+    cached = _recommendation_cache.get(cache_key)
+    if cached is None:
+        metrics.incr("recommendation_cache.misses")
+        return None
+    recommendation, saved_bytes = cached
+    metrics.incr("recommendation_cache.hits")
+    metrics.incr("recommendation_cache.bytes_saved", saved_bytes)
+    log(f"产品推荐命中缓存：{cache_key[0]}", 3, __file__)
+    return recommendation
+
+def _product_recommendation_llm(preferences: str, context: Optional[str], product_list: list,
+                                cache_key: Optional[tuple]) -> Optional[str]:
+    """
+    product_recommendation 未命中缓存时的大模型调用部分（同 key 的并发请求只执行一次）
+    """
+    messages = _recommendation_messages(preferences, context, product_list)
+    
+    # 5. 调用通义千问API
+    api_key = os.getenv("DASHSCOPE_API_KEY")
+    if not api_key:
+        log("环境变量DASHSCOPE_API_KEY未设置或为空", 1, __file__)
         return None
     
+    try:
+        response = _call_llm(
+            "product_recommendation",
+            validate=bool,
+            api_key=api_key,
+            messages=messages,
+            **RECOMMENDATION_PARAMS
+        )
+        return _recommendation_from_response(response, messages, cache_key)
+
+    except Exception as e:
+        log(f"产品推荐过程中发生未知错误：{str(e)}", 2, __file__)
+        return None
+
+def _recommendation_messages(preferences: str, context: Optional[str], product_list: list) -> list:
     # 3. 构建提示词（清晰告知AI任务、产品库、输出要求）
     system_prompt = """你是专业的电商产品推荐助手，需要根据用户的偏好描述，从提供的产品库中推荐最匹配的产品。
     要求：
@@ -269,47 +664,103 @@ def product_recommendation(preferences: str) -> str | None:
     5. 输出格式清晰易读，分点列出推荐结果，不添加任何额外内容
     6. 如果没有匹配的产品，直接返回"未找到符合您偏好的产品，建议尝试其他描述
     7. 谨记，你只需要输出推荐结果，不需要输出任何其他内容。
-    产品库数据：
-    {}""".format(json.dumps(product_list, ensure_ascii=False, indent=0))  # 序列化产品库为字符串
-
+    产品库数据（第一行为字段名对照，之后每行一个产品）：
+    """
+    context_part = ""
+    if context:
+        context_part = """
+    此前的对话上下文（仅供理解用户偏好参考）：
+    """
+    
     # 4. 构建消息体（遵循通义千问API调用格式）
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": preferences.strip()}
     ]
     
-    # 5. 调用通义千问API
+    # 预算分配：上下文最多占四分之一（保留最近的部分），其余留给产品库，产品按顺序装入直到用完预算
+    available = remaining_budget("product_recommendation", messages)
+    if context:
+        context_budget = None if available is None else available // 4 - estimate_tokens(context_part)
+        context_part += fit_section("product_recommendation", context, context_budget, keep="tail")
+        if available is not None:
+            available -= estimate_tokens(context_part)
+    catalog, sent = encode_products(product_list, budget=available)
+    if sent < len(product_list):
+        metrics.incr("prompt.product_recommendation.truncated")
+        log(f"产品库超出提示词预算，只发送前 {sent}/{len(product_list)} 个产品", 3, __file__)
+    messages[0]["content"] = system_prompt + catalog + context_part
+    return enforce_budget("product_recommendation", messages)
+
+def _recommendation_from_response(response, messages: list, cache_key: Optional[tuple]) -> Optional[str]:
+    # 验证响应状态
+    if response.status_code != HTTPStatus.OK:
+        log(f"API调用失败，状态码：{response.status_code}，错误信息：{response.message}", 2, __file__)
+        return None
+
+    # 提取推荐结果
+    recommendation = response.output.choices[0].message.content.strip()
+    if not recommendation:
+        log("API返回空的推荐结果", 1, __file__ )
+        return None
+
+    # 写入缓存，同时记录一次调用的请求+响应字节数，命中时累计为节省的字节数
+    if cache_key is not None:
+        call_bytes = sum(len(message["content"].encode("utf-8")) for message in messages)
+        call_bytes += len(recommendation.encode("utf-8"))
+        _recommendation_cache.set(cache_key, (recommendation, call_bytes))
+
+    return recommendation
+
+def summarize_conversation(summary: str, turns: list) -> Optional[str]:
+    """
+    增量更新对话摘要：把新溢出的若干轮对话合并进已有摘要
+    
+    参数:
+        summary: 已有的滚动摘要（可为空字符串）
+        turns: 新增需要折叠的对话轮次 [(角色, 文本), ...]，角色为 "user" / "assistant"
+    返回:
+        新的摘要字符串，失败返回None（调用方自行降级处理）
+    """
+    if not turns:
+        return summary or None
+    
+    messages = _summary_messages(summary, turns)
+    
     api_key = os.getenv("DASHSCOPE_API_KEY")
     if not api_key:
         log("环境变量DASHSCOPE_API_KEY未设置或为空", 1, __file__)
         return None
     
-    try:
-        response = Generation.call(
-            api_key=api_key,
-            model="qwen-plus",
-            messages=messages,
-            result_format="message",
-            temperature=0.3,  # 降低随机性，确保推荐结果更精准
-            top_p=0.8  # 控制生成的多样性
-        )
-        
-        # 验证响应状态
-        if response.status_code != HTTPStatus.OK:
-            log(f"API调用失败，状态码：{response.status_code}，错误信息：{response.message}", 2, __file__)
-            return None
-        
-        # 提取推荐结果
-        recommendation = response.output.choices[0].message.content.strip()
-        if not recommendation:
-            log("API返回空的推荐结果", 1, __file__ )
-            return None
-        
-        return recommendation
-
-    except Exception as e:
-        log(f"产品推荐过程中发生未知错误：{str(e)}", 2, __file__)
+    response = _call_llm(
+        "summarize_conversation",
+        validate=lambda content: 0 < len(content) <= SUMMARY_MAX_CHARS,
+        api_key=api_key,
+        messages=messages,
+        result_format="message",
+    )
+    
+    new_summary = response.output.choices[0].message.content.strip()
+    if new_summary == "":
         return None
+    return new_summary
+
+def _summary_messages(summary: str, turns: list) -> list:
+    role_names = {"user": "用户", "assistant": "客服"}
+    dialogue = "\n".join(f"{role_names.get(role, role)}：{text}" for role, text in turns)
+
+    system_prompt = """你是客服对话摘要工具，需要把"已有摘要"和"新增对话"合并成一段新的摘要。
+    要求：保留用户身份信息、诉求、偏好和尚未解决的问题，删除寒暄等无关内容，不超过100字，仅返回摘要本身。"""
+    user_content = f"已有摘要：{summary or '无'}\n新增对话：\n"
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+    # 对话记录超出预算时保留最近的部分
+    dialogue = fit_section("summarize_conversation", dialogue,
+                           remaining_budget("summarize_conversation", messages), keep="tail")
+    messages[1]["content"] += dialogue
+    return enforce_budget("summarize_conversation", messages)
 
 def get_membership_info(phone_number: str) -> Optional[dict]:
     """
@@ -320,6 +771,9 @@ def get_membership_info(phone_number: str) -> Optional[dict]:
     返回:
         会员信息字典，若未找到则返回None
     """
+    if _use_shared_index("members"):
+        return _shared_lookup("members", phone_number.strip())
+
     # 1. 计算JSON文件的相对路径
     # worker.py 路径：src/qwen/worker.py
     # JSON文件路径：config/userMemberList.json
@@ -333,26 +787,10 @@ def get_membership_info(phone_number: str) -> Optional[dict]:
         return None
     
     try:
-        # 3. 读取JSON文件
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # 3. 读取JSON文件（带缓存，文件未变更时不重复解析）
+        data = load_config(json_file_path)
         
-        # 4. 提取用户会员列表（兼容JSON结构）
-        user_member_list = data.get("userMemberList", [])
-        if not isinstance(user_member_list, list):
-            log("警告：JSON文件格式错误，userMemberList应为数组类型", 1, __file__)
-            return None
-        
-        # 5. 匹配手机号码（去除空格，支持灵活输入）
-        cleaned_phone = phone_number.strip()
-        for member_info in user_member_list:
-            # 确保会员信息中存在phone字段且格式正确
-            if isinstance(member_info, dict) and member_info.get("phone", "").strip() == cleaned_phone:
-                # 返回匹配的会员信息副本，避免修改原数据
-                return member_info.copy()
-        
-        # 6. 未找到匹配用户
-        return None
+        return _find_member(data, phone_number)
     
     except json.JSONDecodeError as e:
         log(f"错误：JSON文件解析失败 - {e}", 2, __file__)
@@ -364,6 +802,56 @@ def get_membership_info(phone_number: str) -> Optional[dict]:
         log(f"错误：获取会员信息时发生异常 - {str(e)}", 2, __file__)
         return None
 
+def _use_shared_index(name: str) -> bool:
+    """
+    是否从共享索引查询：设置了 SHARED_INDEX=1，或源文件超过 LARGE_DATA_FILE_BYTES
+    """
+    if USE_SHARED_INDEX:
+        return True
+    try:
+        return os.path.getsize(INDEX_SPECS[name][0]) > LARGE_DATA_FILE_BYTES
+    except OSError:
+        return False
+
+def _shared_lookup(name: str, key: str) -> Optional[dict]:
+    """
+    从共享索引查询一条记录（索引文件缺失、损坏等异常记录日志后返回None，与读取 JSON 文件失败时一致）
+    """
+    try:
+        return get_shared_index(name).get(key)
+    except Exception as e:
+        log(f"查询共享索引 {name} 失败：{str(e)}", 1, __file__)
+        return None
+
+def _shared_catalog() -> tuple:
+    """
+    从共享索引读取产品库（同一版本只解析一次，与 load_config 的缓存一样由调用方共享）
+    :return: (产品列表, 版本号)；失败时返回 (None, None)
+    """
+    try:
+        return get_shared_index("products").versioned_values()
+    except Exception as e:
+        log(f"读取共享产品索引失败：{str(e)}", 2, __file__)
+        return None, None
+
+def _find_member(data: dict, phone_number: str) -> Optional[dict]:
+    # 4. 提取用户会员列表（兼容JSON结构）
+    user_member_list = data.get("userMemberList", [])
+    if not isinstance(user_member_list, list):
+        log("警告：JSON文件格式错误，userMemberList应为数组类型", 1, __file__)
+        return None
+
+    # 5. 匹配手机号码（去除空格，支持灵活输入）
+    cleaned_phone = phone_number.strip()
+    for member_info in user_member_list:
+        # 确保会员信息中存在phone字段且格式正确
+        if isinstance(member_info, dict) and member_info.get("phone", "").strip() == cleaned_phone:
+            # 返回匹配的会员信息副本，避免修改原数据
+            return member_info.copy()
+
+    # 6. 未找到匹配用户
+    return None
+
 # 测试代码
 if __name__ == "__main__":
     # 测试时打印文件路径，验证是否正确（移植后可通过该输出调试路径问题）
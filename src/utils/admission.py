@@ -0,0 +1,203 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from src.utils.log import log
+from src.utils.metrics import metrics
+
+# 默认参数（可通过环境变量调整）
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "16"))       # 同时处理的对话轮次上限
+ADMISSION_MIN_CONCURRENCY = int(os.getenv("ADMISSION_MIN_CONCURRENCY", "1"))        # 自适应下调的下限
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))                   # 排队等待的轮次上限
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))         # 最长排队秒数
+ADMISSION_SESSION_LIMIT = int(os.getenv("ADMISSION_SESSION_LIMIT", "1"))            # 单个会话同时处理的轮次上限
+ADMISSION_TARGET_LATENCY_MS = float(os.getenv("ADMISSION_TARGET_LATENCY_MS", "5000"))  # 大模型延迟目标
+
+# 拒绝原因
+SHED_QUEUE_FULL = "queue_full"
+SHED_QUEUE_TIMEOUT = "queue_timeout"
+SHED_SESSION_BUSY = "session_busy"
+
+
+class Overloaded(Exception):
+    """
+    准入控制拒绝了本轮请求（reason 为拒绝原因）
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    对话轮次的准入控制：
+    - 并发上限内的轮次直接处理，超出的进入有界队列等待，队列满或等待超时则快速拒绝
+    - 单个会话同时处理的轮次数受限（同一用户连续发送不会占满处理能力）
+    - 并发上限按大模型延迟自适应调整（AIMD）：延迟超过目标时按比例下调，正常时缓慢回升
+    """
+
+    DECREASE_FACTOR = 0.8   # 延迟超标时上限乘以该系数
+    DECREASE_COOLDOWN = 1.0  # 两次下调的最小间隔（秒），避免一次延迟尖峰把上限连续压到底
+    EWMA_ALPHA = 0.2         # 延迟滑动平均系数
+
+    def __init__(self, max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+                 min_concurrency: int = ADMISSION_MIN_CONCURRENCY, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, session_limit: int = ADMISSION_SESSION_LIMIT,
+                 target_latency_ms: float = ADMISSION_TARGET_LATENCY_MS, adaptive: bool = True):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.session_limit = max(1, session_limit)
+        self.target_latency_ms = target_latency_ms
+        self.adaptive = adaptive
+        self._cond = threading.Condition()
+        self._limit = float(self.max_concurrency)
+        self._active = 0
+        self._waiting = 0
+        self._sessions = {}  # session_id -> 正在处理（含排队）的轮次数
+        self._latency_ewma = None
+        self._last_decrease = 0.0
+
+    # --------------------------
+    # 准入
+    # --------------------------
+    @property
+    def limit(self) -> int:
+        return max(self.min_concurrency, int(self._limit))
+
+    def acquire(self, session_id: str = None, timeout: float = None):
+        """
+        申请处理一个对话轮次，成功后必须调用 release
+        :param timeout: 最长排队秒数，默认 queue_timeout
+        :raises Overloaded: 被拒绝时抛出，reason 为拒绝原因
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        with self._cond:
+            if session_id is not None and self._sessions.get(session_id, 0) >= self.session_limit:
+                self._shed(SHED_SESSION_BUSY)
+            if self._active >= self.limit:
+                if self._waiting >= self.max_queue:
+                    self._shed(SHED_QUEUE_FULL)
+                self._waiting += 1
+                self._enter_session(session_id)
+                try:
+                    deadline = start + timeout
+                    while self._active >= self.limit:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0 or not self._cond.wait(remaining):
+                            if self._active < self.limit:
+                                break
+                            self._leave_session(session_id)
+                            self._shed(SHED_QUEUE_TIMEOUT)
+                finally:
+                    self._waiting -= 1
+            else:
+                self._enter_session(session_id)
+            self._active += 1
+        metrics.incr("admission.admitted")
+        metrics.observe("admission.wait_ms", (time.monotonic() - start) * 1000)
+
+    def release(self, session_id: str = None):
+        with self._cond:
+            self._active -= 1
+            self._leave_session(session_id)
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self, session_id: str = None, timeout: float = None):
+        """
+        with controller.admit(session_id): 处理一轮对话
+        被拒绝时在进入 with 块之前抛出 Overloaded
+        """
+        self.acquire(session_id, timeout)
+        try:
+            yield
+        finally:
+            self.release(session_id)
+
+    def _enter_session(self, session_id):
+        if session_id is not None:
+            self._sessions[session_id] = self._sessions.get(session_id, 0) + 1
+
+    def _leave_session(self, session_id):
+        if session_id is not None:
+            count = self._sessions.get(session_id, 0) - 1
+            if count > 0:
+                self._sessions[session_id] = count
+            else:
+                self._sessions.pop(session_id, None)
+
+    @staticmethod
+    def _shed(reason: str):
+        metrics.incr("admission.shed")
+        metrics.incr(f"admission.shed.{reason}")
+        raise Overloaded(reason)
+
+    # --------------------------
+    # 自适应并发
+    # --------------------------
+    def observe_latency(self, latency_ms: float):
+        """
+        记录一次大模型调用延迟，据此调整并发上限
+        """
+        if not self.adaptive:
+            return
+        with self._cond:
+            if self._latency_ewma is None:
+                self._latency_ewma = latency_ms
+            else:
+                self._latency_ewma += self.EWMA_ALPHA * (latency_ms - self._latency_ewma)
+            now = time.monotonic()
+            if self._latency_ewma > self.target_latency_ms:
+                if now - self._last_decrease >= self.DECREASE_COOLDOWN and self._limit > self.min_concurrency:
+                    self._limit = max(float(self.min_concurrency), self._limit * self.DECREASE_FACTOR)
+                    self._last_decrease = now
+                    log(f"大模型延迟 {self._latency_ewma:.0f}ms 超过目标，并发上限下调为 {self.limit}", 2, __file__)
+            elif self._limit < self.max_concurrency:
+                previous = self.limit
+                self._limit = min(float(self.max_concurrency), self._limit + 1 / max(self._limit, 1.0))
+                if self.limit > previous:
+                    self._cond.notify(self.limit - previous)
+
+    # --------------------------
+    # 状态
+    # --------------------------
+    def queue_depth(self) -> int:
+        with self._cond:
+            return self._waiting
+
+    def active(self) -> int:
+        with self._cond:
+            return self._active
+
+
+_default_controller = None
+_default_lock = threading.Lock()
+
+
+def get_default_controller() -> AdmissionController:
+    """
+    进程内共享的准入控制器（所有会话共用一个处理能力上限）
+    """
+    global _default_controller
+    with _default_lock:
+        if _default_controller is None:
+            controller = AdmissionController()
+            metrics.register_gauge("admission.queue_depth", controller.queue_depth)
+            metrics.register_gauge("admission.active", controller.active)
+            metrics.register_gauge("admission.limit", lambda: controller.limit)
+            _default_controller = controller
+        return _default_controller
+
+
+def record_llm_latency(latency_ms: float):
+    """
+    大模型调用完成后上报延迟（尚未创建准入控制器时只记录指标）
+    """
+    metrics.observe("llm.latency_ms", latency_ms)
+    controller = _default_controller
+    if controller is not None:
+        controller.observe_latency(latency_ms)
@@ -0,0 +1,365 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from types import SimpleNamespace
+from contextlib import contextmanager, redirect_stdout
+from src.utils.config import CONFIG_DIR, PROJECT_ROOT
+from src.utils.overrides import override_attr, override_env
+
+# 默认测量的数据规模（订单 / 会员 / 产品条数）；1000000 需显式通过 --sizes 指定，生成与加载都需要数分钟
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "benchmarks", "baseline.json")
+DEFAULT_THRESHOLD = 0.25   # 中位数比基线慢 25% 以上视为性能回退
+NOISE_FLOOR_MS = 0.05      # 绝对差值低于该值时不判定回退（计时噪声）
+MIN_TIME_S = 0.2           # 每个用例至少累计测量的时间
+MAX_REPEAT = 200           # 每个用例最多测量次数
+MIN_REPEAT = 3             # 每个用例最少测量次数
+
+_BRANDS = ["华为", "苹果", "小米", "OPPO", "vivo", "索尼", "联想", "戴尔"]
+_TYPES = ["智能手机", "无线耳机", "笔记本电脑", "平板电脑", "智能手表", "蓝牙音箱"]
+_MEMBER_TYPES = ["非会员", "普通会员", "中级会员", "高级会员"]
+_ORDER_STATUS = ["待付款", "已付款", "已发货", "已签收", "已完成"]
+
+
+# --------------------------
+# 合成数据
+# --------------------------
+def synthetic_phone(i: int) -> str:
+    return f"1{30 + i % 70:02d}{i:08d}"[:11]
+
+
+def _write_json_stream(path: str, open_text: str, close_text: str, items):
+    """
+    逐条写出 JSON（不在内存中构造整份数据，百万级数据也只占用常量内存）
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(open_text)
+        for index, item in enumerate(items):
+            if index:
+                f.write(",\n")
+            f.write(item)
+        f.write(close_text)
+
+
+def write_dataset(directory: str, size: int, seed: int = 42) -> dict:
+    """
+    在 directory 下生成与 config 目录同结构的合成数据：user_orders.json / userMemberList.json / products.json
+    :return: {"size", "phones": 示例手机号（首条、中间、末条）}
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+
+    def orders():
+        for i in range(size):
+            phone = synthetic_phone(i)
+            order = {
+                "order_id": f"ORD{i:010d}",
+                "user_name": f"用户{i}",
+                "phone": phone,
+                "order_time": "2025-05-20 14:30:22",
+                "products": [{"product_id": f"PROD{rng.randrange(size):07d}", "product_name": "无线蓝牙耳机",
+                              "price": 299.0, "quantity": 1, "total": 299.0}],
+                "order_status": rng.choice(_ORDER_STATUS),
+                "payment_amount": 299.0,
+            }
+            yield f"{json.dumps(phone)}: {json.dumps(order, ensure_ascii=False)}"
+
+    def members():
+        for i in range(size):
+            member = {
+                "userId": f"U{i:08d}",
+                "phone": synthetic_phone(i),
+                "username": f"用户{i}",
+                "memberType": rng.choice(_MEMBER_TYPES),
+                "memberValidity": "2026-11-22",
+                "registerTime": "2024-03-15",
+                "memberPoints": rng.randrange(0, 10000),
+            }
+            yield json.dumps(member, ensure_ascii=False)
+
+    def products():
+        for i in range(size):
+            brand, kind = rng.choice(_BRANDS), rng.choice(_TYPES)
+            product = {
+                "产品类型": kind,
+                "热度": rng.randrange(50, 100),
+                "品牌": brand,
+                "名字": f"{brand}{kind}{i}",
+                "描述": f"{brand}出品的{kind}，性能均衡，适合日常使用",
+                "功能": ["长续航", "快充", "轻薄设计"],
+                "价格": rng.randrange(99, 15000),
+                "规格": "标准版",
+                "好评率": f"{rng.uniform(85, 99.9):.1f}%",
+            }
+            yield json.dumps(product, ensure_ascii=False)
+
+    _write_json_stream(os.path.join(directory, "user_orders.json"), "{\n", "\n}", orders())
+    _write_json_stream(os.path.join(directory, "userMemberList.json"), '{"userMemberList": [\n', "\n]}", members())
+    _write_json_stream(os.path.join(directory, "products.json"), "[\n", "\n]", products())
+    return {"size": size, "phones": [synthetic_phone(0), synthetic_phone(size // 2), synthetic_phone(size - 1)]}
+
+
+@contextmanager
+def use_dataset(directory: str):
+    """
+    让 worker 读取 directory 中的合成数据（仅重定向 config 目录下、且 directory 中存在同名文件的路径）
+    """
+    from src.qwen import worker
+    from src.utils import config
+
+    def redirect(path):
+        name = os.path.basename(str(path))
+        candidate = os.path.join(directory, name)
+        if os.path.dirname(os.path.abspath(str(path))) == os.path.abspath(CONFIG_DIR) and os.path.exists(candidate):
+            return candidate
+        return path
+
+    def load_config(path, *args, **kwargs):
+        return config.load_config(redirect(path), *args, **kwargs)
+
+    def config_digest(path):
+        return config.config_digest(redirect(path))
+
+    with override_attr(worker, "load_config", load_config), \
+         override_attr(worker, "config_digest", config_digest):
+        yield
+
+
+def _stub_call(**kwargs):
+    """
+    模拟 Generation.call：根据调用类型立即返回确定性的结果
+    """
+    model = kwargs.get("model", "")
+    system = kwargs["messages"][0]["content"]
+    user = kwargs["messages"][-1]["content"]
+    if model == "tongyi-intent-detect-v3":
+        content = "ORDER_INQUIRY"
+    elif system.startswith("你是电话号码识别工具"):
+        content = "".join(ch for ch in user if ch.isdigit())[:11]
+    elif system.startswith("你是专业的电商产品推荐助手"):
+        content = "1. 华为Mate 70 Pro（华为）：旗舰影像，续航长"
+    else:
+        content = "用户反馈快递配送延迟"
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(status_code=200, message="", output=SimpleNamespace(choices=[SimpleNamespace(message=message)]))
+
+
+@contextmanager
+def stub_llm():
+    """
+    屏蔽真实大模型调用，并关闭语义缓存（测量的是未命中缓存时的完整路径）
+    """
+    from src.qwen import worker
+    from src.utils.semantic_cache import SEMANTIC_CACHE_SETTINGS, configure_semantic_cache
+
+    previous = {name: settings.get("enabled") for name, settings in SEMANTIC_CACHE_SETTINGS.items()}
+    for name in previous:
+        configure_semantic_cache(name, enabled=False)
+    try:
+        with override_attr(worker.Generation, "call", _stub_call), \
+             override_env(DASHSCOPE_API_KEY=os.getenv("DASHSCOPE_API_KEY") or "bench-key"):
+            yield
+    finally:
+        for name, enabled in previous.items():
+            configure_semantic_cache(name, enabled=enabled)
+
+
+# --------------------------
+# 计时
+# --------------------------
+def measure(func, setup=None, min_time: float = MIN_TIME_S, max_repeat: int = MAX_REPEAT,
+            min_repeat: int = MIN_REPEAT) -> dict:
+    """
+    重复执行 func 并统计耗时（先预热一次；setup 在每次执行前调用，不计入耗时）
+    :return: {"median_ms", "p95_ms", "min_ms", "runs"}
+    """
+    if setup:
+        setup()
+    func()
+    samples = []
+    spent = 0.0
+    while len(samples) < min_repeat or (spent < min_time and len(samples) < max_repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        samples.append(elapsed * 1000)
+        spent += elapsed
+    samples.sort()
+    return {
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "min_ms": round(samples[0], 4),
+        "runs": len(samples),
+    }
+
+
+def _cases(info: dict) -> list:
+    """
+    构造某一数据规模下的测量用例 [(名称, func, setup), ...]
+    """
+    from src.qwen import worker
+    from src.qwen.receiver import Receiver
+    from src.utils.config import clear_config_cache
+    from src.utils.session_store import InMemorySessionStore
+    from src.utils.response import MemorySink
+
+    first, middle, last = info["phones"]
+    intent_dict = {"GREET": "用户发起问候", "ORDER_INQUIRY": "用户查询订单状态", "DEFAULT": "无法识别"}
+    counter = iter(range(10 ** 9))
+    # 回复写到内存（测量包含合并、输出回复的开销）；关闭预取，turn.* 用例测量的是同步查询数据的完整路径
+    sink = MemorySink()
+    receiver = Receiver(store=InMemorySessionStore(), sink=sink)
+    receiver.prefetcher.cancel()
+    receiver.prefetcher.enabled = False
+    members = worker.get_membership_info(first)
+
+    def load(name):
+        return lambda: worker.load_config(os.path.join(CONFIG_DIR, name))
+
+    def turn(intent, **state):
+        def run():
+            receiver.handle_intent(intent)
+            receiver.flush_response()
+
+        def setup():
+            for key, value in state.items():
+                setattr(receiver, key, value() if callable(value) else value)
+            receiver.memory.clear()
+            sink.outputs.clear()
+        return run, setup
+
+    return [
+        ("load.user_orders_json", load("user_orders.json"), clear_config_cache),
+        ("load.member_list_json", load("userMemberList.json"), clear_config_cache),
+        ("load.products_json", load("products.json"), clear_config_cache),
+        ("lookup.get_order_info", lambda: worker.get_order_info(last), None),
+        ("lookup.get_membership_info", lambda: worker.get_membership_info(last), None),
+        ("intent.recognize_intent", lambda: worker.recognize_intent(f"查一下我的订单{next(counter)}", intent_dict), None),
+        ("phone.pharse_phone_number", lambda: worker.pharse_phone_number(f"我的手机号是{middle}"), None),
+        ("prompt.product_recommendation",
+         lambda: worker.product_recommendation(f"推荐一款手机{next(counter)}"), None),
+        ("render.describe_membership_info", lambda: receiver._describe_membership_info(members), None),
+        ("turn.handle_intent.ORDER_INQUIRY", *turn("ORDER_INQUIRY", phone_number=last)),
+        ("turn.handle_intent.MEMBERSHIP", *turn("MEMBERSHIP", phone_number=last)),
+        ("turn.handle_intent.PRODUCT_RECOMMENDATION",
+         *turn("PRODUCT_RECOMMENDATION", preferences=lambda: f"推荐一款手机{next(counter)}")),
+    ]
+
+
+def run_benchmarks(sizes=None, work_dir: str = None, min_time: float = MIN_TIME_S,
+                   max_repeat: int = MAX_REPEAT, progress=None) -> dict:
+    """
+    在各数据规模下运行全部用例（大模型调用被替换为本地桩，只测量本地代码）
+    :param sizes: 数据规模列表，默认 DEFAULT_SIZES
+    :param work_dir: 合成数据目录，默认临时目录（结束后删除）
+    :param progress: 可选回调 progress(名称, 结果)
+    :return: {"meta": {...}, "results": {"用例@规模": {...}}}
+    """
+    from src.qwen import worker
+
+    sizes = sizes or DEFAULT_SIZES
+    root = work_dir or tempfile.mkdtemp(prefix="ecs-bench-")
+    results = {}
+    try:
+        with stub_llm(), open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(devnull):
+            for size in sizes:
+                directory = os.path.join(root, str(size))
+                info = write_dataset(directory, size)
+                worker.clear_caches()
+                with use_dataset(directory):
+                    for name, func, setup in _cases(info):
+                        result = measure(func, setup, min_time=min_time, max_repeat=max_repeat)
+                        key = f"{name}@{size}"
+                        results[key] = result
+                        if progress:
+                            progress(key, result)
+                worker.clear_caches()
+                shutil.rmtree(directory, ignore_errors=True)
+    finally:
+        if work_dir is None:
+            shutil.rmtree(root, ignore_errors=True)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+
+
+# --------------------------
+# 基线对比
+# --------------------------
+def compare_to_baseline(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD,
+                        noise_floor_ms: float = NOISE_FLOOR_MS) -> list:
+    """
+    按中位数与基线对比，只比较两边都有的用例
+    :return: 回退列表 [{"case", "baseline_ms", "current_ms", "ratio"}, ...]
+    """
+    regressions = []
+    for case, result in current.get("results", {}).items():
+        base = baseline.get("results", {}).get(case)
+        if not base:
+            continue
+        before, after = base["median_ms"], result["median_ms"]
+        if after - before > noise_floor_ms and after > before * (1 + threshold):
+            regressions.append({"case": case, "baseline_ms": before, "current_ms": after,
+                                "ratio": round(after / before, 3) if before else float("inf")})
+    return regressions
+
+
+def main(argv=None):
+    """
+    命令行入口：python -m src.utils.bench --sizes 1000 10000 100000 [--update-baseline]
+    有回退时退出码为 1
+    """
+    parser = argparse.ArgumentParser(description="worker / receiver 热点路径基准测试（大模型调用使用本地桩）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="数据规模（订单/会员/产品条数）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基线文件路径")
+    parser.add_argument("--output", help="本次结果另存的 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允许的相对变慢比例")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME_S, help="每个用例至少测量的秒数")
+    parser.add_argument("--update-baseline", action="store_true", help="用本次结果覆盖基线")
+    args = parser.parse_args(argv)
+
+    def progress(case, result):
+        print(f"{case:<52}{result['median_ms']:>12.3f} ms  (p95 {result['p95_ms']:.3f}, {result['runs']} 次)",
+              file=sys.stderr)
+
+    current = run_benchmarks(args.sizes, min_time=args.min_time, progress=progress)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"基线已写入：{args.baseline}", file=sys.stderr)
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare_to_baseline(current, baseline, args.threshold)
+    for item in regressions:
+        print(f"性能回退：{item['case']} {item['baseline_ms']:.3f} ms -> {item['current_ms']:.3f} ms "
+              f"（x{item['ratio']}）", file=sys.stderr)
+    if regressions:
+        return 1
+    print(f"未发现超过 {args.threshold:.0%} 的性能回退", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
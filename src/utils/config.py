@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+import threading
+from src.utils.log import log
+from src.utils.lazy import LazyImport
+
+# asyncio 只有异步路径才用到，延迟导入，避免拖慢同步入口的冷启动
+asyncio = LazyImport("asyncio")
+
+# config.py 路径：src/utils/config.py → 向上两级到项目根目录
+CURRENT_FILE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_FILE_DIR, "../.."))
+CONFIG_DIR = os.path.join(PROJECT_ROOT, "config")
+
+# 缓存结构：{(路径, 解析函数): (文件签名, 解析后的数据, 内容摘要)}
+_config_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _file_signature(path):
+    """
+    获取文件签名（修改时间 + 大小），用于判断缓存是否失效
+    :return: 签名元组；路径无法 stat 时返回None（此时不做缓存）
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def load_config(path, loader=json.loads):
+    """
+    懒加载 + 缓存的配置读取函数（首次调用时才读盘，文件变更后自动重新加载）
+    :param path: 配置文件路径（str 或 Path）
+    :param loader: 文本解析函数，默认 json.loads，YAML 可传 yaml.safe_load
+    :return: 解析后的数据（缓存共享，调用方不要原地修改）
+    异常（文件不存在、格式错误等）直接抛出，由调用方按自身逻辑处理
+    """
+    signature = _file_signature(path)
+    key = (str(path), loader)
+    if signature is not None:
+        cached = _config_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    data = loader(text)
+
+    if signature is not None:
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with _cache_lock:
+            _config_cache[key] = (signature, data, digest)
+        log(f"配置文件已加载并缓存：{os.path.basename(str(path))}", 3, __file__)
+    return data
+
+
+async def load_config_async(path, loader=json.loads):
+    """
+    load_config 的异步版本：缓存命中时直接返回（只做一次 stat），需要读盘解析时放到线程池执行，不阻塞事件循环
+    参数、返回值和异常同 load_config
+    """
+    signature = _file_signature(path)
+    if signature is not None:
+        cached = _config_cache.get((str(path), loader))
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    return await asyncio.to_thread(load_config, path, loader)
+
+
+def config_digest(path):
+    """
+    获取配置文件的内容摘要（sha1），文件内容变化则摘要变化，可作为数据版本号
+    已被 load_config 缓存时直接复用，不重复读盘
+    :return: 摘要字符串；路径无法 stat 或读取失败时返回None
+    """
+    signature = _file_signature(path)
+    if signature is None:
+        return None
+    for (cached_path, _), cached in list(_config_cache.items()):
+        if cached_path == str(path) and cached[0] == signature:
+            return cached[2]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return hashlib.sha1(f.read().encode("utf-8")).hexdigest()
+    except Exception as e:
+        log(f"计算配置文件摘要失败：{str(e)}", 2, __file__)
+        return None
+
+
+def clear_config_cache():
+    """
+    清空配置缓存（测试或需要强制重新读盘时使用）
+    """
+    with _cache_lock:
+        _config_cache.clear()
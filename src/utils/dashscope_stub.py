@@ -0,0 +1,448 @@
+import os
+import re
+import sys
+import json
+import time
+import math
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.utils.log import log
+from src.utils.tokens import estimate_tokens
+
+# 与 DashScope 一致的接口路径
+GENERATION_PATH = "/api/v1/services/aigc/text-generation/generation"
+STATS_PATH = "/_stub/stats"      # GET：请求统计
+FAULTS_PATH = "/_stub/faults"    # POST：运行中调整故障注入参数
+
+INTENT_MODEL = "tongyi-intent-detect-v3"
+
+# 意图关键词（按顺序匹配），用于生成意图识别类请求的默认应答
+INTENT_KEYWORDS = [
+    ("COMPLAINT", "投诉|太差|不满意|太慢"),
+    ("ORDER_INQUIRY", "订单|物流|快递|发货"),
+    ("PRODUCT_RECOMMENDATION", "推荐|想买|有什么好"),
+    ("MEMBERSHIP", "会员|积分"),
+    ("GREET", "你好|嗨|hello|hi"),
+]
+
+# 默认应答规则（按顺序匹配，第一条命中的生效）：
+# model / system / user 为正则（re.search），reply 中可用 \1 引用 user 正则的分组，{input} 代表用户输入原文
+DEFAULT_RULES = (
+    [{"model": INTENT_MODEL, "user": keywords, "reply": intent} for intent, keywords in INTENT_KEYWORDS]
+    + [{"model": INTENT_MODEL, "reply": "DEFAULT"}]
+    # 意图 + 手机号联合识别：返回 JSON
+    + [{"system": "^你是意图识别与信息抽取工具", "user": rf"^(?=.*(?:{keywords}))(?:.*?(1\d{{10}}))?",
+        "reply": f'{{"intent": "{intent}", "phone_number": "\\1"}}'} for intent, keywords in INTENT_KEYWORDS]
+    + [{"system": "^你是意图识别与信息抽取工具", "user": r"^(?:.*?(1\d{10}))?",
+        "reply": '{"intent": "DEFAULT", "phone_number": "\\1"}'}]
+    + [
+        {"system": "^你是电话号码识别工具", "user": r"(1\d{10})", "reply": r"\1"},
+        {"system": "^你是电话号码识别工具", "reply": ""},
+        {"system": "^你是投诉内容识别工具", "reply": "用户投诉：{input}"},
+        {"system": "^你是专业的电商产品推荐助手", "reply": "1. 华为Mate 70 Pro（华为）：旗舰影像与长续航，符合您的需求"},
+        {"system": "^你是客服对话摘要工具", "reply": "用户此前咨询了订单与会员相关问题"},
+        {"reply": "好的"},
+    ]
+)
+
+# 默认故障注入参数（全部关闭）
+DEFAULT_FAULTS = {
+    "latency": "fixed:0",         # 首包延迟分布（毫秒），见 parse_latency
+    "chunk_latency": "fixed:0",   # 流式输出每个分片之间的延迟分布（毫秒）
+    "rate_limit": 0.0,            # 随机返回 429 的概率
+    "server_error": 0.0,          # 随机返回 500 的概率
+    "malformed": 0.0,             # 随机返回格式错误响应的概率（非法 JSON / 缺少 choices）
+    "max_qps": 0,                 # 令牌桶限流（每秒请求数），超过返回 429；0 表示不限
+    "chunk_size": 4,              # 流式输出每个分片的字符数
+}
+
+
+def parse_latency(spec: str):
+    """
+    解析延迟分布描述（单位毫秒），返回采样函数 sample(rng) -> 秒
+    支持：fixed:100 / uniform:50,200 / normal:100,20 / lognormal:100,0.5（中位数, sigma）/ exp:100（均值）
+    """
+    kind, _, args = str(spec).partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()] if args else [0.0]
+    if kind == "fixed":
+        return lambda rng: values[0] / 1000
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == "lognormal":
+        mu = math.log(max(values[0], 1e-6))
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    if kind == "exp":
+        return lambda rng: rng.expovariate(1 / max(values[0], 1e-6)) / 1000
+    raise ValueError(f"无法识别的延迟分布：{spec}")
+
+
+def fixture_key(model: str, messages: list) -> str:
+    """
+    录制数据的查找键：模型 + 完整消息列表
+    """
+    payload = json.dumps([model, messages], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def load_fixtures(path: str) -> dict:
+    """
+    读取录制数据（JSONL，每行 {"model", "messages", "reply"}）
+    """
+    fixtures = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                fixtures[fixture_key(item["model"], item["messages"])] = item["reply"]
+    return fixtures
+
+
+class _TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    # 默认监听队列只有 5，异步客户端同时建立上百个连接时会被丢弃 SYN、重传等待数秒
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+class DashScopeStubServer:
+    """
+    本地 DashScope 生成接口桩服务：
+    - 与真实接口同样的请求/响应结构（含 SSE 流式输出），dashscope SDK 指向它即可离线运行
+    - 应答优先取录制数据（按模型+消息精确匹配），其次按规则生成，结果确定
+    - 可注入延迟分布、429 限流、500 错误和格式错误的响应；随机数带种子，可复现
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, rules: list = None,
+                 fixtures: dict = None, faults: dict = None, seed: int = None):
+        self.rules = [self._compile(rule) for rule in (rules or DEFAULT_RULES)]
+        self.fixtures = fixtures or {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.configure(**DEFAULT_FAULTS)
+        self.configure(**(faults or {}))
+        self._httpd = _StubHTTPServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    # --------------------------
+    # 配置
+    # --------------------------
+    @staticmethod
+    def _compile(rule: dict) -> dict:
+        compiled = dict(rule)
+        for field in ("model", "system", "user"):
+            if field in rule:
+                compiled[field] = re.compile(rule[field], re.IGNORECASE)
+        return compiled
+
+    def configure(self, **faults):
+        """
+        调整故障注入参数（可在运行中调用，也可通过 POST /_stub/faults）
+        """
+        unknown = set(faults) - set(DEFAULT_FAULTS)
+        if unknown:
+            raise ValueError(f"未知的故障注入参数：{sorted(unknown)}")
+        with self._lock:
+            for key, value in faults.items():
+                setattr(self, key, value)
+            self._sample_latency = parse_latency(self.latency)
+            self._sample_chunk_latency = parse_latency(self.chunk_latency)
+            self._bucket = _TokenBucket(self.max_qps) if self.max_qps else None
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self.stats[outcome] = self.stats.get(outcome, 0) + 1
+
+    def _draw(self) -> tuple:
+        """
+        一次请求的随机结果：(延迟秒数, 故障类型或None)
+        """
+        with self._lock:
+            delay = self._sample_latency(self._rng)
+            if self._bucket is not None and not self._bucket.take():
+                return delay, "rate_limit"
+            roll = self._rng.random()
+            for fault in ("rate_limit", "server_error", "malformed"):
+                probability = getattr(self, fault)
+                if roll < probability:
+                    return delay, fault
+                roll -= probability
+            return delay, None
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _chunk_delay(self) -> float:
+        with self._lock:
+            return self._sample_chunk_latency(self._rng)
+
+    # --------------------------
+    # 应答
+    # --------------------------
+    def reply_for(self, model: str, messages: list) -> str:
+        """
+        生成确定性的应答文本：先查录制数据，再按规则匹配
+        """
+        key = fixture_key(model, messages)
+        if key in self.fixtures:
+            return self.fixtures[key]
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        for rule in self.rules:
+            if "model" in rule and not rule["model"].search(model or ""):
+                continue
+            if "system" in rule and not rule["system"].search(system):
+                continue
+            match = None
+            if "user" in rule:
+                match = rule["user"].search(user)
+                if not match:
+                    continue
+            reply = match.expand(rule["reply"]) if match else rule["reply"]
+            return reply.replace("{input}", user)
+        return ""
+
+    @staticmethod
+    def _output(content: str, result_format: str, finish_reason: str) -> dict:
+        if result_format == "message":
+            return {"choices": [{"finish_reason": finish_reason,
+                                 "message": {"role": "assistant", "content": content}}]}
+        return {"text": content, "finish_reason": finish_reason}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # 响应头和响应体分两次写出，关闭 Nagle 避免 40ms 的延迟确认等待
+
+            def log_message(self, format, *args):  # 不向 stderr 打印访问日志
+                pass
+
+            def _send_json(self, status: int, payload, raw: bytes = None):
+                body = raw if raw is not None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self) -> dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                if self.path == STATS_PATH:
+                    with server._lock:
+                        self._send_json(200, dict(server.stats))
+                else:
+                    self._send_json(404, {"code": "NotFound", "message": self.path})
+
+            def do_POST(self):
+                try:
+                    body = self._read_json()
+                except json.JSONDecodeError:
+                    self._send_json(400, {"code": "InvalidParameter", "message": "请求体不是合法的 JSON"})
+                    return
+                if self.path == FAULTS_PATH:
+                    try:
+                        server.configure(**body)
+                    except ValueError as e:
+                        self._send_json(400, {"code": "InvalidParameter", "message": str(e)})
+                        return
+                    self._send_json(200, {"ok": True})
+                    return
+                if self.path != GENERATION_PATH:
+                    self._send_json(404, {"code": "NotFound", "message": self.path})
+                    return
+                self._generate(body)
+
+            def _generate(self, body: dict):
+                request_id = uuid.uuid4().hex
+                if not self.headers.get("Authorization", "").startswith("Bearer "):
+                    server._count("unauthorized")
+                    self._send_json(401, {"code": "InvalidApiKey", "message": "Invalid API-key provided.",
+                                          "request_id": request_id})
+                    return
+                model = body.get("model", "")
+                inputs = body.get("input", {})
+                parameters = body.get("parameters", {})
+                messages = inputs.get("messages") or [{"role": "user", "content": inputs.get("prompt", "")}]
+                result_format = parameters.get("result_format", "text")
+                stream = "enable" in self.headers.get("X-DashScope-SSE", "") or "text/event-stream" in \
+                    self.headers.get("Accept", "")
+
+                delay, fault = server._draw()
+                time.sleep(delay)
+                if fault == "rate_limit":
+                    server._count("rate_limited")
+                    self._send_json(429, {"code": "Throttling.RateQuota",
+                                          "message": "Requests rate limit exceeded, please try again later.",
+                                          "request_id": request_id})
+                    return
+                if fault == "server_error":
+                    server._count("server_error")
+                    self._send_json(500, {"code": "InternalError", "message": "An internal error has occured.",
+                                          "request_id": request_id})
+                    return
+
+                content = server.reply_for(model, messages)
+                usage = {"input_tokens": sum(estimate_tokens(m.get("content", "")) for m in messages),
+                         "output_tokens": estimate_tokens(content)}
+                usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+                if fault == "malformed":
+                    server._count("malformed")
+                    if stream:
+                        self._stream(request_id, [b"data:{\"output\": {\"choices\": ["], malformed=True)
+                    elif server._random() < 0.5:
+                        self._send_json(200, None, raw=b'{"output": {"choices": [{"message": ')
+                    else:
+                        self._send_json(200, {"output": {}, "usage": usage, "request_id": request_id})
+                    return
+
+                server._count("stream" if stream else "ok")
+                if not stream:
+                    self._send_json(200, {"output": server._output(content, result_format, "stop"),
+                                          "usage": usage, "request_id": request_id})
+                    return
+                incremental = parameters.get("incremental_output", False)
+                size = max(1, int(server.chunk_size))
+                pieces = [content[i:i + size] for i in range(0, len(content), size)] or [""]
+                events = []
+                for index, piece in enumerate(pieces):
+                    last = index == len(pieces) - 1
+                    text = piece if incremental else content[:(index + 1) * size]
+                    payload = {"output": server._output(text, result_format, "stop" if last else "null"),
+                               "usage": usage, "request_id": request_id}
+                    events.append(f"id:{index + 1}\nevent:result\n:HTTP_STATUS/200\ndata:"
+                                  f"{json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self._stream(request_id, events)
+
+            def _stream(self, request_id: str, events: list, malformed: bool = False):
+                # SSE 响应长度未知：不声明 Content-Length，发送完毕后关闭连接
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream;charset=UTF-8")
+                self.send_header("Connection", "close")
+                self.send_header("X-Request-Id", request_id)
+                self.end_headers()
+                self.close_connection = True
+                for index, event in enumerate(events):
+                    if index:
+                        time.sleep(server._chunk_delay())
+                    self.wfile.write(event if not malformed else event + b"\n\n")
+                    self.wfile.flush()
+
+        return Handler
+
+    # --------------------------
+    # 启停
+    # --------------------------
+    def start(self) -> "DashScopeStubServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        log(f"DashScope 桩服务已启动：{self.base_url}", 3, __file__)
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextmanager
+def use_stub(base_url: str):
+    """
+    让 dashscope SDK 请求指向桩服务（dashscope 尚未导入时通过环境变量生效，已导入时直接修改其配置）
+    """
+    previous_env = os.environ.get("DASHSCOPE_HTTP_BASE_URL")
+    os.environ["DASHSCOPE_HTTP_BASE_URL"] = base_url
+    dashscope = sys.modules.get("dashscope")
+    previous_url = getattr(dashscope, "base_http_api_url", None)
+    if dashscope is not None:
+        dashscope.base_http_api_url = base_url
+    try:
+        yield
+    finally:
+        if previous_env is None:
+            os.environ.pop("DASHSCOPE_HTTP_BASE_URL", None)
+        else:
+            os.environ["DASHSCOPE_HTTP_BASE_URL"] = previous_env
+        dashscope = sys.modules.get("dashscope")
+        if dashscope is not None:
+            dashscope.base_http_api_url = previous_url or os.environ.get(
+                "DASHSCOPE_HTTP_BASE_URL", "https://dashscope.aliyuncs.com/api/v1")
+
+
+def main(argv=None):
+    """
+    命令行入口：python -m src.utils.dashscope_stub --port 8089 --latency lognormal:300,0.5 --rate-limit 0.05
+    """
+    parser = argparse.ArgumentParser(description="本地 DashScope 生成接口桩服务（确定性应答 + 故障注入）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--rules", help="应答规则 JSON 文件（列表，格式同 DEFAULT_RULES）")
+    parser.add_argument("--fixtures", help="录制数据 JSONL 文件（每行 {model, messages, reply}）")
+    parser.add_argument("--seed", type=int, help="随机种子（故障注入与延迟采样可复现）")
+    parser.add_argument("--latency", default=DEFAULT_FAULTS["latency"], help="首包延迟分布（毫秒）")
+    parser.add_argument("--chunk-latency", default=DEFAULT_FAULTS["chunk_latency"], help="流式分片间延迟分布（毫秒）")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="随机 429 的概率")
+    parser.add_argument("--server-error", type=float, default=0.0, help="随机 500 的概率")
+    parser.add_argument("--malformed", type=float, default=0.0, help="格式错误响应的概率")
+    parser.add_argument("--max-qps", type=float, default=0, help="限流阈值（每秒请求数），0 表示不限")
+    args = parser.parse_args(argv)
+
+    rules = None
+    if args.rules:
+        with open(args.rules, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+    fixtures = load_fixtures(args.fixtures) if args.fixtures else None
+    faults = {"latency": args.latency, "chunk_latency": args.chunk_latency, "rate_limit": args.rate_limit,
+              "server_error": args.server_error, "malformed": args.malformed, "max_qps": args.max_qps}
+    server = DashScopeStubServer(args.host, args.port, rules=rules, fixtures=fixtures, faults=faults, seed=args.seed)
+    print(f"DashScope 桩服务已启动，使用方式：export DASHSCOPE_HTTP_BASE_URL={server.base_url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+import os
+import sys
+import re
+import json
+import time
+import codecs
+import argparse
+import tempfile
+import tracemalloc
+from typing import IO, Iterable, Iterator, Optional, Sequence
+
+# 超大 JSON 数据文件（GB 级订单导出等）的流式解析：
+# 按块读取文件，逐个解析指定容器（对象 / 数组）中的条目并立即交给调用方，
+# 内存中只保留当前读缓冲和正在解析的那一个条目，峰值内存与文件大小无关。
+# 单个条目仍由 json 模块的 C 实现解析（JSONDecoder.raw_decode），吞吐与 json.load 同一量级。
+STREAM_CHUNK_SIZE = int(os.getenv("JSON_STREAM_CHUNK_SIZE", str(1 << 20)))                      # 每次读取的字节数
+STREAM_MAX_VALUE_BYTES = int(float(os.getenv("JSON_STREAM_MAX_VALUE_MB", "64")) * 1024 * 1024)  # 单个条目的上限
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class ParseStats:
+    """
+    解析统计：读取字节数、条目数、耗时与吞吐
+    """
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.items = 0
+        self.elapsed = 0.0
+
+    @property
+    def throughput_mb_s(self) -> float:
+        return self.bytes_read / 1024 / 1024 / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def items_per_s(self) -> float:
+        return self.items / self.elapsed if self.elapsed else 0.0
+
+    def report(self) -> str:
+        return (f"{self.items} 条，{self.bytes_read / 1024 / 1024:.2f}MB，耗时 {self.elapsed * 1000:.1f}ms，"
+                f"{self.throughput_mb_s:.1f}MB/s，{self.items_per_s:.0f} 条/s")
+
+
+# 截断的数字在解析结果之后可能残留的部分（"."、"e"、"e+" 等，空串表示数字恰好在缓冲区末尾）
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]{0,2}")
+
+
+class _Reader:
+    """
+    带缓冲的增量读取：缓冲区只保留尚未解析的部分
+    """
+
+    def __init__(self, f: IO, chunk_size: int, stats: ParseStats):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.stats = stats
+        self.decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """
+        读入更多数据（至少与当前未解析部分一样多，单个大条目的重试次数为对数级）
+        :return: 是否读到了新数据
+        """
+        if self.eof:
+            return False
+        pending = len(self.buf) - self.pos
+        if pending > STREAM_MAX_VALUE_BYTES:
+            raise self.error(f"单个条目超过 {STREAM_MAX_VALUE_BYTES} 字节（JSON_STREAM_MAX_VALUE_MB）")
+        chunk = self.f.read(max(self.chunk_size, pending))
+        if isinstance(chunk, bytes):
+            self.stats.bytes_read += len(chunk)
+            text = self.decoder.decode(chunk, final=not chunk)
+        else:
+            self.stats.bytes_read += len(chunk.encode("utf-8"))
+            text = chunk
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return bool(text)
+
+    def peek(self) -> str:
+        """
+        跳过空白，返回下一个字符（不消费）；文件结束返回空串
+        """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill() and self.eof:
+                return ""
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise self.error(f"期望 {' 或 '.join(chars)}，实际为 {char or '文件结束'}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """
+        解析下一个完整的 JSON 值
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill() or not self.eof:
+                    continue
+                raise
+            # 数字在缓冲区末尾时可能被截断（如 12|34、12.|5、1e|3 会先解析成 12 / 12 / 1），
+            # 数字之后只剩数字的组成字符时读入更多后重新解析
+            if not self.eof and isinstance(obj, (int, float)) and not isinstance(obj, bool) \
+                    and _NUMBER_TAIL.fullmatch(self.buf, end):
+                self.fill()
+                continue
+            self.pos = end
+            return obj
+
+    def error(self, message: str) -> json.JSONDecodeError:
+        return json.JSONDecodeError(message, self.buf, self.pos)
+
+
+def parse_path(path: str) -> tuple:
+    """
+    "userMemberList.0.orders" -> ("userMemberList", 0, "orders")
+    """
+    return tuple(int(part) if part.isdigit() else part for part in path.split(".") if part) if path else ()
+
+
+def iter_json(f: IO, path: Sequence = (), chunk_size: int = STREAM_CHUNK_SIZE,
+              stats: Optional[ParseStats] = None) -> Iterator[tuple]:
+    """
+    流式遍历 JSON 文件中 path 指向的容器
+    :param f: 已打开的文件（二进制按 utf-8 解码，也接受文本文件）
+    :param path: 从根开始的键 / 下标序列，如 ("userMemberList",)；为空时遍历根容器
+    :param stats: 传入时累计解析统计
+    :return: 对象产生 (键, 值)，数组产生 (下标, 元素)；path 不存在时不产生任何条目
+    :raises json.JSONDecodeError: 文件格式错误
+    """
+    stats = stats if stats is not None else ParseStats()
+    reader = _Reader(f, chunk_size, stats)
+    start = time.perf_counter()
+    try:
+        for component in path:
+            if not _descend(reader, component):
+                return
+        opening = reader.expect("{[")
+        closing = "}" if opening == "{" else "]"
+        position = 0
+        if reader.peek() == closing:
+            return
+        while True:
+            if opening == "{":
+                key = reader.value()
+                if not isinstance(key, str):
+                    raise reader.error("对象的键必须是字符串")
+                reader.expect(":")
+            else:
+                key = position
+            value = reader.value()
+            position += 1
+            stats.items += 1
+            yield key, value
+            if reader.expect("," + closing) == closing:
+                return
+    finally:
+        stats.elapsed += time.perf_counter() - start
+
+
+def _descend(reader: _Reader, component) -> bool:
+    """
+    在当前容器中找到 component 对应的值并停在它的开头；跳过的兄弟条目解析后立即丢弃
+    """
+    opening = reader.expect("{[")
+    closing = "}" if opening == "{" else "]"
+    if reader.peek() == closing:
+        return False
+    position = 0
+    while True:
+        if opening == "{":
+            key = reader.value()
+            reader.expect(":")
+        else:
+            key = position
+        if key == component:
+            return True
+        reader.value()
+        position += 1
+        if reader.expect("," + closing) == closing:
+            return False
+
+
+def iter_jsonl(f: IO, stats: Optional[ParseStats] = None) -> Iterator[tuple]:
+    """
+    遍历 write_jsonl 写出的行格式文件：每行一个 [键, 值]
+    """
+    stats = stats if stats is not None else ParseStats()
+    start = time.perf_counter()
+    try:
+        for line in f:
+            stats.bytes_read += len(line) if isinstance(line, bytes) else len(line.encode("utf-8"))
+            if not line.strip():
+                continue
+            key, value = json.loads(line)
+            stats.items += 1
+            yield key, value
+    finally:
+        stats.elapsed += time.perf_counter() - start
+
+
+def iter_file(path: str, json_path: Sequence = (), stats: Optional[ParseStats] = None) -> Iterator[tuple]:
+    """
+    按扩展名选择解析方式：.jsonl 为已转换的行格式（json_path 已在转换时应用），其余按 JSON 流式解析
+    """
+    with open(path, "rb") as f:
+        if str(path).endswith(".jsonl"):
+            yield from iter_jsonl(f, stats)
+        else:
+            yield from iter_json(f, json_path, stats=stats)
+
+
+def write_jsonl(path: str, items: Iterable[tuple]) -> int:
+    """
+    把 (键, 值) 写成紧凑的行格式（先写临时文件再原子替换）
+    :return: 条目数
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    count = 0
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            for key, value in items:
+                f.write(json.dumps([key, value], ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+                count += 1
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return count
+
+
+def index_key(key) -> str:
+    """
+    索引文件中的键：数组下标补零到定长，使按字节排序后仍保持原顺序
+    """
+    return f"{key:010d}" if isinstance(key, int) else str(key)
+
+
+def _measure(func) -> tuple:
+    """
+    :return: (返回值, 耗时秒, 峰值内存字节)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+        return result, time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="超大 JSON 数据文件的流式解析：统计吞吐 / 转换为紧凑格式")
+    parser.add_argument("command", choices=["scan", "convert"],
+                        help="scan：流式解析并报告吞吐与峰值内存；convert：转换为行格式或二进制索引")
+    parser.add_argument("source", help="JSON 数据文件")
+    parser.add_argument("dest", nargs="?", help="convert 的输出文件")
+    parser.add_argument("--path", default="", help="要遍历的容器路径，如 userMemberList")
+    parser.add_argument("--format", choices=["jsonl", "index"], default="jsonl",
+                        help="jsonl：每行一个 [键, 值]；index：共享索引的二进制格式（mmap 直接查询，无需解析）")
+    parser.add_argument("--compare", action="store_true", help="scan 时同时测量 json.load 整体加载作对比")
+    args = parser.parse_args(argv)
+    json_path = parse_path(args.path)
+
+    if args.command == "scan":
+        stats = ParseStats()
+        _, _, peak = _measure(lambda: sum(1 for _ in iter_file(args.source, json_path, stats)))
+        print(f"流式解析：{stats.report()}，峰值内存 {peak / 1024 / 1024:.2f}MB")
+        if args.compare:
+            def load():
+                with open(args.source, "rb") as f:
+                    return json.load(f)
+            _, elapsed, peak = _measure(load)
+            print(f"json.load：耗时 {elapsed * 1000:.1f}ms，峰值内存 {peak / 1024 / 1024:.2f}MB")
+        return 0
+
+    if not args.dest:
+        parser.error("convert 需要指定输出文件")
+    stats = ParseStats()
+    items = ((index_key(key), value) for key, value in iter_file(args.source, json_path, stats))
+    if args.format == "jsonl":
+        count = write_jsonl(args.dest, items)
+    else:
+        from src.utils.shared_index import write_index, source_version
+        count = write_index(args.dest, items, source_version(args.source) or "")
+    print(f"已转换 {count} 条 -> {args.dest}（解析 {stats.report()}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import importlib
+import threading
+
+
+class LazyImport:
+    """
+    延迟导入代理：首次访问属性时才真正 import 目标模块（或模块中的对象）
+
+    用法：
+        Generation = LazyImport("dashscope", "Generation")
+        yaml = LazyImport("yaml")
+    模块级变量仍然存在，unittest.mock.patch("xxx.Generation.call") 等写法保持可用。
+    """
+
+    def __init__(self, module_name: str, attr_name: str = None):
+        # 使用 object.__setattr__，避免与下面的 __setattr__ 转发冲突
+        object.__setattr__(self, "_module_name", module_name)
+        object.__setattr__(self, "_attr_name", attr_name)
+        object.__setattr__(self, "_target", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _load(self):
+        target = object.__getattribute__(self, "_target")
+        if target is not None:
+            return target
+        with object.__getattribute__(self, "_lock"):
+            target = object.__getattribute__(self, "_target")
+            if target is None:
+                module = importlib.import_module(object.__getattribute__(self, "_module_name"))
+                attr_name = object.__getattribute__(self, "_attr_name")
+                target = getattr(module, attr_name) if attr_name else module
+                object.__setattr__(self, "_target", target)
+        return target
+
+    @property
+    def is_loaded(self) -> bool:
+        """目标是否已经被真正导入"""
+        return object.__getattribute__(self, "_target") is not None
+
+    def __getattr__(self, name):
+        # 仅在实例字典中找不到属性时触发（mock.patch 设置的属性会优先命中）
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        # 写在代理自身上：patch 结束时 delattr 即可恢复为转发
+        object.__setattr__(self, name, value)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self):
+        module_name = object.__getattribute__(self, "_module_name")
+        attr_name = object.__getattribute__(self, "_attr_name")
+        target = f"{module_name}.{attr_name}" if attr_name else module_name
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<LazyImport {target} ({state})>"
@@ -1,57 +1,300 @@
 import os
+import atexit
+import json
+import gzip
+import glob
+import time
+import shutil
+import threading
+import contextvars
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    import fcntl  # 仅类 Unix 系统可用，用于多进程轮转时加锁
+except ImportError:  # pragma: no cover
+    fcntl = None
+
 # log.py 路径：src/utils/log.py → 向上两级到 src → 再向上一级到项目根目录
 CURRENT_FILE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_FILE_DIR, "../.."))
 
-# 2. 日志目录固定为 项目根目录/logs
-LOG_DIR = os.path.join(PROJECT_ROOT, "logs")
-# 确保日志目录存在（不存在则自动创建）
-os.makedirs(LOG_DIR, exist_ok=True)
+# 2. 日志目录固定为 项目根目录/logs（可用环境变量 LOG_DIR 覆盖）
+LOG_DIR = os.getenv("LOG_DIR", os.path.join(PROJECT_ROOT, "logs"))
+
+# 3. 日志文件：所有等级写入同一个 JSON Lines 文件，每条日志只写一次
+LOG_FILE = os.path.join(LOG_DIR, "app.jsonl")
+INDEX_SUFFIX = ".idx"                 # 稀疏索引（每隔若干条记录一次 时间戳 -> 字节偏移）
+META_SUFFIX = ".meta.json"            # 已轮转分段的摘要（时间范围、等级、会话）
+
+# 轮转与索引参数（环境变量可调整）
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(20 * 1024 * 1024)))  # 单个文件最大字节数
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "daily")                 # daily / hourly / none
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "30"))             # 保留的历史分段数
+LOG_INDEX_EVERY = int(os.getenv("LOG_INDEX_EVERY", "200"))              # 每多少条记录写一个索引点
+LOG_REOPEN_CHECK = float(os.getenv("LOG_REOPEN_CHECK", "1"))            # 检查文件是否已被其他进程轮转的间隔（秒）
+META_MAX_SESSIONS = 2000                                                # 分段摘要中最多记录的会话数
+
+# 当前会话ID（contextvars：每个线程/协程独立）
+_session_var = contextvars.ContextVar("log_session", default=None)
+
+# --------------------------
+# 4. 会话上下文
+# --------------------------
+def set_log_session(session_id):
+    """
+    设置当前上下文的会话ID，之后的日志自动带上 session 字段
+    :return: contextvars Token，可用于 reset_log_session 恢复
+    """
+    return _session_var.set(session_id)
+
+def reset_log_session(token):
+    _session_var.reset(token)
+
+@contextmanager
+def log_session(session_id):
+    """
+    在 with 块内的日志都带上指定的会话ID
+    """
+    token = _session_var.set(session_id)
+    try:
+        yield
+    finally:
+        _session_var.reset(token)
+
+# --------------------------
+# 5. 带大小/时间轮转的 JSON Lines 写入器
+# --------------------------
+def _period_key(timestamp: float) -> str:
+    if LOG_ROTATE_WHEN == "hourly":
+        return time.strftime("%Y%m%d%H", time.localtime(timestamp))
+    if LOG_ROTATE_WHEN == "daily":
+        return time.strftime("%Y%m%d", time.localtime(timestamp))
+    return ""
+
+def segment_meta(path: str, opener=open) -> dict:
+    """
+    扫描一个日志分段，生成摘要：时间范围、各等级条数、出现过的会话
+    """
+    meta = {"start_ts": None, "end_ts": None, "levels": {}, "sessions": [], "records": 0}
+    sessions = set()
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            ts = record.get("ts")
+            if meta["start_ts"] is None or (ts and ts < meta["start_ts"]):
+                meta["start_ts"] = ts
+            if meta["end_ts"] is None or (ts and ts > meta["end_ts"]):
+                meta["end_ts"] = ts
+            level = str(record.get("level"))
+            meta["levels"][level] = meta["levels"].get(level, 0) + 1
+            if record.get("session") and sessions is not None:
+                sessions.add(record["session"])
+                if len(sessions) > META_MAX_SESSIONS:
+                    sessions = None  # 会话过多时不记录（查询时不能按会话跳过该分段）
+            meta["records"] += 1
+    meta["sessions"] = sorted(sessions) if sessions is not None else None
+    return meta
+
+class JsonLineWriter:
+    """
+    JSON Lines 日志写入器：
+    - 文件句柄常驻，追加写（O_APPEND，多进程同时追加时每行完整）
+    - 超过 max_bytes 或跨越时间周期时轮转，历史分段在后台 gzip 压缩并生成摘要
+    - 每隔 index_every 条记录写一个稀疏索引点，查询时可按时间直接 seek
+    """
+
+    def __init__(self, path: str = LOG_FILE, max_bytes: int = LOG_MAX_BYTES,
+                 backup_count: int = LOG_BACKUP_COUNT, index_every: int = LOG_INDEX_EVERY,
+                 reopen_check: float = LOG_REOPEN_CHECK):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.index_every = max(1, index_every)
+        self.reopen_check = reopen_check
+        self._lock = threading.Lock()
+        self._file = None
+        self._inode = None
+        self._checked_at = 0.0
+        self._period = None
+        self._count = 0
+        self._compress_threads = []
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # 二进制追加模式：tell() 得到精确的字节偏移，供稀疏索引使用
+        self._file = open(self.path, "ab")
+        stat = os.fstat(self._file.fileno())
+        self._inode = stat.st_ino
+        self._checked_at = time.monotonic()
+        self._period = _period_key(stat.st_mtime if stat.st_size else time.time())
+        self._count = 0
+
+    def _reopen_if_rotated(self, force: bool = False):
+        # 其他进程轮转后文件被改名，本进程需要重新打开新文件；
+        # 每次写入都 stat 开销较大，只每隔 reopen_check 秒检查一次（写索引点前总是检查，保证偏移对应当前文件），
+        # 期间写入的少量记录留在已轮转的分段中，每行仍然完整
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.reopen_check:
+            return
+        self._checked_at = now
+        try:
+            if os.stat(self.path).st_ino == self._inode:
+                return
+        except FileNotFoundError:
+            pass
+        self._file.close()
+        self._open()
+
+    def write(self, record: dict):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._open()
+            else:
+                self._reopen_if_rotated(force=self._count % self.index_every == 0)
+            now = time.time()
+            position = self._file.tell()
+            if position > 0 and (position + len(line) > self.max_bytes
+                                 or _period_key(now) != self._period):
+                self._rotate()
+                position = 0
+            if self._count % self.index_every == 0:
+                with open(self.path + INDEX_SUFFIX, "a", encoding="utf-8") as index_file:
+                    index_file.write(json.dumps({"ts": record["ts"], "offset": position}) + "\n")
+            self._file.write(line)
+            self._file.flush()
+            self._count += 1
+
+    def _rotate(self):
+        """
+        轮转当前文件：改名为带时间戳的分段，交给后台线程压缩，再打开新文件
+        """
+        lock_file = None
+        try:
+            if fcntl is not None:
+                lock_file = open(self.path + ".lock", "w")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # 加锁后再确认一次：可能已被其他进程轮转
+            if os.path.exists(self.path) and os.stat(self.path).st_ino == self._inode:
+                stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+                base = self.path[:-len(".jsonl")] if self.path.endswith(".jsonl") else self.path
+                segment = f"{base}.{stamp}.{os.getpid()}.jsonl"
+                os.rename(self.path, segment)
+                if os.path.exists(self.path + INDEX_SUFFIX):
+                    os.rename(self.path + INDEX_SUFFIX, segment + INDEX_SUFFIX)
+                thread = threading.Thread(target=self._compress_segment, args=(segment,), daemon=True)
+                thread.start()
+                self._compress_threads = [t for t in self._compress_threads if t.is_alive()] + [thread]
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+        self._file.close()
+        self._open()
+
+    def close(self, timeout: float = None):
+        """
+        关闭文件，并等待后台压缩任务完成
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            threads = list(self._compress_threads)
+        for thread in threads:
+            thread.join(timeout)
 
-# 3. 定义日志文件路径（固定路径，所有模块共用）
-LOG_FILE_1 = os.path.join(LOG_DIR, "log_1.txt")
-LOG_FILE_2 = os.path.join(LOG_DIR, "log_2.txt")
-LOG_FILE_3 = os.path.join(LOG_DIR, "log_3.txt")
+    def _compress_segment(self, segment: str):
+        try:
+            meta = segment_meta(segment)
+            with open(segment, "rb") as src, gzip.open(segment + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            meta["file"] = os.path.basename(segment + ".gz")
+            with open(segment + ".gz" + META_SUFFIX, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            if os.path.exists(segment + INDEX_SUFFIX):
+                os.rename(segment + INDEX_SUFFIX, segment + ".gz" + INDEX_SUFFIX)
+            os.remove(segment)
+            self._remove_old_segments()
+        except Exception as e:
+            print(f"[日志系统错误] 压缩日志分段 {os.path.basename(segment)} 失败：{str(e)}")
+
+    def _remove_old_segments(self):
+        base = self.path[:-len(".jsonl")] if self.path.endswith(".jsonl") else self.path
+        segments = sorted(glob.glob(f"{glob.escape(base)}.*.jsonl.gz"))
+        for old in segments[:max(0, len(segments) - self.backup_count)]:
+            for path in (old, old + META_SUFFIX, old + INDEX_SUFFIX):
+                if os.path.exists(path):
+                    os.remove(path)
 
-# 日志等级与文件映射（全局统一）
-LEVEL_LOG_MAP = {
-    1: [LOG_FILE_1, LOG_FILE_2, LOG_FILE_3],
-    2: [LOG_FILE_2, LOG_FILE_3],
-    3: [LOG_FILE_3]
-}
+_writer = None
+_writer_lock = threading.Lock()
+
+def _get_writer() -> JsonLineWriter:
+    # 日志文件在第一次写日志时才打开（避免 import 时产生文件系统副作用）
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = JsonLineWriter()
+                # 进程退出时关闭日志文件，并等待后台压缩完成
+                atexit.register(_writer.close)
+    return _writer
 
 # --------------------------
-# 4. 日志核心函数（所有模块统一调用）
+# 6. 日志核心函数（所有模块统一调用）
 # --------------------------
-def log(erro_msg, level, filename): 
+def log(erro_msg, level, filename, duration_ms=None, **fields):
     """
-    项目公共日志函数
+    项目公共日志函数（结构化 JSON Lines，每条记录只写一次）
     :param erro_msg: 日志内容（str）
     :param level: 日志等级（1-3，1级最高）
     :param filename: 调用日志的文件名（用于定位错误）
+    :param duration_ms: 可选，操作耗时（毫秒）
+    :param fields: 其他需要记录的结构化字段
     """
 
     level = max(1, min(level, 3))
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-    log_msg = f"{current_time} | LEVEL-{level} | FILE-{os.path.basename(filename)} | {erro_msg}\n" 
-    
-    # 写入文件
-    for log_file in LEVEL_LOG_MAP[level]:
-        try:
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(log_msg)
-        except Exception as e:
-            print(f"[日志系统错误] 写入 {os.path.basename(log_file)} 失败：{str(e)}")
+    record = {
+        "ts": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        "level": level,
+        "module": os.path.basename(str(filename)),
+        "session": _session_var.get(),
+        "msg": str(erro_msg),
+    }
+    if duration_ms is not None:
+        record["duration_ms"] = round(duration_ms, 3)
+    if fields:
+        record.update(fields)
+
+    try:
+        _get_writer().write(record)
+    except Exception as e:
+        print(f"[日志系统错误] 写入 {os.path.basename(LOG_FILE)} 失败：{str(e)}")
+
+@contextmanager
+def log_timing(erro_msg, level, filename, **fields):
+    """
+    记录 with 块的耗时：块结束后写一条带 duration_ms 字段的日志
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        log(erro_msg, level, filename, duration_ms=(time.perf_counter() - start) * 1000, **fields)
 
 
 # 测试代码
 if __name__ == "__main__":
-    # 打印日志目录，验证路径是否正确
-    print(f"日志目录：{LOG_DIR}")
+    # 打印日志文件路径，验证路径是否正确
+    print(f"日志文件：{LOG_FILE}")
     # 测试不同等级日志
-    log("这是1级日志（最详细）", 1, __file__)
+    log("这是1级日志（最高）", 1, __file__)
     log("这是2级日志", 2, __file__)
-    log("这是3级日志（最简略）", 3, __file__)
-    log("等级超出范围（会被修正为3）", 5, __file__)
\ No newline at end of file
+    with log_session("demo-session"):
+        log("这是3级日志（最低），带会话ID", 3, __file__)
+    log("等级超出范围（会被修正为3）", 5, __file__)
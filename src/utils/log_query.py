@@ -0,0 +1,153 @@
+import os
+import sys
+import json
+import gzip
+import glob
+import bisect
+import argparse
+from typing import Iterator, Optional
+from src.utils.log import LOG_FILE, INDEX_SUFFIX, META_SUFFIX
+
+
+def _read_index(path: str) -> list:
+    """
+    读取稀疏索引文件，返回按时间排序的 [(ts, offset), ...]
+    """
+    points = []
+    if not os.path.exists(path):
+        return points
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                point = json.loads(line)
+                points.append((point["ts"], point["offset"]))
+            except (json.JSONDecodeError, KeyError):
+                continue
+    points.sort()
+    return points
+
+
+def list_segments(log_file: str = LOG_FILE) -> list:
+    """
+    列出所有日志分段（按时间先后）：已压缩的历史分段、尚未压缩的历史分段、当前活动文件
+    :return: [{"path", "compressed", "meta", "index"}, ...]
+    """
+    base = log_file[:-len(".jsonl")] if log_file.endswith(".jsonl") else log_file
+    segments = []
+    for path in sorted(glob.glob(f"{glob.escape(base)}.*.jsonl.gz")):
+        meta = None
+        if os.path.exists(path + META_SUFFIX):
+            with open(path + META_SUFFIX, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        segments.append({"path": path, "compressed": True, "meta": meta, "index": path + INDEX_SUFFIX})
+    for path in sorted(glob.glob(f"{glob.escape(base)}.*.jsonl")):
+        # 刚轮转、后台压缩尚未完成的分段
+        if not os.path.exists(path + ".gz" + META_SUFFIX):
+            segments.append({"path": path, "compressed": False, "meta": None, "index": path + INDEX_SUFFIX})
+    if os.path.exists(log_file):
+        segments.append({"path": log_file, "compressed": False, "meta": None, "index": log_file + INDEX_SUFFIX})
+    return segments
+
+
+def _segment_may_match(meta: Optional[dict], since, until, levels, session) -> bool:
+    """
+    根据分段摘要判断是否可能包含匹配记录（没有摘要时只能打开查看）
+    """
+    if not meta or meta.get("records", 0) == 0:
+        return meta is None
+    if since and meta.get("end_ts") and meta["end_ts"] < since:
+        return False
+    if until and meta.get("start_ts") and meta["start_ts"] > until:
+        return False
+    if levels and not any(str(level) in meta.get("levels", {}) for level in levels):
+        return False
+    if session and meta.get("sessions") is not None and session not in meta["sessions"]:
+        return False
+    return True
+
+
+def query(since: str = None, until: str = None, levels: list = None, session: str = None,
+          module: str = None, contains: str = None, log_file: str = LOG_FILE,
+          stats: dict = None) -> Iterator[dict]:
+    """
+    按条件查询日志
+    :param since / until: 时间范围（"YYYY-MM-DD HH:MM:SS[.mmm]"，字符串比较）
+    :param levels: 日志等级列表，如 [1, 2]
+    :param session: 会话ID
+    :param module: 模块文件名，如 worker.py
+    :param contains: 日志内容包含的子串
+    :param stats: 可选字典，用于返回跳过/扫描的分段数
+    :return: 逐条产出匹配的日志记录
+    """
+    stats = stats if stats is not None else {}
+    stats.update({"segments_skipped": 0, "segments_scanned": 0, "records_scanned": 0})
+    level_set = {int(level) for level in levels} if levels else None
+
+    for segment in list_segments(log_file):
+        if not _segment_may_match(segment["meta"], since, until, level_set, session):
+            stats["segments_skipped"] += 1
+            continue
+        stats["segments_scanned"] += 1
+
+        # 通过稀疏索引定位：从最后一个不晚于 since 的索引点开始读
+        offset = 0
+        if since:
+            points = _read_index(segment["index"])
+            position = bisect.bisect_right(points, (since, float("inf"))) - 1
+            if position >= 0:
+                offset = points[position][1]
+
+        opener = gzip.open if segment["compressed"] else open
+        with opener(segment["path"], "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                stats["records_scanned"] += 1
+                try:
+                    record = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                ts = record.get("ts", "")
+                if since and ts < since:
+                    continue
+                if until and ts > until:
+                    break
+                if level_set and record.get("level") not in level_set:
+                    continue
+                if session and record.get("session") != session:
+                    continue
+                if module and record.get("module") != module:
+                    continue
+                if contains and contains not in record.get("msg", ""):
+                    continue
+                yield record
+
+
+def main(argv=None):
+    """
+    命令行入口：python -m src.utils.log_query --since "2025-11-22 13:00:00" --level 1 2 --session abc
+    """
+    parser = argparse.ArgumentParser(description="结构化日志查询（利用分段摘要和稀疏索引跳过无关数据）")
+    parser.add_argument("--since", help="起始时间，如 2025-11-22 13:00:00")
+    parser.add_argument("--until", help="结束时间")
+    parser.add_argument("--level", type=int, nargs="+", help="日志等级，可多个")
+    parser.add_argument("--session", help="会话ID")
+    parser.add_argument("--module", help="模块文件名，如 worker.py")
+    parser.add_argument("--grep", help="日志内容包含的子串")
+    parser.add_argument("--limit", type=int, default=0, help="最多输出条数，0 表示不限")
+    parser.add_argument("--log-file", default=LOG_FILE, help="日志文件路径")
+    args = parser.parse_args(argv)
+
+    stats = {}
+    count = 0
+    for record in query(args.since, args.until, args.level, args.session, args.module,
+                        args.grep, log_file=args.log_file, stats=stats):
+        sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += 1
+        if args.limit and count >= args.limit:
+            break
+    print(f"匹配 {count} 条；扫描分段 {stats['segments_scanned']} 个，跳过 {stats['segments_skipped']} 个，"
+          f"读取记录 {stats['records_scanned']} 条", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import threading
+from typing import Callable
+
+
+class Metrics:
+    """
+    进程内运行指标（线程安全）：
+    - 计数器 incr：调用次数、命中次数、节省字节数等
+    - 观测值 observe：耗时等，记录次数 / 总和 / 最大值
+    - 动态指标 register_gauge：命中率、队列深度等在读取时实时计算
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._observations = {}
+        self._gauges = {}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            stat = self._observations.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            stat["count"] += 1
+            stat["sum"] += value
+            stat["max"] = max(stat["max"], value)
+
+    def register_gauge(self, name: str, func: Callable[[], float]):
+        """
+        注册动态指标，snapshot 时调用 func 获取当前值
+        """
+        with self._lock:
+            self._gauges[name] = func
+
+    def get(self, name: str, default: float = 0):
+        with self._lock:
+            return self._counters.get(name, default)
+
+    def snapshot(self) -> dict:
+        """
+        获取所有指标的当前值（扁平字典，便于写日志或输出 JSON）
+        """
+        with self._lock:
+            result = dict(self._counters)
+            for name, stat in self._observations.items():
+                result[f"{name}.count"] = stat["count"]
+                result[f"{name}.avg"] = round(stat["sum"] / stat["count"], 3) if stat["count"] else 0.0
+                result[f"{name}.max"] = round(stat["max"], 3)
+            gauges = list(self._gauges.items())
+        for name, func in gauges:
+            try:
+                result[name] = func()
+            except Exception:
+                result[name] = None
+        return dict(sorted(result.items()))
+
+    def reset(self):
+        """
+        清空计数器和观测值（动态指标保留）
+        """
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+# 全局指标实例（所有模块共用）
+metrics = Metrics()
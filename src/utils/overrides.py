@@ -0,0 +1,39 @@
+import os
+from contextlib import contextmanager
+
+# 临时替换属性 / 环境变量（基准测试、评估工具在运行期间替换大模型调用和配置读取），退出时恢复原值；
+# 供运行时代码使用，不依赖 unittest.mock
+_MISSING = object()
+
+
+@contextmanager
+def override_attr(obj, name: str, value):
+    """
+    临时把 obj.name 替换为 value；obj 自身没有该属性时（如 LazyImport 代理转发的属性）退出时删除，恢复为原来的查找结果
+    """
+    previous = vars(obj).get(name, _MISSING) if hasattr(obj, "__dict__") else getattr(obj, name, _MISSING)
+    setattr(obj, name, value)
+    try:
+        yield value
+    finally:
+        if previous is _MISSING:
+            delattr(obj, name)
+        else:
+            setattr(obj, name, previous)
+
+
+@contextmanager
+def override_env(**values):
+    """
+    临时设置环境变量，退出时恢复（原来不存在的变量删除）
+    """
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
@@ -0,0 +1,238 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from src.utils.log import log, LOG_DIR
+from src.utils.startup import _rjust
+
+# 环境变量开关：ECS_PROFILE=sample（栈采样，开销低，可在生产环境常开）或 cprofile（函数级精确统计，开销较高）
+PROFILE_MODE = os.getenv("ECS_PROFILE", "")
+PROFILE_INTERVAL = float(os.getenv("ECS_PROFILE_INTERVAL", "0.02"))  # 采样间隔（秒），生产环境建议 >= 0.02
+PROFILE_EVERY = int(os.getenv("ECS_PROFILE_EVERY", "0"))             # 每多少轮对话输出一次，0 表示会话结束时输出
+PROFILE_DIR = os.getenv("ECS_PROFILE_DIR", os.path.join(LOG_DIR, "profile"))
+MAX_STACK_DEPTH = 128
+SUMMARY_TOP = 40   # 函数汇总输出的行数
+
+PROFILE_MODES = ("sample", "cprofile")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """
+    栈采样器：后台线程每隔 interval 秒读取一次目标线程的调用栈（sys._current_frames），
+    累计为折叠栈计数（"a;b;c" -> 次数），可直接生成火焰图
+    只在目标线程登记期间（即对话轮次处理中、且不在等待用户输入时）采样
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = max(0.001, interval)
+        self.stacks = Counter()
+        self.samples = 0
+        self._targets = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_target(self, thread_id: int):
+        with self._lock:
+            self._targets.add(thread_id)
+
+    def remove_target(self, thread_id: int):
+        with self._lock:
+            self._targets.discard(thread_id)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                targets = set(self._targets)
+            if not targets:
+                continue
+            try:
+                frames = sys._current_frames()
+                collected = []
+                for thread_id in targets:
+                    frame = frames.get(thread_id)
+                    names = []
+                    while frame is not None and len(names) < MAX_STACK_DEPTH:
+                        names.append(_frame_name(frame))
+                        frame = frame.f_back
+                    if names:
+                        collected.append(";".join(reversed(names)))
+                with self._lock:
+                    self.stacks.update(collected)
+                    self.samples += len(collected)
+            except Exception:
+                # 采样失败不能影响业务线程
+                continue
+
+    def take(self) -> Counter:
+        """
+        取出并清空已累计的折叠栈
+        """
+        with self._lock:
+            stacks, self.stacks = self.stacks, Counter()
+            self.samples = 0
+        return stacks
+
+
+def summarize_stacks(stacks: Counter, top: int = SUMMARY_TOP) -> str:
+    """
+    由折叠栈生成函数级汇总：自身采样数（位于栈顶）与累计采样数（出现在栈中）
+    """
+    total = sum(stacks.values())
+    self_counts, inclusive = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += count
+        for name in set(frames):
+            inclusive[name] += count
+    # 表头含中文，按显示宽度对齐
+    lines = [f"采样总数：{total}", f"{_rjust('累计%', 8)}{_rjust('自身%', 8)}{_rjust('累计', 8)}{_rjust('自身', 8)}  函数"]
+    for name, count in inclusive.most_common(top):
+        lines.append(f"{count * 100 / total:>8.1f}{self_counts[name] * 100 / total:>8.1f}"
+                     f"{count:>8}{self_counts[name]:>8}  {name}")
+    return "\n".join(lines) + "\n"
+
+
+class SessionProfiler:
+    """
+    对话会话剖析：包住每一轮对话的处理过程（with profiler.turn(): ...），
+    每 every 轮（0 表示会话结束时）把结果写入 output_dir：
+    - sample 模式：<会话>-<序号>.collapsed（火焰图折叠栈）+ .summary.txt（函数汇总）
+    - cprofile 模式：<会话>-<序号>.prof（pstats 原始数据）+ .summary.txt（按累计耗时排序）
+    """
+
+    def __init__(self, mode: str = "sample", interval: float = PROFILE_INTERVAL, every: int = PROFILE_EVERY,
+                 output_dir: str = PROFILE_DIR, session_id: str = "session"):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"未知的剖析模式：{mode}，可选 {PROFILE_MODES}")
+        self.mode = mode
+        self.every = max(0, every)
+        self.output_dir = output_dir
+        self.session_id = session_id
+        self.turns = 0
+        self._sequence = 0
+        self._sampler = StackSampler(interval) if mode == "sample" else None
+        self._profile = cProfile.Profile() if mode == "cprofile" else None
+        self._pending = False  # 上次输出之后是否有新的数据
+        self._in_turn = False  # 是否正在剖析一轮对话
+
+    def start(self) -> "SessionProfiler":
+        if self._sampler is not None:
+            self._sampler.start()
+        log(f"性能剖析已开启：mode={self.mode}，输出目录 {self.output_dir}", 2, __file__)
+        return self
+
+    def stop(self):
+        """
+        结束剖析，输出尚未写出的结果
+        """
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._pending:
+            self.dump()
+
+    @contextmanager
+    def turn(self):
+        """
+        剖析一轮对话
+        """
+        self._resume()
+        self._in_turn = True
+        try:
+            yield
+        finally:
+            self._in_turn = False
+            self._suspend()
+            self.turns += 1
+            self._pending = True
+            if self.every and self.turns % self.every == 0:
+                self.dump()
+
+    @contextmanager
+    def paused(self):
+        """
+        轮次中暂停剖析（如等待用户输入），退出时恢复；不在轮次中时什么也不做
+        """
+        if not self._in_turn:
+            yield
+            return
+        self._suspend()
+        try:
+            yield
+        finally:
+            self._resume()
+
+    def _resume(self):
+        if self._sampler is not None:
+            self._sampler.add_target(threading.get_ident())
+        elif self._profile is not None:
+            self._profile.enable()
+
+    def _suspend(self):
+        if self._sampler is not None:
+            self._sampler.remove_target(threading.get_ident())
+        elif self._profile is not None:
+            self._profile.disable()
+
+    def dump(self) -> list:
+        """
+        把当前累计的结果写入文件并清空
+        :return: 写出的文件路径列表
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._sequence += 1
+        base = os.path.join(self.output_dir, f"{self.session_id}-{time.strftime('%Y%m%d%H%M%S')}-{self._sequence:03d}")
+        paths = []
+        if self._sampler is not None:
+            stacks = self._sampler.take()
+            with open(base + ".collapsed", "w", encoding="utf-8") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            summary = summarize_stacks(stacks) if stacks else "采样总数：0\n"
+            paths.append(base + ".collapsed")
+        else:
+            self._profile.dump_stats(base + ".prof")
+            buffer = io.StringIO()
+            stats = pstats.Stats(self._profile, stream=buffer)
+            stats.sort_stats("cumulative").print_stats(SUMMARY_TOP)
+            summary = buffer.getvalue()
+            paths.append(base + ".prof")
+            self._profile = cProfile.Profile()
+        with open(base + ".summary.txt", "w", encoding="utf-8") as f:
+            f.write(summary)
+        paths.append(base + ".summary.txt")
+        self._pending = False
+        log(f"性能剖析结果已写入：{', '.join(os.path.basename(path) for path in paths)}", 2, __file__)
+        return paths
+
+
+def profiler_from_env(session_id: str, mode: str = None, interval: float = None, every: int = None):
+    """
+    根据命令行参数（优先）或环境变量创建剖析器；未开启时返回None
+    """
+    mode = mode or PROFILE_MODE
+    if not mode:
+        return None
+    return SessionProfiler(mode=mode, interval=PROFILE_INTERVAL if interval is None else interval,
+                           every=PROFILE_EVERY if every is None else every, session_id=session_id)
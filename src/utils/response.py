@@ -0,0 +1,209 @@
+import os
+import json
+import socket
+import string
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from src.utils.log import log
+from src.utils.metrics import metrics
+
+# 回复的缓冲与输出：处理函数把回复追加到 ResponseBuilder，每轮结束（或需要用户输入前）一次性写到输出端（sink），
+# 一轮多行回复只产生一次写入；同一套处理函数可以对接控制台、socket 或批量输出文件。
+# RESPONSE_SINK=console（默认，标准输出）、file:/path/to/replies.jsonl（批量输出，每轮一行 JSON）
+# 或 tcp:host:port（每轮回复以一段 UTF-8 文本发送到该地址）
+RESPONSE_SINK = os.getenv("RESPONSE_SINK", "console")
+SOCKET_TIMEOUT = float(os.getenv("RESPONSE_SOCKET_TIMEOUT", "5"))  # 秒
+
+_formatter = string.Formatter()
+
+
+class Template:
+    """
+    回复模板：创建时解析并校验占位符（格式错误在导入时即报出），渲染即 str.format
+    """
+    __slots__ = ("text", "fields", "_format")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.fields = tuple(field for _, field, _, _ in _formatter.parse(text) if field)
+        self._format = text.format
+
+    def render(self, **values) -> str:
+        return self._format(**values) if self.fields else self.text
+
+
+def compile_templates(templates: dict) -> dict:
+    """
+    :param templates: {名称: 模板文本}
+    :return: {名称: Template}
+    """
+    return {name: Template(text) for name, text in templates.items()}
+
+
+class ResponseBuilder:
+    """
+    一轮对话的回复缓冲：add / render 追加行，flush 时合并为一次写入
+    """
+
+    def __init__(self, templates: dict = None):
+        self.templates = templates or {}
+        self.lines = []
+
+    def add(self, text: str):
+        self.lines.append(text)
+
+    def render(self, template: str, /, **values):
+        # 模板名只能按位置传入，不与模板中的占位符（如 {name}）冲突
+        self.lines.append(self.templates[template].render(**values))
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def flush(self, sink, session_id: str = None) -> bool:
+        """
+        把缓冲的回复写到 sink 并清空；没有内容时不写
+        :return: 是否有写入
+        """
+        if not self.lines:
+            return False
+        text = self.text()
+        self.lines = []
+        sink.write(text, session_id)
+        metrics.incr("response.flushes")
+        return True
+
+
+class ResponseSink(ABC):
+    """
+    回复输出端接口：write 接收一轮的完整回复文本（多行以换行分隔）
+    """
+
+    @abstractmethod
+    def write(self, text: str, session_id: str = None):
+        pass
+
+    def close(self):
+        pass
+
+
+class ConsoleSink(ResponseSink):
+    """
+    输出到标准输出（默认）；写入时才取 sys.stdout，便于 redirect_stdout
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, text: str, session_id: str = None):
+        if self.stream is None:
+            print(text)
+        else:
+            print(text, file=self.stream)
+
+
+class MemorySink(ResponseSink):
+    """
+    保存在内存中（测试、预热回放等不需要真正输出的场景）
+    """
+
+    def __init__(self):
+        self.outputs = []
+
+    def write(self, text: str, session_id: str = None):
+        self.outputs.append(text)
+
+    def text(self) -> str:
+        return "\n".join(self.outputs)
+
+
+class FileSink(ResponseSink):
+    """
+    批量输出文件：每轮一行 JSON（时间、会话ID、回复），多个会话共用时按行加锁写入
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, text: str, session_id: str = None):
+        record = {"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "session_id": session_id, "text": text}
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class SocketSink(ResponseSink):
+    """
+    发送到 socket：可传入已建立的连接（如服务端 accept 得到的连接），或给出地址在首次写入时连接；
+    每轮回复以换行结尾，一次 sendall
+    """
+
+    def __init__(self, conn: socket.socket = None, address: tuple = None, timeout: float = SOCKET_TIMEOUT):
+        if conn is None and address is None:
+            raise ValueError("SocketSink 需要 conn 或 address")
+        self.conn = conn
+        self.address = address
+        self.timeout = timeout
+        self._lock = threading.Lock()
+
+    def write(self, text: str, session_id: str = None):
+        data = (text + "\n").encode("utf-8")
+        with self._lock:
+            if self.conn is None:
+                self.conn = socket.create_connection(self.address, timeout=self.timeout)
+            try:
+                self.conn.sendall(data)
+            except OSError:
+                # 连接已失效（如对端重置）：关闭并丢弃，配置了 address 时下一次写入重新连接
+                self.conn.close()
+                self.conn = None
+                raise
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+def create_response_sink(spec: str = None) -> ResponseSink:
+    """
+    根据配置创建回复输出端
+    :param spec: "console"、"file:/path/to/replies.jsonl" 或 "tcp:host:port"，默认读取环境变量 RESPONSE_SINK
+    """
+    spec = spec or RESPONSE_SINK
+    if spec.startswith("file:"):
+        path = spec[len("file:"):]
+        log(f"回复输出到文件：{path}", 3, __file__)
+        return FileSink(path)
+    if spec.startswith("tcp:"):
+        host, _, port = spec[len("tcp:"):].rpartition(":")
+        log(f"回复输出到 socket：{host}:{port}", 3, __file__)
+        return SocketSink(address=(host, int(port)))
+    if spec != "console":
+        log(f"未知的回复输出配置 {spec}，使用控制台输出", 2, __file__)
+    return ConsoleSink()
+
+
+_default_sink = None
+_default_lock = threading.Lock()
+
+
+def get_default_sink() -> ResponseSink:
+    """
+    进程内共享的默认回复输出端（同一进程的所有 Receiver 共用）
+    """
+    global _default_sink
+    with _default_lock:
+        if _default_sink is None:
+            _default_sink = create_response_sink()
+        return _default_sink
@@ -0,0 +1,218 @@
+import os
+import re
+import math
+import zlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+from src.utils.metrics import metrics
+
+# 语气词、人称代词等对语义影响很小的填充词，向量化前去掉，让 "快递太慢" 和 "你们快递慢死了" 更接近
+_FILLER_PATTERN = re.compile("你们|我们|咱们|一下|非常|特别|真的|麻烦|请问|[我你您他她它的了吗呢吧啊呀哦嘛么太很真]")
+# 否定词决定语义方向（"我不要退货" 与 "我要退货" 字面很接近），否定词不同的输入互不命中
+_NEGATION_PATTERN = re.compile("[不没别未无非]")
+
+# 各调用类型的默认配置：enabled 是否启用，threshold 余弦相似度阈值，maxsize 最大条目数
+# 手机号提取对具体数字敏感，相似文本不代表相同结果，默认关闭
+# 投诉归纳的结果会作为该用户的投诉记录保存，不能复用其他用户相似投诉的归纳，不使用语义缓存
+SEMANTIC_CACHE_SETTINGS = {
+    "recognize_intent": {"enabled": True, "threshold": 0.75, "maxsize": 2048},
+    "pharse_phone_number": {"enabled": False, "threshold": 1.0, "maxsize": 0},
+}
+# 环境变量 SEMANTIC_CACHE_DISABLE="recognize_intent" 可按函数关闭语义缓存
+_DISABLED_BY_ENV = {name.strip() for name in os.getenv("SEMANTIC_CACHE_DISABLE", "").split(",") if name.strip()}
+
+
+def normalize_text(text: str) -> str:
+    """
+    文本归一化：全半角统一、转小写、去掉空白和标点
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(ch for ch in text if not ch.isspace() and not unicodedata.category(ch).startswith("P"))
+
+
+class HashedNgramVectorizer:
+    """
+    无需训练、无第三方依赖的文本向量化：字符 n-gram 经哈希映射到固定维度的稀疏向量（L2 归一化）
+    """
+
+    def __init__(self, dim: int = 1 << 18, ngram_range: tuple = (1, 3), strip_fillers: bool = True):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.strip_fillers = strip_fillers
+
+    def tokens(self, text: str) -> str:
+        """
+        向量化前的预处理结果（去填充词后为空时保留原文）
+        """
+        text = normalize_text(text)
+        if self.strip_fillers:
+            stripped = _FILLER_PATTERN.sub("", text)
+            text = stripped or text
+        return text
+
+    def transform(self, text: str) -> dict:
+        """
+        :return: 稀疏向量 {特征下标: 权重}，空文本返回空字典
+        """
+        text = self.tokens(text)
+        vector = {}
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                # crc32 跨进程稳定（内置 hash 对 str 有随机化）
+                index = zlib.crc32(text[i:i + n].encode("utf-8")) % self.dim
+                vector[index] = vector.get(index, 0.0) + 1.0
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if norm == 0:
+            return {}
+        return {index: value / norm for index, value in vector.items()}
+
+    def negations(self, text: str) -> str:
+        """
+        文本中依次出现的否定词（"不查订单" -> "不"），作为缓存条目的一部分键
+        """
+        return "".join(_NEGATION_PATTERN.findall(normalize_text(text)))
+
+
+class SemanticCache:
+    """
+    语义缓存：新输入与已缓存输入的余弦相似度达到阈值即视为命中
+    - 倒排索引（特征 -> 条目）只对共享特征的候选条目打分，无需全量扫描
+    - 按 LRU 淘汰，条目数不超过 maxsize
+    - scope 用于隔离不同的上下文（如不同的意图字典），不同 scope 之间不会互相命中
+    - 否定词不同的输入（"不查订单" / "查订单"）视为不同 scope，不会互相命中
+    """
+
+    def __init__(self, name: str, threshold: float = 0.8, maxsize: int = 1024, vectorizer: HashedNgramVectorizer = None):
+        self.name = name
+        self.threshold = threshold
+        self.maxsize = max(1, maxsize)
+        self.vectorizer = vectorizer or HashedNgramVectorizer()
+        self._entries = OrderedDict()  # 条目id -> (scope, 向量, 值)
+        self._postings = {}            # 特征下标 -> {条目id, ...}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, text: str, scope=None):
+        """
+        查找语义相近的缓存结果
+        :return: (值, 相似度)；未命中返回None
+        """
+        vector = self.vectorizer.transform(text)
+        if not vector:
+            return None
+        scope = (scope, self.vectorizer.negations(text))
+        with self._lock:
+            scores = {}
+            for index, weight in vector.items():
+                for entry_id in self._postings.get(index, ()):
+                    scores[entry_id] = scores.get(entry_id, 0.0) + weight * self._entries[entry_id][1][index]
+
+            best_id, best_score = None, 0.0
+            for entry_id, score in scores.items():
+                if score > best_score and self._entries[entry_id][0] == scope:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None or best_score < self.threshold:
+                self.misses += 1
+                metrics.incr(f"semantic_cache.{self.name}.misses")
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            value = self._entries[best_id][2]
+        metrics.incr(f"semantic_cache.{self.name}.hits")
+        return value, round(best_score, 4)
+
+    def add(self, text: str, value, scope=None):
+        """
+        写入缓存（超过容量时淘汰最久未使用的条目）
+        """
+        vector = self.vectorizer.transform(text)
+        if not vector:
+            return
+        scope = (scope, self.vectorizer.negations(text))
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (scope, vector, value)
+            for index in vector:
+                self._postings.setdefault(index, set()).add(entry_id)
+            while len(self._entries) > self.maxsize:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        entry_id, (_, vector, _) = self._entries.popitem(last=False)
+        for index in vector:
+            posting = self._postings.get(index)
+            if posting is not None:
+                posting.discard(entry_id)
+                if not posting:
+                    del self._postings[index]
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return round(self.hits / total, 4) if total else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+# 各调用类型的缓存实例（按需创建）
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def configure_semantic_cache(name: str, enabled: bool = None, threshold: float = None, maxsize: int = None):
+    """
+    调整某个调用类型的语义缓存配置（enabled=False 即为该函数关闭语义缓存）
+    """
+    with _caches_lock:
+        settings = SEMANTIC_CACHE_SETTINGS.setdefault(name, {"enabled": True, "threshold": 0.8, "maxsize": 1024})
+        if enabled is not None:
+            settings["enabled"] = enabled
+        if threshold is not None:
+            settings["threshold"] = threshold
+        if maxsize is not None:
+            settings["maxsize"] = maxsize
+        cache = _caches.get(name)
+        if cache is not None:
+            cache.threshold = settings["threshold"]
+            cache.maxsize = max(1, settings["maxsize"])
+
+
+def get_semantic_cache(name: str) -> Optional[SemanticCache]:
+    """
+    获取某个调用类型的语义缓存
+    :return: SemanticCache；该调用类型未启用语义缓存时返回None
+    """
+    settings = SEMANTIC_CACHE_SETTINGS.get(name)
+    if not settings or not settings.get("enabled") or name in _DISABLED_BY_ENV:
+        return None
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = SemanticCache(name, threshold=settings["threshold"], maxsize=settings["maxsize"])
+            _caches[name] = cache
+            metrics.register_gauge(f"semantic_cache.{name}.hit_rate", cache.hit_rate)
+        return cache
+
+
+def clear_semantic_caches():
+    """
+    清空所有语义缓存
+    """
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.clear()
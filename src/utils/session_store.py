@@ -0,0 +1,239 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from src.utils.log import log
+from src.utils.metrics import metrics
+
+# 默认参数（可通过环境变量调整）
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))                  # 会话空闲多久后过期（秒）
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))  # 最多保留的会话数
+# SESSION_STORE=memory（默认，进程内）或 sqlite:/path/to/sessions.db（多进程共享）
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+
+
+class SessionStore(ABC):
+    """
+    会话状态存储接口：每个会话是一个可 JSON 序列化的字典
+    - 空闲超过 ttl 秒的会话自动过期
+    - 会话数超过 max_sessions 时淘汰最久未更新的会话
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max(1, max_sessions)
+
+    @abstractmethod
+    def get(self, session_id: str) -> dict:
+        """
+        读取会话数据，不存在或已过期返回空字典
+        """
+        ...
+
+    @abstractmethod
+    def update(self, session_id: str, data: dict):
+        """
+        合并写入会话数据（值为None的字段会被删除），同时刷新会话的空闲计时
+        """
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+    @abstractmethod
+    def evict_expired(self) -> int:
+        """
+        清理已过期的会话
+        :return: 清理的会话数
+        """
+        ...
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    def get_value(self, session_id: str, key: str, default=None):
+        return self.get(session_id).get(key, default)
+
+    def set_value(self, session_id: str, key: str, value):
+        self.update(session_id, {key: value})
+
+
+def _merge(current: dict, data: dict) -> dict:
+    merged = dict(current)
+    for key, value in data.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    进程内会话存储：OrderedDict 按最近更新时间排序，过期会话总是集中在头部，清理代价与过期数成正比
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_SESSIONS):
+        super().__init__(ttl, max_sessions)
+        self._sessions = OrderedDict()  # session_id -> (最近更新时间, 数据)
+        self._lock = threading.Lock()
+
+    def _evict_expired_locked(self, now: float) -> int:
+        evicted = 0
+        while self._sessions:
+            session_id, (updated_at, _) = next(iter(self._sessions.items()))
+            if now - updated_at < self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            evicted += 1
+        if evicted:
+            metrics.incr("session_store.expired", evicted)
+        return evicted
+
+    def get(self, session_id: str) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired_locked(now)
+            item = self._sessions.get(session_id)
+            return dict(item[1]) if item else {}
+
+    def update(self, session_id: str, data: dict):
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired_locked(now)
+            item = self._sessions.pop(session_id, None)
+            self._sessions[session_id] = (now, _merge(item[1] if item else {}, data))
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                metrics.incr("session_store.evicted")
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def evict_expired(self) -> int:
+        with self._lock:
+            return self._evict_expired_locked(time.monotonic())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    基于 SQLite 文件的会话存储：多个进程打开同一个数据库文件即可共享会话，
+    任意进程都能处理同一会话的任意一轮对话
+    """
+
+    EVICT_INTERVAL = 30  # 过期清理的最小间隔（秒），避免每次写入都做全表清理
+
+    def __init__(self, path: str, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_SESSIONS):
+        super().__init__(ttl, max_sessions)
+        self.path = path
+        self._local = threading.local()  # sqlite3 连接不能跨线程共享，每个线程一个连接
+        self._last_evict = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                           "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)")
+        connection.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated_at)")
+        connection.commit()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")  # 读写并发更友好
+            self._local.connection = connection
+        return connection
+
+    def get(self, session_id: str) -> dict:
+        row = self._connection().execute(
+            "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return {}
+        if time.time() - row[1] >= self.ttl:
+            self.delete(session_id)
+            metrics.incr("session_store.expired")
+            return {}
+        return json.loads(row[0])
+
+    def update(self, session_id: str, data: dict):
+        connection = self._connection()
+        now = time.time()
+        with connection:  # 事务：读-合并-写 原子完成
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            current = json.loads(row[0]) if row and now - row[1] < self.ttl else {}
+            connection.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(_merge(current, data), ensure_ascii=False), now))
+            if row is None:
+                self._enforce_cap(connection)
+        if now - self._last_evict >= self.EVICT_INTERVAL:
+            self.evict_expired()
+
+    def _enforce_cap(self, connection: sqlite3.Connection):
+        count = connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        overflow = count - self.max_sessions
+        if overflow > 0:
+            connection.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY updated_at LIMIT ?)", (overflow,))
+            metrics.incr("session_store.evicted", overflow)
+
+    def delete(self, session_id: str):
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def evict_expired(self) -> int:
+        self._last_evict = time.time()
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute("DELETE FROM sessions WHERE updated_at <= ?", (time.time() - self.ttl,))
+        if cursor.rowcount:
+            metrics.incr("session_store.expired", cursor.rowcount)
+        return cursor.rowcount
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def create_session_store(spec: str = None) -> SessionStore:
+    """
+    根据配置创建会话存储
+    :param spec: "memory" 或 "sqlite:/path/to/sessions.db"，默认读取环境变量 SESSION_STORE
+    """
+    spec = spec or SESSION_STORE
+    if spec.startswith("sqlite:"):
+        path = spec[len("sqlite:"):]
+        log(f"使用 SQLite 会话存储：{path}", 3, __file__)
+        return SQLiteSessionStore(path)
+    if spec != "memory":
+        log(f"未知的会话存储配置 {spec}，使用进程内存储", 2, __file__)
+    return InMemorySessionStore()
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_default_store() -> SessionStore:
+    """
+    进程内共享的默认会话存储（同一进程的所有 Receiver 共用，会话数上限对整个进程生效）
+    """
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = create_session_store()
+            metrics.register_gauge("session_store.sessions", lambda: len(_default_store))
+        return _default_store
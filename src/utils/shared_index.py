@@ -0,0 +1,337 @@
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import argparse
+import tempfile
+import threading
+from typing import Callable, Iterable, Iterator, Optional, Sequence
+from src.utils.log import log
+from src.utils.config import CONFIG_DIR, PROJECT_ROOT
+from src.utils.json_stream import ParseStats, iter_file, index_key
+
+# 多进程部署时的只读共享索引：
+# 订单、会员、产品数据各构建一次为排序后的二进制索引文件，各进程以只读 mmap 方式映射同一个文件，
+# 数据页由操作系统页缓存共享，进程数增加时每个进程的内存占用基本不变（只有实际访问过的页会映射进来）。
+# 源文件变化后构建新版本并通过指针文件原子切换，已映射旧版本的进程在下一次检查时切换到新版本。
+INDEX_DIR = os.getenv("SHARED_INDEX_DIR", os.path.join(PROJECT_ROOT, ".index"))
+INDEX_CHECK_INTERVAL = float(os.getenv("SHARED_INDEX_CHECK_INTERVAL", "1"))  # 检查源文件变化的最小间隔（秒）
+INDEX_KEEP_VERSIONS = 2   # 保留的历史版本数（其余删除，已映射的进程不受影响）
+
+# 文件格式（小端）：
+#   头部：魔数(8) + 条目数 u32 + 源文件版本长度 u32 + 源文件版本(utf-8)
+#   条目表：每条 (键偏移 u64, 键长度 u32, 值偏移 u64, 值长度 u32)，按键的 utf-8 字节序排序
+#   数据区：键与值（紧凑 JSON）依次存放
+MAGIC = b"ECSIDX1\0"
+_HEADER = struct.Struct("<8sII")
+_ENTRY = struct.Struct("<QIQI")
+
+
+def _iter_orders(pairs) -> Iterator[tuple]:
+    for phone, order in pairs:
+        yield str(phone), order
+
+
+def _iter_members(pairs) -> Iterator[tuple]:
+    for _, member in pairs:
+        if isinstance(member, dict) and member.get("phone"):
+            yield str(member["phone"]).strip(), member
+
+
+def _iter_products(pairs) -> Iterator[tuple]:
+    for position, product in pairs:
+        yield index_key(position), product
+
+
+# 索引名 -> (源文件, 源文件中的容器路径, 由流式解析出的 (键, 值) 生成索引条目的函数)
+# 源文件按条目流式解析（见 src/utils/json_stream.py），构建 GB 级数据的索引时峰值内存也与文件大小无关
+INDEX_SPECS = {
+    "orders": (os.path.join(CONFIG_DIR, "user_orders.json"), (), _iter_orders),
+    "members": (os.path.join(CONFIG_DIR, "userMemberList.json"), ("userMemberList",), _iter_members),
+    "products": (os.path.join(CONFIG_DIR, "products.json"), (), _iter_products),
+}
+
+
+def source_version(path: str) -> Optional[str]:
+    """
+    源文件版本：大小 + 修改时间（不读取文件内容，超大文件也能快速判断是否变化）
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def write_index(path: str, items: Iterable[tuple], version: str = "") -> int:
+    """
+    把 (键, 值) 写成索引文件（先写临时文件再原子替换）
+    值逐条序列化写入数据区，内存中只保留键和偏移；重复的键保留第一次出现的值
+    :return: 条目数
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    entries, seen = [], set()
+    fd, values_path = tempfile.mkstemp(dir=directory, suffix=".values")
+    try:
+        with os.fdopen(fd, "wb") as values_file:
+            offset = 0
+            for key, value in items:
+                key_bytes = str(key).encode("utf-8")
+                if key_bytes in seen:
+                    continue
+                seen.add(key_bytes)
+                value_bytes = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                values_file.write(key_bytes)
+                values_file.write(value_bytes)
+                entries.append((key_bytes, offset, offset + len(key_bytes), len(value_bytes)))
+                offset += len(key_bytes) + len(value_bytes)
+        entries.sort(key=lambda entry: entry[0])
+
+        version_bytes = version.encode("utf-8")
+        data_start = _HEADER.size + len(version_bytes) + _ENTRY.size * len(entries)
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, len(entries), len(version_bytes)))
+            f.write(version_bytes)
+            for key_bytes, key_offset, value_offset, value_length in entries:
+                f.write(_ENTRY.pack(data_start + key_offset, len(key_bytes), data_start + value_offset, value_length))
+            with open(values_path, "rb") as values_file:
+                while True:
+                    chunk = values_file.read(1 << 20)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(values_path):
+            os.remove(values_path)
+    return len(entries)
+
+
+def _pointer_path(index_dir: str, name: str) -> str:
+    return os.path.join(index_dir, f"{name}.current")
+
+
+def publish_index(name: str, index_dir: str = INDEX_DIR, source: str = None,
+                  items_func: Callable = None, json_path: Sequence = None) -> str:
+    """
+    构建索引的新版本并原子发布：写入 <name>-<源文件版本>.idx，再原子替换指针文件 <name>.current
+    同一版本已发布时直接返回；多个进程同时构建也只是重复劳动，不会读到写了一半的文件
+    :param items_func: 把流式解析出的 (键, 值) 转换为索引条目的函数，默认取 INDEX_SPECS
+    :param json_path: 源文件中要遍历的容器路径，默认取 INDEX_SPECS
+    :return: 发布的索引文件名
+    """
+    spec_source, spec_path, spec_items = INDEX_SPECS.get(name, (None, (), None))
+    source = source or spec_source
+    items_func = items_func or spec_items
+    json_path = spec_path if json_path is None else json_path
+    if source is None or items_func is None:
+        raise ValueError(f"未知的索引：{name}，可选 {sorted(INDEX_SPECS)}")
+
+    version = source_version(source)
+    if version is None:
+        raise FileNotFoundError(f"索引源文件不存在：{source}")
+    filename = f"{name}-{version}.idx"
+    pointer = _pointer_path(index_dir, name)
+    if _read_pointer(pointer) == filename and os.path.exists(os.path.join(index_dir, filename)):
+        return filename
+
+    start = time.perf_counter()
+    stats = ParseStats()
+    count = write_index(os.path.join(index_dir, filename), items_func(iter_file(source, json_path, stats)), version)
+    fd, temp_pointer = tempfile.mkstemp(dir=index_dir, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(filename)
+    os.replace(temp_pointer, pointer)
+    _remove_old_versions(index_dir, name, keep=filename)
+    log(f"共享索引已发布：{filename}（{count} 条，总耗时 {(time.perf_counter() - start) * 1000:.1f}ms；"
+        f"解析 {stats.report()}）", 2, __file__)
+    return filename
+
+
+def _read_pointer(pointer: str) -> Optional[str]:
+    try:
+        with open(pointer, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _remove_old_versions(index_dir: str, name: str, keep: str):
+    versions = sorted((entry for entry in os.scandir(index_dir)
+                       if entry.name.startswith(f"{name}-") and entry.name.endswith(".idx") and entry.name != keep),
+                      key=lambda entry: entry.stat().st_mtime_ns, reverse=True)
+    for entry in versions[INDEX_KEEP_VERSIONS - 1:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            # Windows 下仍被映射的文件无法删除，下次发布时再清理
+            pass
+
+
+class SharedIndex:
+    """
+    只读共享索引（按键二分查找，只解析命中的那一条记录）
+    每隔 check_interval 秒检查一次源文件版本：源文件已变化时发布新版本（或挂接其他进程已发布的新版本）
+    """
+
+    def __init__(self, name: str, index_dir: str = INDEX_DIR, source: str = None, items_func: Callable = None,
+                 check_interval: float = INDEX_CHECK_INTERVAL, auto_publish: bool = True):
+        self.name = name
+        self.index_dir = index_dir
+        self.source = source or INDEX_SPECS.get(name, (None,))[0]
+        self.items_func = items_func
+        self.check_interval = check_interval
+        self.auto_publish = auto_publish
+        self.version = None
+        self.filename = None
+        # (映射, 条目数, 条目表起始偏移, 版本)，切换版本时整体替换，读取方先取局部引用，不会混用新旧版本
+        self._state = None
+        self._values = None  # (所属的 _state, values() 的解析结果)
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _attach(self, filename: str):
+        with open(os.path.join(self.index_dir, filename), "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, version_length = _HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            mapped.close()
+            raise ValueError(f"不是有效的共享索引文件：{filename}")
+        version = mapped[_HEADER.size:_HEADER.size + version_length].decode("utf-8")
+        self.version = version
+        self.filename = filename
+        # 旧映射可能正被其他线程读取，不主动关闭，没有引用后由垃圾回收释放
+        self._state = (mapped, count, _HEADER.size + version_length, version)
+
+    def refresh(self, force: bool = False):
+        """
+        检查源文件是否变化，必要时发布并切换到新版本
+        """
+        now = time.monotonic()
+        if not force and self._state is not None and self._checked_at is not None \
+                and now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            current = source_version(self.source) if self.source else None
+            if self._state is not None and (current is None or current == self.version):
+                return
+            pointer = _read_pointer(_pointer_path(self.index_dir, self.name))
+            if pointer is not None and (current is None or pointer == f"{self.name}-{current}.idx") \
+                    and os.path.exists(os.path.join(self.index_dir, pointer)):
+                filename = pointer
+            elif self.auto_publish:
+                filename = publish_index(self.name, self.index_dir, self.source, self.items_func)
+            else:
+                raise FileNotFoundError(f"共享索引尚未发布：{self.name}")
+            if filename != self.filename:
+                self._attach(filename)
+
+    def get(self, key: str, default=None):
+        """
+        按键查询，返回新解析的对象（调用方可以修改）
+        """
+        self.refresh()
+        mapped, count, table, _ = self._state
+        target = str(key).encode("utf-8")
+        low, high = 0, count
+        while low < high:
+            middle = (low + high) // 2
+            key_offset, key_length, _, _ = _ENTRY.unpack_from(mapped, table + middle * _ENTRY.size)
+            if mapped[key_offset:key_offset + key_length] < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < count:
+            key_offset, key_length, value_offset, value_length = _ENTRY.unpack_from(mapped, table + low * _ENTRY.size)
+            if mapped[key_offset:key_offset + key_length] == target:
+                return json.loads(mapped[value_offset:value_offset + value_length])
+        return default
+
+    def values(self) -> list:
+        """
+        按键顺序返回所有记录（产品索引的键为原列表中的位置，顺序与源文件一致）
+        """
+        return self.versioned_values()[0]
+
+    def versioned_values(self) -> tuple:
+        """
+        按键顺序返回所有记录及其版本号（取自同一个状态，刷新不会把新列表与旧版本号配对）。
+        解析结果按版本缓存：每个版本只解析一次，之后直接返回（缓存共享，调用方不要原地修改）
+        :return: (记录列表, 版本号)
+        """
+        self.refresh()
+        state = self._state
+        cached = self._values
+        if cached is not None and cached[0] is state:
+            return cached[1], state[3]
+        mapped, count, table, version = state
+        values = []
+        for position in range(count):
+            _, _, value_offset, value_length = _ENTRY.unpack_from(mapped, table + position * _ENTRY.size)
+            values.append(json.loads(mapped[value_offset:value_offset + value_length]))
+        self._values = (state, values)
+        return values, version
+
+    def __len__(self) -> int:
+        self.refresh()
+        return self._state[1]
+
+    def close(self):
+        with self._lock:
+            if self._state is not None:
+                self._state[0].close()
+                self._state = None
+                self._values = None
+                self.filename = None
+                self.version = None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_shared_index(name: str) -> SharedIndex:
+    """
+    获取本进程的共享索引实例（首次使用时挂接，索引不存在或过期时自动发布）
+    """
+    index = _indexes.get(name)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(name)
+            if index is None:
+                if name not in INDEX_SPECS:
+                    raise ValueError(f"未知的索引：{name}，可选 {sorted(INDEX_SPECS)}")
+                index = _indexes[name] = SharedIndex(name)
+    return index
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="构建 / 查看多进程共享的只读数据索引")
+    parser.add_argument("command", choices=["build", "stats"], help="build：构建并发布索引；stats：查看已发布的版本")
+    parser.add_argument("--names", nargs="+", default=sorted(INDEX_SPECS), choices=sorted(INDEX_SPECS))
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    args = parser.parse_args(argv)
+
+    for name in args.names:
+        if args.command == "build":
+            filename = publish_index(name, args.index_dir)
+        else:
+            filename = _read_pointer(_pointer_path(args.index_dir, name))
+            if filename is None:
+                print(f"{name}: 未发布")
+                continue
+        index = SharedIndex(name, args.index_dir, auto_publish=False)
+        index._attach(filename)
+        size = os.path.getsize(os.path.join(args.index_dir, filename))
+        print(f"{name}: {filename}  {index._state[1]} 条  {size / 1024:.1f}KB")
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import threading
+from typing import Callable, Hashable
+from src.utils.metrics import metrics
+from src.utils.lazy import LazyImport
+
+# asyncio 只有异步路径才用到，延迟导入，避免拖慢同步入口的冷启动
+asyncio = LazyImport("asyncio")
+
+
+class _Call:
+    """
+    一次进行中的调用：领头线程执行，其余线程等待同一个结果
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    进行中请求合并（singleflight）：同一 key 的调用在执行期间再次到达时不重复执行，
+    而是等待第一次调用的结果（包括异常）。调用结束后 key 立即释放，之后的调用重新执行。
+
+    指标（name 为实例名）：
+    - singleflight.<name>.calls      总调用次数
+    - singleflight.<name>.executed   实际执行次数
+    - singleflight.<name>.shared     复用了他人结果的次数
+    - singleflight.<name>.cancelled  等待超时放弃的次数
+    - singleflight.<name>.coalescing_ratio  shared / calls
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        metrics.register_gauge(f"singleflight.{name}.coalescing_ratio", self.coalescing_ratio)
+        metrics.register_gauge(f"singleflight.{name}.in_flight", lambda: len(self._calls))
+
+    def do(self, key: Hashable, func: Callable, timeout: float = None):
+        """
+        执行 func() 或等待同 key 进行中调用的结果
+        :param key: 请求的唯一标识（可哈希）
+        :param func: 无参可调用对象
+        :param timeout: 等待他人结果的最长秒数；超时后本次等待被取消并抛出 TimeoutError（领头调用不受影响）
+        :return: func() 的返回值；func 抛出的异常原样传给所有等待者
+        """
+        metrics.incr(f"singleflight.{self.name}.calls")
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    call.waiters -= 1
+                metrics.incr(f"singleflight.{self.name}.cancelled")
+                raise TimeoutError(f"等待进行中的 {self.name} 调用超时（{timeout}s）")
+            metrics.incr(f"singleflight.{self.name}.shared")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        metrics.incr(f"singleflight.{self.name}.executed")
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除 key 再唤醒等待者：结果发布后到达的调用会重新执行（通常已能命中缓存）
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def coalescing_ratio(self) -> float:
+        calls = metrics.get(f"singleflight.{self.name}.calls")
+        return round(metrics.get(f"singleflight.{self.name}.shared") / calls, 4) if calls else 0.0
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight 的协程版本：同一事件循环内同 key 的并发协程共享一次执行（包括异常），指标命名同 SingleFlight
+    等待者被取消不影响领头协程；领头协程被取消时，等待者收到 CancelledError
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        metrics.register_gauge(f"singleflight.{name}.coalescing_ratio", self.coalescing_ratio)
+        metrics.register_gauge(f"singleflight.{name}.in_flight", lambda: len(self._calls))
+
+    async def do(self, key: Hashable, func: Callable, timeout: float = None):
+        """
+        执行 await func() 或等待同 key 进行中调用的结果
+        :param func: 无参、返回协程的可调用对象
+        :param timeout: 等待他人结果的最长秒数；超时后抛出 TimeoutError（领头调用不受影响）
+        """
+        metrics.incr(f"singleflight.{self.name}.calls")
+        future = self._calls.get(key)
+        if future is not None:
+            try:
+                # shield：单个等待者超时或被取消时不取消共享的结果
+                result = await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                metrics.incr(f"singleflight.{self.name}.cancelled")
+                raise TimeoutError(f"等待进行中的 {self.name} 调用超时（{timeout}s）")
+            metrics.incr(f"singleflight.{self.name}.shared")
+            return result
+
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        metrics.incr(f"singleflight.{self.name}.executed")
+        try:
+            result = await func()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 标记异常已读取，没有等待者时避免 "Future exception was never retrieved" 警告
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def coalescing_ratio(self) -> float:
+        calls = metrics.get(f"singleflight.{self.name}.calls")
+        return round(metrics.get(f"singleflight.{self.name}.shared") / calls, 4) if calls else 0.0
@@ -0,0 +1,124 @@
+import os
+import sys
+import json
+import statistics
+import subprocess
+import unicodedata
+
+# startup.py 路径：src/utils/startup.py → 向上两级到项目根目录
+CURRENT_FILE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(CURRENT_FILE_DIR, "../.."))
+
+# 需要测量导入耗时的模块（按依赖顺序排列）
+DEFAULT_MODULES = [
+    "src.utils.log",
+    "src.utils.config",
+    "src.qwen.worker",
+    "src.qwen.receiver",
+    "src.main",
+]
+
+# 在全新解释器中执行的测量脚本：每个步骤的耗时以 JSON 输出到 stdout
+_PROBE_SCRIPT = r"""
+import sys, time, json, importlib, io, contextlib
+sys.path.insert(0, {root!r})
+result = {{}}
+start = time.perf_counter()
+importlib.import_module({module!r})
+result["import_ms"] = (time.perf_counter() - start) * 1000
+if {with_init!r}:
+    from src.qwen import worker
+    from src.qwen.receiver import Receiver
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        Receiver()
+    result["receiver_init_ms"] = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    worker.Generation.call  # 触发 dashscope 的延迟导入（首次调用大模型时的额外开销）
+    result["first_llm_import_ms"] = (time.perf_counter() - start) * 1000
+print(json.dumps(result))
+"""
+
+
+def _probe(module: str, with_init: bool = False) -> dict:
+    """
+    在独立子进程中测量一次模块导入（及可选的初始化）耗时，保证每次都是冷启动
+    """
+    script = _PROBE_SCRIPT.format(root=PROJECT_ROOT, module=module, with_init=with_init)
+    completed = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"测量 {module} 失败：{completed.stderr.strip()}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(modules=None, repeat: int = 5) -> list:
+    """
+    测量各模块冷启动导入耗时以及 Receiver 初始化耗时
+    :param modules: 需要测量的模块列表，默认 DEFAULT_MODULES
+    :param repeat: 每项重复次数，取中位数
+    :return: 结果列表 [{"name": ..., "median_ms": ..., "min_ms": ..., "max_ms": ...}, ...]
+    """
+    modules = modules or DEFAULT_MODULES
+    samples = {}
+    for module in modules:
+        for _ in range(repeat):
+            samples.setdefault(f"import {module}", []).append(_probe(module)["import_ms"])
+
+    # Receiver 初始化和首次调用大模型时的延迟导入，单独测量
+    for _ in range(repeat):
+        probe = _probe("src.qwen.receiver", with_init=True)
+        samples.setdefault("Receiver() 初始化", []).append(probe["receiver_init_ms"])
+        samples.setdefault("首次调用大模型前的 dashscope 导入", []).append(probe["first_llm_import_ms"])
+
+    report = []
+    for name, values in samples.items():
+        report.append({
+            "name": name,
+            "median_ms": round(statistics.median(values), 2),
+            "min_ms": round(min(values), 2),
+            "max_ms": round(max(values), 2),
+        })
+    return report
+
+
+def _display_width(text: str) -> int:
+    """
+    计算字符串在终端中的显示宽度（中文等宽字符占两列）
+    """
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in text)
+
+
+def _pad(text: str, width: int) -> str:
+    """
+    按显示宽度左对齐（表格的表头含中文时，与数据行按同样的列宽对齐）
+    """
+    return text + " " * max(0, width - _display_width(text))
+
+
+def _rjust(text: str, width: int) -> str:
+    """
+    按显示宽度右对齐
+    """
+    return " " * max(0, width - _display_width(text)) + text
+
+
+def print_startup_report(report: list):
+    """
+    以表格形式打印 bench_startup 的结果
+    """
+    width = max(_display_width(item["name"]) for item in report) + 2
+    print(f"{_pad('步骤', width)}{_rjust('中位数(ms)', 14)}{_rjust('最小(ms)', 12)}{_rjust('最大(ms)', 12)}")
+    print("-" * (width + 38))
+    for item in report:
+        print(f"{_pad(item['name'], width)}{item['median_ms']:>14}{item['min_ms']:>12}{item['max_ms']:>12}")
+
+
+# 测试代码
+if __name__ == "__main__":
+    print_startup_report(bench_startup(repeat=3))
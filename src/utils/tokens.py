@@ -0,0 +1,55 @@
+import re
+
+# 中日韩文字（含全角标点）：通义千问分词器中大致每个字符记 1 个 token
+_CJK_PATTERN = re.compile(r"[　-〿㐀-䶿一-鿿豈-﫿＀-￯]")
+# 非中文部分：英文单词、数字串、其余符号
+_LATIN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+# 换行及其后的缩进、连续多个空格：分词器中各记 1 个 token（单个空格并入后面的单词，不单独计数）
+_WHITESPACE_PATTERN = re.compile(r"\n\s*|[ \t]{2,}")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地估算文本的 token 数（不调用分词器，偏保守）
+    中文按每字 1 个 token，英文单词按每 4 个字母 1 个 token，数字按每 3 位 1 个 token，
+    换行（连同缩进）和连续空格各按 1 个 token
+    :param text: 待估算文本
+    :return: 估算的 token 数
+    """
+    if not text:
+        return 0
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    rest = _CJK_PATTERN.sub(" ", text)
+    other_count = 0
+    for piece in _LATIN_PATTERN.findall(rest):
+        if piece.isalpha():
+            other_count += (len(piece) + 3) // 4
+        elif piece.isdigit():
+            other_count += (len(piece) + 2) // 3
+        else:
+            other_count += 1
+    return cjk_count + other_count + len(_WHITESPACE_PATTERN.findall(text))
+
+
+def truncate_to_tokens(text: str, budget: int, keep: str = "head") -> str:
+    """
+    按估算 token 数截断文本
+    :param text: 待截断文本
+    :param budget: token 预算
+    :param keep: "head" 保留开头，"tail" 保留结尾
+    :return: 截断后的文本（未超预算时原样返回）
+    """
+    if budget <= 0 or not text:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    # 二分查找能放入预算的最长前缀/后缀
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        piece = text[:mid] if keep == "head" else text[-mid:]
+        if estimate_tokens(piece) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low] if keep == "head" else text[len(text) - low:]
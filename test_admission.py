@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import threading
+import time
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.admission import (AdmissionController, Overloaded, SHED_QUEUE_FULL, SHED_QUEUE_TIMEOUT,
+                                 SHED_SESSION_BUSY)
+from src.utils.metrics import metrics
+
+class TestAdmissionController(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_queue_full_and_timeout_shed(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.1, adaptive=False)
+        controller.acquire("a")
+        # 第二个请求排队，等待超时后被拒绝
+        with self.assertRaises(Overloaded) as ctx:
+            controller.acquire("b")
+        self.assertEqual(ctx.exception.reason, SHED_QUEUE_TIMEOUT)
+
+        # 队列已有一个等待者时，新请求立即被拒绝
+        waiter = threading.Thread(target=controller.acquire, args=("c", 2))
+        waiter.start()
+        time.sleep(0.05)
+        self.assertEqual(controller.queue_depth(), 1)
+        start = time.perf_counter()
+        with self.assertRaises(Overloaded) as ctx:
+            controller.acquire("d")
+        self.assertEqual(ctx.exception.reason, SHED_QUEUE_FULL)
+        self.assertLess(time.perf_counter() - start, 0.05, "队列满时应快速拒绝")
+
+        # 释放后排队的请求获得处理
+        controller.release("a")
+        waiter.join(1)
+        self.assertEqual(controller.active(), 1)
+        self.assertEqual(metrics.get("admission.shed"), 2)
+
+    def test_session_limit(self):
+        controller = AdmissionController(max_concurrency=4, session_limit=1, adaptive=False)
+        with controller.admit("same"):
+            with self.assertRaises(Overloaded) as ctx:
+                controller.acquire("same")
+            self.assertEqual(ctx.exception.reason, SHED_SESSION_BUSY)
+            with controller.admit("other"):
+                self.assertEqual(controller.active(), 2)
+        self.assertEqual(controller.active(), 0)
+        with controller.admit("same"):
+            pass
+
+    def test_adaptive_limit_follows_latency(self):
+        controller = AdmissionController(max_concurrency=10, min_concurrency=2, target_latency_ms=1000)
+        with patch("src.utils.admission.time.monotonic") as mock_time:
+            for second in range(20):
+                mock_time.return_value = second * 2.0
+                controller.observe_latency(5000)
+            self.assertEqual(controller.limit, 2, "延迟持续超标时下调到下限")
+            for _ in range(200):
+                controller.observe_latency(100)
+        self.assertEqual(controller.limit, 10, "延迟恢复后逐步回升到上限")
+
+class TestReceiverShedding(unittest.TestCase):
+
+    @patch("src.qwen.receiver.log")
+    @patch("src.qwen.worker.recognize_intent")
+    @patch("builtins.print")
+    def test_overloaded_turn_gets_canned_reply(self, mock_print, mock_recognize, mock_log):
+        from src.qwen.receiver import Receiver
+        from src.utils.session_store import InMemorySessionStore
+
+        controller = AdmissionController(max_concurrency=1, max_queue=0, adaptive=False)
+        receiver = Receiver(store=InMemorySessionStore(), admission=controller)
+        controller.acquire("someone-else")
+        receiver.process_turn("查订单")
+        mock_recognize.assert_not_called()
+        mock_print.assert_called_with("机器人: 当前咨询人数较多，请您稍后再试。")
+        controller.release("someone-else")
+
+    @patch("src.qwen.receiver.log")
+    @patch("src.qwen.worker.recognize_intent", return_value="PRODUCT_RECOMMENDATION")
+    @patch("src.qwen.worker.product_recommendation", return_value="小米15")
+    def test_slot_released_while_waiting_for_input(self, mock_recommend, mock_recognize, mock_log):
+        from src.qwen.receiver import Receiver
+        from src.utils.session_store import InMemorySessionStore
+        from src.utils.response import MemorySink
+
+        controller = AdmissionController(max_concurrency=1, max_queue=0, adaptive=False)
+        receiver = Receiver(store=InMemorySessionStore(), admission=controller, sink=MemorySink())
+        active_while_waiting = []
+
+        def user_types(prompt):
+            active_while_waiting.append(controller.active())
+            return "拍照好的手机"
+
+        with patch.object(Receiver, "_timeout_input", side_effect=user_types):
+            receiver.process_turn("推荐一款手机")
+        self.assertEqual(active_while_waiting, [0], "等待用户输入时不占用名额")
+        mock_recommend.assert_called_once()
+        self.assertEqual(controller.active(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import patch, AsyncMock, MagicMock
+import sys
+import os
+import asyncio
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen import worker, async_worker
+from src.qwen.model_router import usage_tracker
+from src.utils.dashscope_stub import DashScopeStubServer, use_stub
+
+INTENTS = {"ORDER_INQUIRY": "查订单", "COMPLAINT": "投诉", "DEFAULT": "其他"}
+
+class TestAsyncWorkerOverStub(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+        self.server = DashScopeStubServer(seed=3, faults={"latency": "fixed:50"}).start()
+        self.stub = use_stub(self.server.base_url)
+        self.stub.__enter__()
+        self.env = patch.dict(os.environ, {"DASHSCOPE_API_KEY": "stub-key"})
+        self.env.start()
+
+    async def asyncTearDown(self):
+        await async_worker.aclose()
+
+    def tearDown(self):
+        self.env.stop()
+        self.stub.__exit__(None, None, None)
+        self.server.stop()
+        worker.clear_caches()
+
+    async def test_same_results_as_sync(self):
+        """
+        协程版本与同步版本返回相同的结果
+        """
+        self.assertEqual(await async_worker.recognize_intent_async("我的订单到哪了", INTENTS), "ORDER_INQUIRY")
+        self.assertEqual(await async_worker.pharse_phone_number_async("我的号码是13812345678"), "13812345678")
+        self.assertEqual(await async_worker.get_order_info_async("13888888888"), worker.get_order_info("13888888888"))
+        self.assertEqual(await async_worker.get_membership_info_async("13888888888"),
+                         worker.get_membership_info("13888888888"))
+        self.assertIsNone(await async_worker.get_order_info_async("123"))
+        self.assertEqual(await async_worker.recognize_intent_with_slots_async("查订单 13888888888", INTENTS),
+                         worker.recognize_intent_with_slots("查订单 13888888888", INTENTS))
+        self.assertEqual(await async_worker.query_details_async("快递太慢了"), worker.query_details("快递太慢了"))
+
+    async def test_concurrent_turns_share_one_loop(self):
+        """
+        大量并发调用在同一个事件循环中重叠执行，相同输入只调用一次大模型
+        """
+        texts = [f"我要投诉第{i}单" for i in range(40)]
+        start = asyncio.get_running_loop().time()
+        results = await asyncio.gather(*(async_worker.recognize_intent_async(text, INTENTS) for text in texts))
+        elapsed = asyncio.get_running_loop().time() - start
+        self.assertEqual(set(results), {"COMPLAINT"})
+        self.assertLess(elapsed, 40 * 0.05 / 2, "并发调用应重叠执行，而不是逐个等待")
+
+        before = self.server.stats.get("ok", 0)
+        duplicates = await asyncio.gather(*(async_worker.product_recommendation_async("想要拍照好的手机")
+                                            for _ in range(10)))
+        self.assertEqual(len(set(duplicates)), 1)
+        self.assertEqual(self.server.stats.get("ok", 0) - before, 1)
+
+class TestAsyncWorkerErrors(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+        usage_tracker.reset()
+
+    def tearDown(self):
+        worker.clear_caches()
+        usage_tracker.reset()
+
+    @patch("src.qwen.async_worker.log")
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.async_worker.os.getenv", return_value="sk-fake-key")
+    async def test_escalation_and_errors(self, mock_getenv, mock_worker_log, mock_log):
+        bad, good = MagicMock(status_code=200), MagicMock(status_code=200)
+        bad.output.choices[0].message.content = "没有找到"
+        good.output.choices[0].message.content = "13812345678"
+        with patch.object(async_worker.AioGeneration, "call", AsyncMock(side_effect=[bad, good])) as mock_call:
+            self.assertEqual(await async_worker.pharse_phone_number_async("号码13812345678"), "13812345678")
+        self.assertEqual([call.kwargs["model"] for call in mock_call.call_args_list], ["qwen-turbo", "qwen-plus"])
+        self.assertEqual(usage_tracker.snapshot()["pharse_phone_number"]["qwen-turbo"]["escalations"], 1)
+
+        # 与同步版本一致：意图识别的第三方异常直接抛出，产品推荐的异常记录日志后返回None
+        with patch.object(async_worker.AioGeneration, "call", AsyncMock(side_effect=ConnectionError("down"))):
+            with self.assertRaises(ConnectionError):
+                await async_worker.recognize_intent_async("查订单", INTENTS)
+            self.assertIsNone(await async_worker.product_recommendation_async("想要耳机"))
+
+        mock_getenv.return_value = None
+        self.assertIsNone(await async_worker.query_details_async("太慢了"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen import worker
+from src.utils import bench
+from src.utils.metrics import metrics
+
+class TestBench(unittest.TestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+
+    def tearDown(self):
+        worker.clear_caches()
+
+    def test_synthetic_dataset_is_used(self):
+        """
+        合成数据为合法 JSON，且 worker 在 use_dataset 内读取的是合成数据
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            info = bench.write_dataset(directory, 50)
+            with open(os.path.join(directory, "products.json"), "r", encoding="utf-8") as f:
+                self.assertEqual(len(json.load(f)), 50)
+            with bench.use_dataset(directory):
+                order = worker.get_order_info(info["phones"][-1])
+                member = worker.get_membership_info(info["phones"][1])
+            self.assertEqual(order["user_name"], "用户49")
+            self.assertEqual(member["username"], "用户25")
+
+    def test_run_benchmarks_with_stubbed_llm(self):
+        metrics.reset()
+        report = bench.run_benchmarks(sizes=[20], min_time=0, max_repeat=3)
+        self.assertEqual(metrics.get("prefetch.hits"), 0, "turn.* 用例不从预取结果取数据")
+        self.assertGreater(metrics.get("response.flushes"), 0)
+        self.assertNotIn("call", vars(worker.Generation), "结束后恢复 Generation.call")
+        metrics.reset()
+        results = report["results"]
+        self.assertIn("turn.handle_intent.MEMBERSHIP@20", results)
+        self.assertIn("prompt.product_recommendation@20", results)
+        for result in results.values():
+            self.assertGreaterEqual(result["runs"], bench.MIN_REPEAT)
+            self.assertGreaterEqual(result["median_ms"], 0)
+
+    def test_compare_to_baseline(self):
+        baseline = {"results": {"a@1": {"median_ms": 10.0}, "b@1": {"median_ms": 0.01}, "c@1": {"median_ms": 5.0}}}
+        current = {"results": {"a@1": {"median_ms": 14.0}, "b@1": {"median_ms": 0.03}, "c@1": {"median_ms": 5.5},
+                               "d@1": {"median_ms": 99.0}}}
+        regressions = bench.compare_to_baseline(current, baseline, threshold=0.25)
+        # b 超过阈值但低于噪声下限；c 在阈值内；d 没有基线
+        self.assertEqual([item["case"] for item in regressions], ["a@1"])
+        self.assertEqual(regressions[0]["ratio"], 1.4)
+
+    def test_main_fails_on_regression(self):
+        with tempfile.TemporaryDirectory() as directory:
+            baseline_path = os.path.join(directory, "baseline.json")
+            self.assertEqual(bench.main(["--sizes", "10", "--min-time", "0", "--baseline", baseline_path]), 0)
+            with open(baseline_path, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+            for result in baseline["results"].values():
+                result["median_ms"] = 0.0
+            with open(baseline_path, "w", encoding="utf-8") as f:
+                json.dump(baseline, f)
+            self.assertEqual(bench.main(["--sizes", "10", "--min-time", "0", "--baseline", baseline_path,
+                                         "--threshold", "0"]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
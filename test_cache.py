@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.cache import LRUCache
+from src.utils.metrics import Metrics
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        """
+        超过容量时淘汰最久未使用的条目
+        """
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")          # a 变为最近使用
+        cache.set("c", 3)       # 淘汰 b
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.evictions, 1)
+
+    @patch("src.utils.cache.time.monotonic")
+    def test_ttl_expiry(self, mock_time):
+        """
+        条目超过 TTL 后视为未命中
+        """
+        mock_time.return_value = 100.0
+        cache = LRUCache(maxsize=10, ttl=5)
+        cache.set("k", "v")
+        mock_time.return_value = 104.0
+        self.assertEqual(cache.get("k"), "v")
+        mock_time.return_value = 106.0
+        self.assertIsNone(cache.get("k"))
+        self.assertEqual(cache.hit_rate(), 0.5)
+
+class TestMetrics(unittest.TestCase):
+
+    def test_snapshot(self):
+        """
+        计数器、观测值和动态指标都出现在快照中
+        """
+        m = Metrics()
+        m.incr("calls")
+        m.incr("calls", 2)
+        m.observe("latency_ms", 10)
+        m.observe("latency_ms", 30)
+        m.register_gauge("queue_depth", lambda: 7)
+
+        snapshot = m.snapshot()
+        self.assertEqual(snapshot["calls"], 3)
+        self.assertEqual(snapshot["latency_ms.count"], 2)
+        self.assertEqual(snapshot["latency_ms.avg"], 20)
+        self.assertEqual(snapshot["latency_ms.max"], 30)
+        self.assertEqual(snapshot["queue_depth"], 7)
+
+if __name__ == "__main__":
+    unittest.main()
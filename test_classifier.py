@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen.classifier import classify_batch, LocalIntentClassifier
+
+INTENTS = {
+    "GREET": '用户发起问候（如"你好"、"嗨"）',
+    "COMPLAINT": '用户提出投诉（如"我要投诉"、"服务不好"）',
+    "MEMBERSHIP": '用户询问会员相关问题（如"我的会员到期了吗"）',
+    "DEFAULT": "当用户的输入无法匹配上面的任何一个意图时，请选择这一项",
+}
+
+class TestClassifyBatch(unittest.TestCase):
+
+    def test_local_path_without_llm(self):
+        """
+        高置信文本直接由本地分类器给出结果，且输出顺序与输入一致
+        """
+        texts = ["你好", "我要投诉你们", "我的会员到期了吗"]
+        results = list(classify_batch(texts, intent_dict=INTENTS, chunk_size=2, llm_fallback=False))
+
+        self.assertEqual([r["text"] for r in results], texts)
+        self.assertEqual([r["intent"] for r in results], ["GREET", "COMPLAINT", "MEMBERSHIP"])
+        self.assertTrue(all(r["source"] == "local" for r in results))
+
+    @patch("src.qwen.worker.recognize_intent")
+    def test_llm_only_for_low_confidence_rows(self, mock_recognize):
+        """
+        只有低置信行调用大模型；同一块内相同文本只调用一次；结果回填后本地即可命中
+        """
+        mock_recognize.return_value = "COMPLAINT"
+        classifier = LocalIntentClassifier(INTENTS)
+        texts = ["你好", "快递三天没动静", "快递三天没动静"]
+
+        results = list(classify_batch(texts, intent_dict=INTENTS, classifier=classifier, max_concurrency=2))
+        self.assertEqual(mock_recognize.call_count, 1)
+        self.assertEqual(results[0]["source"], "local")
+        self.assertEqual(results[1]["source"], "llm")
+        self.assertEqual(results[2]["intent"], "COMPLAINT")
+
+        # 回填的样例让下一次相同输入直接本地命中
+        again = list(classify_batch(["快递三天没动静"], intent_dict=INTENTS, classifier=classifier))
+        self.assertEqual(again[0]["source"], "local")
+        self.assertEqual(mock_recognize.call_count, 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+from unittest.mock import patch
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen import complaint_analytics
+from src.qwen.complaint_analytics import ComplaintAnalytics, classify_complaint
+from src.qwen.receiver import Receiver
+from src.utils.session_store import InMemorySessionStore
+from src.utils.admission import AdmissionController
+from src.utils.response import MemorySink
+
+COMPLAINTS = [
+    {"timestamp": "2025-11-20 10:05:00", "original_complaint": "快递三天了还没到", "summary": "快递配送延迟"},
+    {"timestamp": "2025-11-20 10:40:00", "original_complaint": "快递太慢了", "summary": "快递配送延迟"},
+    {"timestamp": "2025-11-21 09:00:00", "original_complaint": "耳机收到就坏了", "summary": "商品质量问题，耳机损坏"},
+    {"timestamp": "2025-11-19 18:00:00", "original_complaint": "退款一直没到账", "summary": "退款处理缓慢"},
+]
+
+class TestComplaintAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.snapshot = os.path.join(self.temp_dir.name, "complaint_stats.json")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_classify_complaint(self):
+        self.assertEqual(classify_complaint("快递配送延迟"), "物流配送")
+        self.assertEqual(classify_complaint("申请退款"), "退款售后")
+        self.assertEqual(classify_complaint("无法描述的问题"), "其他")
+
+    def test_incremental_counters(self):
+        """
+        每条投诉更新类别计数、时间窗口计数和热词；乱序到达的历史记录窗口仍按时间排列
+        """
+        analytics = ComplaintAnalytics(self.snapshot)
+        for complaint in COMPLAINTS:
+            analytics.record(complaint)
+
+        summary = analytics.summary(top=3)
+        self.assertEqual(summary["total"], 4)
+        self.assertEqual(summary["by_category"], {"物流配送": 2, "商品质量": 1, "退款售后": 1})
+        self.assertEqual(summary["last_timestamp"], "2025-11-21 09:00:00")
+        self.assertIn(("快递", 2), summary["top_terms"])
+
+        days = analytics.window_counts("day", last=10)
+        self.assertEqual([day["window"] for day in days], ["2025-11-19", "2025-11-20", "2025-11-21"])
+        self.assertEqual(days[1]["total"], 2)
+        self.assertEqual(analytics.window_counts("hour", last=1)[0]["by_category"], {"商品质量": 1})
+
+    def test_snapshot_roundtrip(self):
+        """
+        快照为紧凑 JSON，重新加载后继续累加
+        """
+        analytics = ComplaintAnalytics(self.snapshot)
+        for complaint in COMPLAINTS[:2]:
+            analytics.record(complaint)
+        with open(self.snapshot, "r", encoding="utf-8") as f:
+            self.assertNotIn("\n", f.read(), "快照不带缩进")
+
+        restored = ComplaintAnalytics(self.snapshot)
+        self.assertTrue(restored.load())
+        restored.record(COMPLAINTS[2])
+        self.assertEqual(restored.summary()["total"], 3)
+        self.assertEqual(restored.window_counts("day")[-1]["window"], "2025-11-21")
+
+    def test_processes_merge_into_one_snapshot(self):
+        """
+        多个实例（进程）共用快照：各自写入时合并，不覆盖对方的计数
+        """
+        first = ComplaintAnalytics(self.snapshot)
+        second = ComplaintAnalytics(self.snapshot)
+        first.record(COMPLAINTS[0])
+        second.record(COMPLAINTS[2])
+        first.record(COMPLAINTS[1])
+        self.assertEqual(first.summary()["total"], 3, "写快照时合并了其他实例的计数")
+
+        restored = ComplaintAnalytics(self.snapshot)
+        self.assertTrue(restored.load())
+        summary = restored.summary()
+        self.assertEqual(summary["total"], 3)
+        self.assertEqual(summary["by_category"], {"物流配送": 2, "商品质量": 1})
+
+        # 不自动保存时，save 合并期间其他实例写入的投诉
+        manual = ComplaintAnalytics(self.snapshot, autosave=False)
+        manual.load()
+        manual.record(COMPLAINTS[3])
+        second.record(COMPLAINTS[0])
+        manual.save()
+        self.assertEqual(manual.summary()["total"], 5)
+
+    def test_rebuild_from_complaint_file(self):
+        complaint_file = os.path.join(self.temp_dir.name, "complain_summary.json")
+        with open(complaint_file, "w", encoding="utf-8") as f:
+            json.dump(COMPLAINTS, f, ensure_ascii=False)
+        analytics = ComplaintAnalytics(self.snapshot)
+        self.assertFalse(analytics.load())
+        analytics.rebuild(complaint_file)
+        self.assertEqual(analytics.summary()["total"], 4)
+        self.assertTrue(os.path.exists(self.snapshot))
+
+    @patch("src.qwen.receiver.log")
+    @patch("src.qwen.complaint_analytics.log")
+    @patch("src.qwen.receiver.worker.query_details", return_value="快递配送延迟")
+    def test_first_complaint_counted_once(self, mock_details, mock_log, mock_receiver_log):
+        """
+        全新部署（没有快照）时，第一条投诉只计一次：先重建统计，再追加原始记录
+        """
+        complaint_file = os.path.join(self.temp_dir.name, "complain_summary.json")
+        with patch.object(complaint_analytics, "COMPLAINT_FILE", complaint_file), \
+                patch.object(complaint_analytics, "SNAPSHOT_FILE", self.snapshot), \
+                patch.object(complaint_analytics, "_analytics", None), \
+                patch.object(Receiver, "_timeout_input", return_value="快递三天了还没到"):
+            receiver = Receiver(store=InMemorySessionStore(), admission=AdmissionController(), sink=MemorySink())
+            receiver._query_details()
+            analytics = complaint_analytics.get_complaint_analytics()
+        with open(complaint_file, "r", encoding="utf-8") as f:
+            self.assertEqual(len(json.load(f)), 1)
+        self.assertEqual(analytics.summary()["total"], 1)
+        restored = ComplaintAnalytics(self.snapshot)
+        self.assertTrue(restored.load())
+        self.assertEqual(restored.summary()["total"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import time
+import tempfile
+import urllib.request
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen import worker
+from src.utils.dashscope_stub import DashScopeStubServer, use_stub, load_fixtures, parse_latency, STATS_PATH
+
+MESSAGES = [{"role": "user", "content": "你好你好你好"}]
+
+class TestDashScopeStub(unittest.TestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+        self.server = DashScopeStubServer(seed=7).start()
+        self.stub = use_stub(self.server.base_url)
+        self.stub.__enter__()
+        self.env = patch.dict(os.environ, {"DASHSCOPE_API_KEY": "stub-key"})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.stub.__exit__(None, None, None)
+        self.server.stop()
+        worker.clear_caches()
+
+    def _call(self, **kwargs):
+        return worker.Generation.call(api_key="stub-key", model="qwen-plus", messages=MESSAGES,
+                                      result_format="message", **kwargs)
+
+    def test_worker_functions_over_http(self):
+        """
+        worker 通过真实的 dashscope SDK 与桩服务通信，按规则得到确定的结果
+        """
+        intent = worker.recognize_intent("我的订单到哪了", {"ORDER_INQUIRY": "查订单", "DEFAULT": "其他"})
+        self.assertEqual(intent, "ORDER_INQUIRY")
+        self.assertEqual(worker.pharse_phone_number("我的号码是13812345678"), "13812345678")
+        response = self._call()
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.usage.total_tokens, 0)
+
+    def test_streaming(self):
+        chunks = [r.output.choices[0].message.content
+                  for r in self._call(stream=True, incremental_output=True)]
+        self.assertEqual("".join(chunks), "好的")
+        self.server.configure(chunk_size=1)
+        responses = list(self._call(stream=True))
+        self.assertEqual([r.output.choices[0].message.content for r in responses], ["好", "好的"])
+        self.assertEqual(responses[-1].output.choices[0].finish_reason, "stop")
+
+    def test_fault_injection(self):
+        self.server.configure(rate_limit=1.0)
+        response = self._call()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.code, "Throttling.RateQuota")
+
+        self.server.configure(rate_limit=0.0, server_error=1.0)
+        self.assertEqual(self._call().status_code, 500)
+
+        self.server.configure(server_error=0.0, malformed=1.0)
+        with self.assertRaises(Exception):
+            for _ in range(10):  # 非法 JSON 或缺少 choices，recognize_intent 都不能静默成功
+                worker.recognize_intent("你好", {"GREET": "问候"})
+
+        self.server.configure(malformed=0.0, latency="fixed:150")
+        start = time.perf_counter()
+        self._call()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.15)
+
+        with urllib.request.urlopen(self.server.base_url.replace("/api/v1", STATS_PATH)) as response:
+            stats = json.loads(response.read())
+        self.assertEqual(stats["rate_limited"], 1)
+        self.assertEqual(stats["server_error"], 1)
+        self.assertGreaterEqual(stats["malformed"], 1)
+
+    def test_token_bucket_rate_limit(self):
+        self.server.configure(max_qps=2)
+        codes = [self._call().status_code for _ in range(4)]
+        self.assertEqual(codes.count(429), 2)
+
+    def test_fixtures_take_priority(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+            f.write(json.dumps({"model": "qwen-plus", "messages": MESSAGES, "reply": "录制的回答"}, ensure_ascii=False))
+        try:
+            self.server.fixtures = load_fixtures(f.name)
+        finally:
+            os.remove(f.name)
+        self.assertEqual(self._call().output.choices[0].message.content, "录制的回答")
+
+    def test_parse_latency(self):
+        import random
+        rng = random.Random(0)
+        self.assertEqual(parse_latency("fixed:100")(rng), 0.1)
+        self.assertTrue(0.05 <= parse_latency("uniform:50,200")(rng) <= 0.2)
+        with self.assertRaises(ValueError):
+            parse_latency("zipf:1")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import io
+import tempfile
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen import worker
+from src.utils.startup import _display_width
+from src.qwen.intent_eval import load_dataset, evaluate, summarize, print_report, DEFAULT_DATASET
+
+class TestIntentEval(unittest.TestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+
+    def tearDown(self):
+        worker.clear_caches()
+
+    def test_summarize(self):
+        samples = [{"text": "a", "intent": "GREET"}, {"text": "b", "intent": "GREET"},
+                   {"text": "c", "intent": "COMPLAINT", "phone_number": "13800138000"}]
+        report = summarize("x", samples, ["GREET", None, "COMPLAINT"], [1.0, 2.0, 30.0],
+                           {"qwen-plus": {"calls": 3, "input_tokens": 1000, "output_tokens": 500}},
+                           slots=[None, None, "13800138000"])
+        self.assertAlmostEqual(report["accuracy"], 0.6667)
+        self.assertEqual(report["per_intent"]["GREET"]["accuracy"], 0.5)
+        self.assertEqual(report["confusion"]["GREET"]["NONE"], 1)
+        self.assertEqual(report["latency_ms"]["p50"], 2.0)
+        self.assertEqual(report["tokens"], 1500)
+        self.assertEqual(report["estimated_cost"], 0.0018)
+        self.assertEqual(report["slot_accuracy"], 1.0)
+
+        # 表头与数据行在终端中的显示宽度一致
+        stream = io.StringIO()
+        print_report([report], stream)
+        lines = stream.getvalue().splitlines()
+        header, row = lines[:2]
+        self.assertEqual(_display_width(header), _display_width(row))
+        matrix = lines[lines.index(next(line for line in lines if line.startswith("真实"))):]
+        self.assertEqual({_display_width(line) for line in matrix}, {_display_width(matrix[1])}, "混淆矩阵对齐")
+
+    def test_reproducible_against_stub_and_recording(self):
+        """
+        桩服务后端结果确定；录制后用 recorded 模式回放得到相同结果
+        """
+        samples = load_dataset(DEFAULT_DATASET)[:12]
+        with tempfile.TemporaryDirectory() as directory:
+            recording = os.path.join(directory, "recorded.jsonl")
+            first = evaluate(samples, ["llm", "local", "combined"], backend="stub", record=recording)
+            second = evaluate(samples, ["llm", "local", "combined"], backend="stub")
+            replay = evaluate(samples, ["llm", "combined"], backend="recorded", fixtures=recording)
+
+        for a, b in zip(first, second):
+            self.assertEqual(a["confusion"], b["confusion"])
+            self.assertEqual(a["tokens"], b["tokens"])
+        self.assertEqual(first[1]["llm_calls"], 0, "本地路径不调用大模型")
+        self.assertEqual(first[0]["llm_calls"], len(samples))
+        self.assertIsNotNone(first[2]["slot_accuracy"])
+        self.assertEqual([r["confusion"] for r in replay], [first[0]["confusion"], first[2]["confusion"]])
+
+    @patch("src.qwen.worker.os.getenv", return_value="fake-key")
+    @patch("src.qwen.worker.Generation.call")
+    def test_recognize_intent_with_slots(self, mock_call, mock_getenv):
+        response = MagicMock()
+        response.output.choices[0].message.content = '```json\n{"intent": "ORDER_INQUIRY", "phone_number": "13888888888"}\n```'
+        mock_call.return_value = response
+        result = worker.recognize_intent_with_slots("查订单 13888888888", {"ORDER_INQUIRY": "查订单", "DEFAULT": "其他"})
+        self.assertEqual(result, {"intent": "ORDER_INQUIRY", "phone_number": "13888888888"})
+
+        response.output.choices[0].message.content = '{"intent": "UNKNOWN", "phone_number": "123"}'
+        result = worker.recognize_intent_with_slots("随便", {"ORDER_INQUIRY": "查订单", "DEFAULT": "其他"})
+        self.assertEqual(result, {"intent": "DEFAULT", "phone_number": None})
+
+        response.output.choices[0].message.content = "不是JSON"
+        self.assertIsNone(worker.recognize_intent_with_slots("随便", {"DEFAULT": "其他"}))
+
+if __name__ == '__main__':
+    unittest.main()
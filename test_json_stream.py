@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import io
+import json
+import tempfile
+import contextlib
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils import json_stream
+from src.utils.json_stream import ParseStats, iter_json, iter_file, parse_path, write_jsonl, _measure
+from src.utils.shared_index import SharedIndex
+from src.qwen import worker
+
+DATA = {
+    "userMemberList": [
+        {"phone": "13800000000", "name": "张三", "points": 12345678901234, "ratio": -1.5e-3},
+        {"phone": "13900000000", "name": "李四\"引号\"\\", "tags": [], "extra": {}, "ok": True, "none": None},
+    ],
+    "meta": {"count": 2, "emoji": "😀"},
+}
+
+class TestJsonStream(unittest.TestCase):
+
+    def stream(self, data, path=(), chunk_size=7, prefix=b""):
+        text = prefix + json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        return list(iter_json(io.BytesIO(text), path, chunk_size=chunk_size))
+
+    def test_matches_json_load(self):
+        """
+        任意切块大小（多字节字符、数字、字符串被切断）下结果与 json.load 一致
+        """
+        for chunk_size in (1, 3, 7, 64, 1 << 20):
+            self.assertEqual(self.stream(DATA, chunk_size=chunk_size), list(DATA.items()))
+            self.assertEqual(self.stream(DATA, ("userMemberList",), chunk_size),
+                             list(enumerate(DATA["userMemberList"])))
+        self.assertEqual(self.stream(DATA, parse_path("userMemberList.1.tags")), [])
+        self.assertEqual(self.stream(DATA, ("missing",)), [])
+        self.assertEqual(self.stream([1, 22, 333]), [(0, 1), (1, 22), (2, 333)])
+        self.assertEqual(self.stream({"a": 1}, prefix=b"\xef\xbb\xbf"), [("a", 1)], "应忽略 UTF-8 BOM")
+        self.assertEqual(list(iter_json(io.StringIO('{"a": [1]}'))), [("a", [1])])
+
+    def test_numbers_split_across_chunks(self):
+        # 数字被读取块切开（12|.5、1|e3、1e|+5）时不能解析成截断后的整数
+        text = b'{"a": [1.25, 3e10, -0.5, 12, 1E+5, 7, true, null, 10.125e-3, {"p": 99.99}, 0]}'
+        expected = json.loads(text)["a"]
+        for chunk_size in range(1, len(text) + 1):
+            self.assertEqual([value for _, value in iter_json(io.BytesIO(text), ("a",), chunk_size=chunk_size)],
+                             expected, f"chunk_size={chunk_size}")
+
+    def test_malformed(self):
+        for text in (b'{"a": 1,', b'{"a" 1}', b'{"a": tru}', b'[1 2]', b'"str"'):
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_json(io.BytesIO(text), chunk_size=2))
+        with patch.object(json_stream, "STREAM_MAX_VALUE_BYTES", 10):
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_json(io.BytesIO(json.dumps([{"x": "y" * 100}]).encode()), chunk_size=4))
+
+    def test_bounded_memory_and_stats(self):
+        """
+        流式解析的峰值内存远小于 json.load 整体加载
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "orders.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({f"138{i:08d}": {"order_id": i, "items": ["商品"] * 5} for i in range(30000)}, f)
+            stats = ParseStats()
+            count, _, stream_peak = _measure(lambda: sum(1 for _ in iter_file(path, stats=stats)))
+
+            def load():
+                with open(path, "rb") as f:
+                    return json.load(f)
+            _, _, load_peak = _measure(load)
+            size = os.path.getsize(path)
+
+        self.assertEqual(count, 30000)
+        self.assertEqual(stats.items, 30000)
+        self.assertEqual(stats.bytes_read, size)
+        self.assertGreater(stats.throughput_mb_s, 0)
+        self.assertLess(stream_peak * 5, load_peak)
+
+    def test_convert(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "members.json")
+            with open(source, "w", encoding="utf-8") as f:
+                json.dump(DATA, f, ensure_ascii=False)
+            jsonl = os.path.join(temp_dir, "members.jsonl")
+            self.assertEqual(write_jsonl(jsonl, iter_file(source, ("userMemberList",))), 2)
+            self.assertEqual(list(iter_file(jsonl)), list(enumerate(DATA["userMemberList"])))
+
+            index_file = os.path.join(temp_dir, "products.idx")
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                self.assertEqual(json_stream.main(["convert", source, index_file, "--path", "userMemberList",
+                                                   "--format", "index"]), 0)
+                self.assertEqual(json_stream.main(["scan", source, "--path", "meta", "--compare"]), 0)
+            self.assertIn("已转换 2 条", out.getvalue())
+            self.assertIn("json.load", out.getvalue())
+            index = SharedIndex("products", temp_dir, auto_publish=False)
+            index._attach("products.idx")
+            index._checked_at = float("inf")
+            self.assertEqual(index.values(), DATA["userMemberList"])
+            index.close()
+
+    def test_worker_switches_to_index_for_large_files(self):
+        with patch.object(worker, "USE_SHARED_INDEX", False):
+            self.assertFalse(worker._use_shared_index("orders"))
+            with patch.object(worker, "LARGE_DATA_FILE_BYTES", 0):
+                self.assertTrue(worker._use_shared_index("orders"))
+
+if __name__ == '__main__':
+    unittest.main()
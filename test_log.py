@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import tempfile
+import subprocess
+from unittest.mock import patch
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.log import JsonLineWriter
+from src.utils import log_query
+
+class TestStructuredLog(unittest.TestCase):
+
+    def _write(self, writer, ts, level, session, msg):
+        writer.write({"ts": ts, "level": level, "module": "test.py", "session": session, "msg": msg})
+
+    def test_rotation_and_indexed_query(self):
+        """
+        超过大小上限时轮转并压缩；查询按分段摘要跳过无关分段，并按会话/等级过滤
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = os.path.join(tmp_dir, "app.jsonl")
+            writer = JsonLineWriter(log_file, max_bytes=600, backup_count=10, index_every=2)
+            for i in range(12):
+                session = "s-old" if i < 6 else "s-new"
+                self._write(writer, f"2025-11-22 10:00:{i:02d}.000", 1 + i % 3, session, f"消息{i}")
+            writer.close(timeout=5)  # 等待后台压缩完成
+
+            segments = log_query.list_segments(log_file)
+            self.assertGreater(len(segments), 1, "应至少产生一个历史分段")
+
+            stats = {}
+            records = list(log_query.query(session="s-new", log_file=log_file, stats=stats))
+            self.assertEqual([r["msg"] for r in records], [f"消息{i}" for i in range(6, 12)])
+            self.assertGreater(stats["segments_skipped"], 0, "只包含 s-old 的分段应被跳过")
+
+            level_one = list(log_query.query(levels=[1], since="2025-11-22 10:00:03", log_file=log_file))
+            self.assertEqual([r["msg"] for r in level_one], ["消息3", "消息6", "消息9"])
+
+    def test_rotation_check_is_throttled(self):
+        """
+        不是每次写入都 stat 日志文件；写索引点前总是检查，其他进程轮转后重新打开新文件
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = os.path.join(tmp_dir, "app.jsonl")
+            writer = JsonLineWriter(log_file, index_every=5, reopen_check=60)
+            with patch("src.utils.log.os.stat", wraps=os.stat) as mock_stat:
+                for i in range(10):
+                    self._write(writer, f"2025-11-22 10:00:{i:02d}.000", 2, "s", f"消息{i}")
+            checks = [c for c in mock_stat.call_args_list if c.args == (log_file,)]
+            self.assertEqual(len(checks), 1, "只在第二个索引点前检查一次")
+
+            os.rename(log_file, log_file + ".old")
+            for i in range(10, 15):
+                self._write(writer, f"2025-11-22 10:00:{i:02d}.000", 2, "s", f"消息{i}")
+            writer.close(timeout=5)
+            with open(log_file, "r", encoding="utf-8") as f:
+                self.assertEqual(len(f.read().splitlines()), 5)
+
+    def test_writer_closed_at_exit(self):
+        """
+        进程内共享的日志文件在退出时关闭（不产生 ResourceWarning）
+        """
+        root = os.path.abspath(os.path.dirname(__file__))
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = dict(os.environ, LOG_DIR=tmp_dir)
+            code = f"import sys; sys.path.insert(0, {root!r}); from src.utils.log import log; log('退出', 3, 'test.py')"
+            result = subprocess.run([sys.executable, "-X", "dev", "-c", code], env=env, capture_output=True,
+                                    text=True, timeout=60)
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertNotIn("ResourceWarning", result.stderr)
+            with open(os.path.join(tmp_dir, "app.jsonl"), "r", encoding="utf-8") as f:
+                self.assertIn("退出", f.read())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import threading
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen.memory import ConversationMemory
+from src.utils.tokens import estimate_tokens
+
+class TestConversationMemory(unittest.TestCase):
+
+    def test_recent_turns_kept_verbatim(self):
+        """
+        未超过保留轮数时，上下文就是最近轮次原文
+        """
+        memory = ConversationMemory(max_turns=4, token_budget=200, summarizer=lambda s, t: "摘要")
+        memory.add("user", "我要查订单")
+        memory.add("assistant", "订单状态：已发货")
+
+        context = memory.context()
+        self.assertIn("用户：我要查订单", context)
+        self.assertIn("客服：订单状态：已发货", context)
+        self.assertNotIn("历史摘要", context)
+
+    def test_overflow_turns_folded_incrementally(self):
+        """
+        溢出的轮次交给摘要函数增量合并，每次只传入新溢出的轮次
+        """
+        calls = []
+
+        def fake_summarizer(summary, turns):
+            calls.append((summary, list(turns)))
+            return (summary + "|" if summary else "") + ",".join(text for _, text in turns)
+
+        memory = ConversationMemory(max_turns=2, token_budget=200, summarizer=fake_summarizer)
+        for i in range(3):
+            memory.add("user", f"第{i}句")
+            memory.wait(timeout=5)
+        memory.add("user", "第3句")
+        memory.wait(timeout=5)
+
+        self.assertEqual(calls[0], ("", [("user", "第0句")]))
+        self.assertEqual(calls[1], ("第0句", [("user", "第1句")]))
+        context = memory.context()
+        self.assertIn("历史摘要：第0句|第1句", context)
+        self.assertIn("用户：第3句", context)
+
+    @patch("src.qwen.memory.log")
+    def test_context_stays_within_budget(self, mock_log):
+        """
+        长会话下上下文长度始终不超过 token 预算（摘要失败时也降级为本地截断）
+        """
+        def broken_summarizer(summary, turns):
+            raise RuntimeError("backend down")
+
+        memory = ConversationMemory(max_turns=3, token_budget=80, summarizer=broken_summarizer)
+        for i in range(50):
+            memory.add("user", f"这是一句比较长的用户输入，编号{i}，用来撑满上下文")
+            memory.add("assistant", f"这是客服的回复，编号{i}")
+        memory.wait(timeout=5)
+
+        context = memory.context()
+        self.assertLessEqual(estimate_tokens(context), 80 + 5)
+        self.assertIn("编号49", context)
+
+    def test_load_dict_during_fold_keeps_turns(self):
+        """
+        后台摘要进行中会话状态被整体替换（其他进程推进了会话）时，不能按旧批次长度删掉新状态中的轮次
+        """
+        started, release = threading.Event(), threading.Event()
+
+        def slow_summarizer(summary, turns):
+            started.set()
+            release.wait(5)
+            return (summary + "|" if summary else "") + ",".join(text for _, text in turns)
+
+        memory = ConversationMemory(max_turns=1, token_budget=200, summarizer=slow_summarizer)
+        memory.add("user", "a")
+        memory.add("user", "b")
+        self.assertTrue(started.wait(5))
+        memory.load_dict({"summary": "S", "pending": [["user", "x"], ["user", "y"]], "turns": [["user", "z"]]})
+        release.set()
+        memory.wait(timeout=5)
+
+        self.assertEqual(memory.summary, "S|x,y", "旧批次的摘要作废，新状态中的轮次全部折叠")
+        self.assertEqual(memory.to_dict()["pending"], [])
+
+if __name__ == "__main__":
+    unittest.main()
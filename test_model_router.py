@@ -0,0 +1,141 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import tempfile
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen import worker
+from src.qwen.model_router import ModelRouter, UsageTracker, DEFAULT_ROUTES, usage_tracker, format_usage
+from src.utils.startup import _display_width
+
+def make_response(content, input_tokens=None, output_tokens=None, status_code=200):
+    response = MagicMock()
+    response.status_code = status_code
+    response.output.choices[0].message.content = content
+    response.usage.input_tokens = input_tokens
+    response.usage.output_tokens = output_tokens
+    return response
+
+class TestModelRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.temp_dir.name, "model_routing.yaml")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_config(self, text):
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return ModelRouter(self.config_path)
+
+    def test_candidates(self):
+        router = self.write_config("""
+default_model: qwen-max
+functions:
+  recognize_intent: tongyi-intent-detect-v3
+  query_details:
+    model: qwen-turbo
+    max_input_tokens: 5
+    escalate: [qwen-plus, qwen-max]
+""")
+        self.assertEqual(router.candidates("recognize_intent"), ["tongyi-intent-detect-v3"])
+        self.assertEqual(router.candidates("unknown"), ["qwen-max"])
+        short = [{"role": "system", "content": "很长的系统提示" * 50}, {"role": "user", "content": "太慢"}]
+        self.assertEqual(router.candidates("query_details", short), ["qwen-turbo", "qwen-plus", "qwen-max"])
+        long = [{"role": "user", "content": "快递三天了还没到，客服也联系不上"}]
+        self.assertEqual(router.candidates("query_details", long), ["qwen-plus", "qwen-max"],
+                         "输入超长时跳过首选的快速模型")
+
+        # 配置了空的模型名时回退到默认模型，候选列表不为空
+        router = self.write_config("""
+default_model: qwen-max
+functions:
+  recognize_intent: ""
+  query_details:
+    model: ""
+    escalate: [null, ""]
+""")
+        self.assertEqual(router.candidates("recognize_intent"), ["qwen-max"])
+        self.assertEqual(router.candidates("query_details"), ["qwen-max"])
+
+    def test_empty_candidates_raise(self):
+        router = MagicMock()
+        router.candidates.return_value = []
+        with patch("src.qwen.worker.get_default_router", return_value=router):
+            with self.assertRaises(ValueError):
+                worker._call_llm("query_details", messages=[])
+
+    @patch("src.qwen.model_router.log")
+    def test_invalid_config_falls_back_to_defaults(self, mock_log):
+        router = self.write_config("- not a mapping\n")
+        self.assertEqual(router.candidates("pharse_phone_number"),
+                         [DEFAULT_ROUTES["functions"]["pharse_phone_number"]["model"]] +
+                         DEFAULT_ROUTES["functions"]["pharse_phone_number"]["escalate"])
+        self.assertEqual(ModelRouter(os.path.join(self.temp_dir.name, "missing.yaml")).candidates("other"),
+                         ["qwen-plus"])
+
+    def test_usage_tracker(self):
+        tracker = UsageTracker()
+        tracker.record("query_details", "qwen-turbo", 100, 20, 300.0, ok=False, escalated=True)
+        tracker.record("query_details", "qwen-plus", 100, 30, 900.0)
+        snapshot = tracker.snapshot()
+        self.assertEqual(snapshot["query_details"]["qwen-turbo"]["escalations"], 1)
+        self.assertEqual(snapshot["query_details"]["qwen-plus"]["avg_latency_ms"], 900.0)
+        self.assertEqual(snapshot["query_details"]["qwen-plus"]["estimated_cost"], 0.00014)
+        totals = tracker.totals()
+        self.assertEqual((totals["calls"], totals["failures"], totals["input_tokens"]), (2, 1, 200))
+        lines = format_usage(snapshot).splitlines()
+        self.assertEqual({_display_width(line) for line in lines}, {_display_width(lines[1])}, "表头与数据行对齐")
+
+class TestRoutedCalls(unittest.TestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+        usage_tracker.reset()
+
+    def tearDown(self):
+        worker.clear_caches()
+        usage_tracker.reset()
+
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.worker.os.getenv", return_value="sk-fake-key")
+    @patch("src.qwen.worker.Generation.call")
+    def test_phone_extraction_escalates_on_bad_output(self, mock_call, mock_getenv, mock_log):
+        mock_call.side_effect = [make_response("您的手机号是 138", 30, 8), make_response("13812345678", 30, 4)]
+        self.assertEqual(worker.pharse_phone_number("我的手机号 13812345678"), "13812345678")
+        self.assertEqual([call.kwargs["model"] for call in mock_call.call_args_list], ["qwen-turbo", "qwen-plus"])
+
+        usage = usage_tracker.snapshot()["pharse_phone_number"]
+        self.assertEqual(usage["qwen-turbo"]["escalations"], 1)
+        self.assertEqual(usage["qwen-plus"]["failures"], 0)
+        self.assertEqual(usage["qwen-plus"]["output_tokens"], 4)
+        self.assertEqual(usage["qwen-plus"]["estimated"], 0)
+
+        # 快速模型输出合格时不升级
+        mock_call.side_effect = None
+        mock_call.return_value = make_response("")
+        self.assertIsNone(worker.pharse_phone_number("没有号码"))
+        self.assertEqual(mock_call.call_args.kwargs["model"], "qwen-turbo")
+        self.assertEqual(usage_tracker.snapshot()["pharse_phone_number"]["qwen-turbo"]["estimated"], 1)
+
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.worker.os.getenv", return_value="sk-fake-key")
+    @patch("src.qwen.worker.Generation.call")
+    def test_call_failures(self, mock_call, mock_getenv, mock_log):
+        # 快速模型报错时升级，最后一个模型的异常原样抛出
+        mock_call.side_effect = [ConnectionError("timeout"), make_response("用户投诉物流太慢")]
+        self.assertEqual(worker.query_details("快递太慢"), "用户投诉物流太慢")
+        mock_call.side_effect = [make_response("", status_code=500), ConnectionError("timeout")]
+        with self.assertRaises(ConnectionError):
+            worker.query_details("客服态度差")
+        usage = usage_tracker.snapshot()["query_details"]
+        self.assertEqual(usage["qwen-turbo"]["failures"], 2)
+        self.assertEqual(usage["qwen-plus"]["failures"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
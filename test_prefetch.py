@@ -0,0 +1,107 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import threading
+from concurrent import futures
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen.prefetch import SessionPrefetcher
+from src.qwen.receiver import Receiver
+from src.utils.session_store import InMemorySessionStore
+from src.utils.admission import AdmissionController
+from src.utils.metrics import metrics
+from src.utils.response import MemorySink
+
+PHONE = "13800138000"
+ORDER = {"user_name": "张三", "order_status": "已发货"}
+
+def wait_prefetch(prefetcher: SessionPrefetcher):
+    futures.wait(list(prefetcher._futures.values()), timeout=5)
+
+class TestPrefetch(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    @patch("src.qwen.worker.get_membership_info", return_value={"level": "金卡"})
+    @patch("src.qwen.worker.get_order_info", return_value=ORDER)
+    def test_fetch_from_memory(self, mock_order, mock_member):
+        prefetcher = SessionPrefetcher(tasks=("order", "membership"))
+        prefetcher.start(PHONE)
+        prefetcher.start(PHONE)
+        wait_prefetch(prefetcher)
+        order = prefetcher.fetch("order", PHONE)
+        self.assertEqual(order, ORDER)
+        order["order_status"] = "已修改"
+        self.assertEqual(prefetcher.fetch("order", PHONE), ORDER, "返回副本，不修改预取结果")
+        self.assertEqual(prefetcher.fetch("membership", PHONE), {"level": "金卡"})
+        self.assertEqual(mock_order.call_count, 1, "重复 start 同一手机号不重复预取")
+        self.assertEqual(mock_member.call_count, 1)
+        self.assertEqual(metrics.get("prefetch.hits"), 3)
+
+        # 其他手机号、未预取的项同步查询
+        prefetcher.fetch("order", "13900139000")
+        mock_order.assert_called_with("13900139000")
+        self.assertEqual(metrics.get("prefetch.misses"), 1)
+
+    @patch("src.qwen.worker.get_order_info", side_effect=[RuntimeError("boom"), ORDER])
+    def test_failed_prefetch_falls_back(self, mock_order):
+        prefetcher = SessionPrefetcher(tasks=("order",))
+        prefetcher.start(PHONE)
+        wait_prefetch(prefetcher)
+        with patch("src.qwen.prefetch.log"):
+            self.assertEqual(prefetcher.fetch("order", PHONE), ORDER)
+            self.assertEqual(prefetcher.fetch("order", PHONE), ORDER)
+        self.assertEqual(mock_order.call_count, 2, "同步查询的结果也保存下来")
+        self.assertEqual((metrics.get("prefetch.misses"), metrics.get("prefetch.hits")), (1, 1))
+
+    def test_cancel_and_expire(self):
+        release = threading.Event()
+        calls = []
+
+        def slow_order(phone):
+            calls.append(phone)
+            release.wait(5)
+            return ORDER
+
+        with patch("src.qwen.prefetch.PREFETCH_TASKS", {"order": ("get_order_info", True)}), \
+                patch("src.qwen.worker.get_order_info", side_effect=slow_order):
+            prefetcher = SessionPrefetcher(tasks=("order",), ttl=0)
+            prefetcher.start(PHONE)
+            prefetcher.cancel()
+            self.assertIsNone(prefetcher.phone_number)
+            release.set()
+            # 已过期（ttl=0）的预取结果不使用，改为同步查询
+            prefetcher.start(PHONE)
+            self.assertEqual(prefetcher.fetch("order", PHONE), ORDER)
+            self.assertGreaterEqual(metrics.get("prefetch.misses"), 1)
+
+    @patch("src.qwen.receiver.log")
+    @patch("src.qwen.receiver.worker.pharse_phone_number", return_value=PHONE)
+    @patch("src.qwen.worker.get_membership_info", return_value={"level": "金卡"})
+    @patch("src.qwen.worker.get_order_info", return_value=ORDER)
+    def test_receiver_answers_from_prefetch(self, mock_order, mock_member, mock_parse, mock_log):
+        sink = MemorySink()
+        receiver = Receiver(store=InMemorySessionStore(), admission=AdmissionController(), sink=sink)
+        with patch.object(Receiver, "_timeout_input", return_value=PHONE), \
+                patch.object(receiver, "_describe_membership_info"):
+            receiver._check_phone_number()
+            wait_prefetch(receiver.prefetcher)
+            receiver._get_order_info()
+            receiver._get_membership_info()
+            receiver.flush_response()
+        self.assertEqual(receiver.phone_number, PHONE)
+        self.assertIn("用户名：张三", sink.text())
+        self.assertEqual(mock_order.call_count, 1)
+        self.assertEqual(mock_member.call_count, 1)
+        self.assertEqual(metrics.get("prefetch.hits"), 2)
+        receiver.prefetcher.cancel()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen.product_filter import ProductTable, parse_preferences, format_recommendation, SORT_PRICE
+from src.qwen import worker
+
+CATALOG = [
+    {"产品类型": "智能手机", "热度": 98, "品牌": "华为", "名字": "华为Mate 70 Pro", "价格": 6999, "好评率": "96.8%"},
+    {"产品类型": "智能手机", "热度": 90, "品牌": "小米", "名字": "小米15", "价格": 3999, "好评率": "95.2%"},
+    {"产品类型": "智能手机", "热度": 85, "品牌": "华为", "名字": "华为nova 13", "价格": 2699, "好评率": "93.1%"},
+    {"产品类型": "无线耳机", "热度": 92, "品牌": "苹果", "名字": "AirPods Pro 3", "价格": 1999, "好评率": "94.5%"},
+    {"产品类型": "无线耳机", "热度": 80, "品牌": "小米", "名字": "小米Buds 5", "价格": 699, "好评率": "97.0%"},
+    {"产品类型": "移动电源", "热度": 95, "品牌": "安克", "名字": "安克充电宝", "好评率": "97.3%"},
+]
+
+def names(products):
+    return [product["名字"] for product in products]
+
+class TestProductFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.table = ProductTable(CATALOG)
+
+    def rank(self, text):
+        constraints = parse_preferences(text, self.table)
+        return constraints, names(self.table.rank(constraints))
+
+    def test_parse_and_rank(self):
+        constraints, result = self.rank("3000以内的华为手机")
+        self.assertEqual((constraints.max_price, constraints.brands, constraints.categories),
+                         (3000, ["华为"], ["智能手机"]))
+        self.assertTrue(constraints.fully_structured)
+        self.assertEqual(result, ["华为nova 13"])
+
+        constraints, result = self.rank("好评率高的耳机")
+        self.assertEqual(result, ["小米Buds 5"], "好评率高默认要求95%以上")
+
+        constraints, result = self.rank("最便宜的，不要苹果，推荐2款")
+        self.assertEqual((constraints.sort, constraints.excluded_brands, constraints.limit), (SORT_PRICE, ["苹果"], 2))
+        self.assertEqual(result[:2], ["小米Buds 5", "华为nova 13"])
+        self.assertEqual(result[-1], "安克充电宝", "没有价格的产品按价格排序时排在最后")
+
+        _, result = self.rank("1千到4千的东西")
+        self.assertEqual(result, ["AirPods Pro 3", "小米15", "华为nova 13"])
+        _, result = self.rank("4000左右的小米或Huawei手机")
+        self.assertEqual(result, ["小米15"])
+        _, result = self.rank("预算1万，充电宝")
+        self.assertEqual(result, [], "价格缺失的产品不满足价格条件")
+
+    def test_unstructured_preferences(self):
+        constraints, result = self.rank("我想买个拍照好的手机")
+        self.assertEqual(constraints.residual, "拍照好")
+        self.assertFalse(constraints.fully_structured)
+        self.assertEqual(result, ["华为Mate 70 Pro", "小米15", "华为nova 13"])
+        self.assertFalse(self.rank("推荐手机")[0].fully_structured, "只有产品类型时仍交给大模型")
+        self.assertTrue(self.rank("随便看看")[0].empty)
+
+    def test_negation(self):
+        constraints, result = self.rank("不要超过3000元的手机")
+        self.assertEqual((constraints.min_price, constraints.max_price), (None, 3000))
+        self.assertEqual(result, ["华为nova 13"])
+        self.assertEqual(self.rank("价格不要高于2000")[0].max_price, 2000)
+        self.assertEqual(self.rank("价格别低于1000的耳机")[1], ["AirPods Pro 3"])
+        for text in ("我要一台不是华为的手机", "华为以外的手机"):
+            constraints, result = self.rank(text)
+            self.assertEqual((constraints.brands, constraints.excluded_brands), ([], ["华为"]), text)
+            self.assertEqual(result, ["小米15"], text)
+        for text in ("价格不低于1000的手机", "价格不少于1000的手机", "至少1000的手机"):
+            constraints, _ = self.rank(text)
+            self.assertEqual((constraints.min_price, constraints.max_price), (1000, None), text)
+            self.assertFalse(constraints.unresolved_negation, text)
+            self.assertTrue(constraints.fully_structured, text)
+        constraints, _ = self.rank("好评率不要低于90%的耳机")
+        self.assertEqual((constraints.min_rating, constraints.max_price), (90, None))
+
+        constraints, _ = self.rank("不要太贵的手机")
+        self.assertTrue(constraints.unresolved_negation, "未能理解的否定")
+        self.assertFalse(constraints.fully_structured)
+
+    def test_format(self):
+        constraints = parse_preferences("华为手机", self.table)
+        text = format_recommendation(self.table.rank(constraints), constraints)
+        self.assertTrue(text.startswith("1. 华为Mate 70 Pro（华为）：符合品牌为华为、类型为智能手机"))
+        self.assertIn("2. 华为nova 13", text)
+        self.assertEqual(format_recommendation([], constraints), "未找到符合您偏好的产品，建议尝试其他描述")
+
+class TestWorkerStructuredRecommendation(unittest.TestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+
+    def tearDown(self):
+        worker.clear_caches()
+
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.worker.os.getenv", return_value="sk-test-key-123")
+    @patch("src.qwen.worker._load_catalog", return_value=(CATALOG, "catalog-v1"))
+    @patch("src.qwen.worker.Generation.call")
+    def test_direct_answer_and_prefilter(self, mock_api, mock_catalog, mock_getenv, mock_log):
+        result = worker.product_recommendation("3000以内的华为手机")
+        self.assertIn("华为nova 13", result)
+        mock_api.assert_not_called()
+
+        mock_response = MagicMock(status_code=200)
+        mock_response.output.choices[0].message.content = "推荐您购买：小米15"
+        mock_api.return_value = mock_response
+        self.assertEqual(worker.product_recommendation("拍照好的小米手机"), "推荐您购买：小米15")
+        system_prompt = mock_api.call_args.kwargs["messages"][0]["content"]
+        self.assertIn("小米15", system_prompt)
+        self.assertNotIn("华为", system_prompt, "只把筛选后的候选产品发给大模型")
+
+        # 仍有未结构化的偏好时，筛选结果为空也不直接回答"未找到"，而是把完整产品库交给大模型
+        worker.product_recommendation("拍照好的5000以上小米耳机")
+        system_prompt = mock_api.call_args.kwargs["messages"][0]["content"]
+        self.assertIn("华为Mate 70 Pro", system_prompt)
+        worker.product_recommendation("不要太贵的手机")
+        self.assertIn("AirPods Pro 3", mock_api.call_args.kwargs["messages"][0]["content"], "未理解的否定不做筛选")
+        self.assertEqual(mock_api.call_count, 3)
+
+        with patch.object(worker, "STRUCTURED_RECOMMENDATION", False):
+            worker.product_recommendation("3000以内的华为手机")
+        self.assertEqual(mock_api.call_count, 4)
+
+if __name__ == '__main__':
+    unittest.main()
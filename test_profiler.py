@@ -0,0 +1,101 @@
+import unittest
+import sys
+import os
+import time
+import tempfile
+from collections import Counter
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.profiler import SessionProfiler, summarize_stacks, profiler_from_env
+from src.utils.startup import _display_width
+
+def busy_turn(seconds=0.15):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += sum(range(200))
+    return total
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_sample_mode_writes_collapsed_stacks(self):
+        """
+        只采样对话轮次内的调用栈，每 2 轮输出一次折叠栈和函数汇总
+        """
+        profiler = SessionProfiler("sample", interval=0.005, every=2, output_dir=self.temp_dir.name,
+                                   session_id="s1").start()
+        try:
+            for _ in range(2):
+                with profiler.turn():
+                    busy_turn()
+            time.sleep(0.05)  # 轮次之外不采样
+        finally:
+            profiler.stop()
+
+        files = sorted(os.listdir(self.temp_dir.name))
+        self.assertEqual(len(files), 2, "stop 时没有新数据，不应重复输出")
+        collapsed = next(name for name in files if name.endswith(".collapsed"))
+        with open(os.path.join(self.temp_dir.name, collapsed), "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(any("test_profiler.py:busy_turn" in line for line in lines))
+        self.assertFalse(any("time.sleep" in line for line in lines))
+
+    def test_cprofile_mode(self):
+        profiler = SessionProfiler("cprofile", every=0, output_dir=self.temp_dir.name, session_id="s2").start()
+        with profiler.turn():
+            busy_turn(0.02)
+        profiler.stop()
+        files = sorted(os.listdir(self.temp_dir.name))
+        self.assertTrue(any(name.endswith(".prof") for name in files))
+        summary = next(name for name in files if name.endswith(".summary.txt"))
+        with open(os.path.join(self.temp_dir.name, summary), "r", encoding="utf-8") as f:
+            self.assertIn("busy_turn", f.read())
+
+    def test_paused_excludes_waiting(self):
+        """
+        轮次中 paused（等待用户输入）期间不采样
+        """
+        profiler = SessionProfiler("sample", interval=0.005, every=0, output_dir=self.temp_dir.name,
+                                   session_id="s3").start()
+        try:
+            with profiler.paused():
+                pass  # 不在轮次中时什么也不做
+            with profiler.turn():
+                busy_turn(0.05)
+                with profiler.paused():
+                    time.sleep(0.1)
+                busy_turn(0.05)
+        finally:
+            profiler.stop()
+        collapsed = next(name for name in os.listdir(self.temp_dir.name) if name.endswith(".collapsed"))
+        with open(os.path.join(self.temp_dir.name, collapsed), "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertTrue(any("test_profiler.py:busy_turn" in line for line in lines))
+        self.assertFalse(any("time.sleep" in line or "test_paused_excludes_waiting " in line for line in lines))
+
+    def test_summarize_stacks(self):
+        stacks = Counter({"main:run;worker:call;json:dumps": 3, "main:run;worker:call": 1})
+        summary = summarize_stacks(stacks)
+        self.assertIn("采样总数：4", summary)
+        header, first_row = summary.splitlines()[1:3]
+        self.assertTrue(first_row.strip().startswith("100.0"))
+        self.assertEqual(_display_width(header[:header.index("  函数")]), first_row.rindex("  "), "表头与数据行对齐")
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(profiler_from_env("s", mode=""))
+        with self.assertRaises(ValueError):
+            SessionProfiler("perf")
+
+if __name__ == '__main__':
+    unittest.main()
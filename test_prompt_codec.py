@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen import prompt_codec, worker
+from src.qwen.prompt_codec import encode_products, encode_intents, enforce_budget, fit_text, messages_tokens
+from src.utils.metrics import metrics
+from src.utils.tokens import estimate_tokens
+
+PRODUCT = {"产品类型": "智能手机", "热度": 98, "品牌": "华为", "名字": "华为Mate 70 Pro", "价格": 6999,
+           "好评率": "96.8%", "功能": ["5G", "快充", "长续航", "防水", "高刷屏", "卫星通信"],
+           "描述": "华为旗舰级智能手机" * 10}
+
+class TestPromptCodec(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_compact_encoding(self):
+        catalog = [dict(PRODUCT, 名字=f"手机{i}") for i in range(10)]
+        text, sent = encode_products(catalog)
+        lines = text.split("\n")
+        self.assertEqual(sent, 10)
+        self.assertTrue(lines[0].startswith("字段：名=名字，牌=品牌"))
+        row = json.loads(lines[1])
+        self.assertEqual(row["名"], "手机0")
+        self.assertEqual(row["能"], ["5G", "快充", "长续航", "防水"], "功能列表只保留前几条")
+        self.assertTrue(row["述"].endswith("…"))
+        self.assertLess(estimate_tokens(text), estimate_tokens(json.dumps(catalog, ensure_ascii=False, indent=0)) * 0.7)
+
+        intents = {"ORDER": "查询订单（如\"我的快递到哪了\"）"}
+        self.assertEqual(json.loads(encode_intents(intents)), intents)
+        self.assertNotIn(" ", encode_intents(intents))
+        self.assertGreater(estimate_tokens("a\n    b"), estimate_tokens("a b"), "换行与缩进也计 token")
+
+    def test_budget(self):
+        catalog = [dict(PRODUCT, 名字=f"手机{i}") for i in range(10)]
+        text, sent = encode_products(catalog, budget=200)
+        self.assertLess(sent, 10)
+        self.assertLessEqual(estimate_tokens(text), 200)
+        self.assertEqual(encode_products(catalog, budget=1)[1], 1, "至少保留一个产品")
+
+        self.assertEqual(fit_text("你好世界", 10), "你好世界")
+        self.assertEqual(fit_text("一二三四五六", 4), "一二三…")
+        self.assertEqual(fit_text("一二三四五六", 4, keep="tail"), "…四五六")
+
+        messages = [{"role": "system", "content": "系统" * 10}, {"role": "user", "content": "用户" * 50}]
+        fitted = enforce_budget("query_details", messages, budget=50)
+        self.assertLessEqual(messages_tokens(fitted), 50)
+        self.assertEqual(fitted[0], messages[0], "只截断用户消息")
+        self.assertEqual(len(messages[1]["content"]), 100, "不修改调用方的消息列表")
+        self.assertEqual(metrics.get("prompt.query_details.truncated"), 1)
+
+    @patch("src.qwen.worker.log")
+    def test_worker_prompts_respect_budget(self, mock_log):
+        with patch.dict(prompt_codec.PROMPT_BUDGETS, {"product_recommendation": 600, "recognize_intent": 120,
+                                                      "summarize_conversation": 200}):
+            catalog = [dict(PRODUCT, 名字=f"手机{i}") for i in range(30)]
+            messages = worker._recommendation_messages("拍照好的手机", "用户：" + "之前聊过很多" * 100, catalog)
+            self.assertLessEqual(messages_tokens(messages), 600)
+            self.assertIn("手机0", messages[0]["content"])
+            self.assertNotIn("手机29", messages[0]["content"])
+
+            messages = worker._intent_messages("查订单", encode_intents({"ORDER": "查询订单"}),
+                                               "很早以前的对话" * 50 + "最近一句")
+            self.assertLessEqual(messages_tokens(messages), 120)
+            self.assertTrue(messages[0]["content"].endswith("最近一句"), "上下文保留最近的部分")
+
+            messages = worker._summary_messages("", [("user", f"第{i}句话") for i in range(100)])
+            self.assertLessEqual(messages_tokens(messages), 200)
+            self.assertNotIn("第0句话", messages[1]["content"])
+            self.assertIn("第99句话", messages[1]["content"])
+        self.assertEqual(metrics.get("prompt.product_recommendation.truncated"), 2)
+        self.assertIn("prompt.recognize_intent.tokens.count", metrics.snapshot())
+
+if __name__ == '__main__':
+    unittest.main()
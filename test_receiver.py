@@ -26,6 +26,10 @@ class TestReceiver(unittest.TestCase):
           description: "查手机号"
           actions: ["check_phone_number"]
         """
+        # 意图配置经 load_config 读取并缓存，屏蔽它的日志（open 被 mock 时日志写入会失败并打印错误）
+        config_log = patch("src.utils.config.log")
+        config_log.start()
+        self.addCleanup(config_log.stop)
         
     @patch("src.qwen.receiver.log") # 屏蔽日志
     @patch("builtins.open", new_callable=mock_open, read_data="fake_yaml_content") 
@@ -63,8 +67,10 @@ class TestReceiver(unittest.TestCase):
         mock_yaml.return_value = {}
         receiver = Receiver()
         
-        # 2. 调用方法
+        # 2. 调用方法（回复先写入缓冲，flush 时才输出）
         receiver._greet()
+        mock_print.assert_not_called()
+        receiver.flush_response()
         
         # 3. 验证是否打印了问候语
         mock_print.assert_called_with("Hello! How can I assist you today?")
@@ -113,11 +119,13 @@ class TestReceiver(unittest.TestCase):
         
         # 3. 调用
         receiver._get_order_info()
+        receiver.flush_response()
         
-        # 4. 验证输出
-        # assert_any_call 只要曾经打印过这句话就算通过
-        mock_print.assert_any_call("用户名：张三")
-        mock_print.assert_any_call("订单状态：配送中")
+        # 4. 验证输出：多行回复合并为一次输出
+        mock_print.assert_called_once()
+        output = mock_print.call_args[0][0].split("\n")
+        self.assertIn("用户名：张三", output)
+        self.assertIn("订单状态：配送中", output)
 
     @patch("src.qwen.receiver.log")
     @patch("builtins.open", new_callable=mock_open)
@@ -151,5 +159,45 @@ class TestReceiver(unittest.TestCase):
         # 验证是否最后打印了再见
         mock_print.assert_any_call("机器人: 再见！")
 
+    @patch("src.qwen.receiver.log")
+    @patch("builtins.open", new_callable=mock_open)
+    @patch("src.qwen.receiver.yaml.safe_load")
+    @patch("src.qwen.receiver.Path")
+    def test_session_state_shared_through_store(self, mock_path, mock_yaml, mock_file, mock_log):
+        """
+        会话状态存放在会话存储中：用同一个会话ID新建的 Receiver 能接续之前的状态
+        """
+        from src.utils.session_store import InMemorySessionStore
+        mock_yaml.return_value = {}
+        store = InMemorySessionStore(ttl=60, max_sessions=10)
+
+        first = Receiver(store=store)
+        first.phone_number = "13800138000"
+        first.preferences = "3000以内的手机"
+
+        second = Receiver(session_id=first.session_id, store=store)
+        self.assertEqual(second.phone_number, "13800138000")
+        self.assertEqual(second.preferences, "3000以内的手机")
+        self.assertIsNone(Receiver(store=store).phone_number, "新会话不应带有其他会话的状态")
+
+    @patch("src.qwen.receiver.log")
+    @patch("builtins.open", new_callable=mock_open)
+    @patch("src.qwen.receiver.yaml.safe_load")
+    @patch("src.qwen.receiver.Path")
+    def test_action_logged_when_it_raises(self, mock_path, mock_yaml, mock_file, mock_log):
+        """
+        动作抛出异常时也记录动作日志和耗时
+        """
+        from src.utils.session_store import InMemorySessionStore
+        mock_yaml.return_value = {}
+        receiver = Receiver(store=InMemorySessionStore())
+        receiver.intent_actions_map = {"ORDER_INQUIRY": ["get_order_info"]}
+        receiver.action_handlers = {"get_order_info": MagicMock(side_effect=RuntimeError("boom"))}
+        with self.assertRaises(RuntimeError):
+            receiver.handle_intent("ORDER_INQUIRY")
+        message = mock_log.call_args.args[0]
+        self.assertIn("动作: get_order_info", message)
+        self.assertIn("duration_ms", mock_log.call_args.kwargs)
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
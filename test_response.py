@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import io
+import json
+import socket
+import struct
+import tempfile
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen.receiver import Receiver
+from src.utils.session_store import InMemorySessionStore
+from src.utils.admission import AdmissionController
+from src.utils.metrics import metrics
+from src.utils.response import (Template, ResponseBuilder, ResponseSink, ConsoleSink, MemorySink, FileSink, SocketSink,
+                                compile_templates, create_response_sink)
+
+MEMBER = {"username": "李四", "memberType": "黄金会员", "memberValidity": "2027-01-01",
+          "registerTime": "2020-05-01", "memberPoints": 120, "phone": "13800138000"}
+
+class TestResponse(unittest.TestCase):
+
+    def test_builder_flushes_once(self):
+        templates = compile_templates({"hello": "你好，{name}", "plain": "固定回复"})
+        self.assertEqual(templates["hello"].fields, ("name",))
+        with self.assertRaises(ValueError):
+            Template("未闭合的{占位符")
+
+        builder = ResponseBuilder(templates)
+        builder.render("hello", name="张三")
+        builder.render("plain")
+        builder.add("第三行")
+        stream = io.StringIO()
+        self.assertTrue(builder.flush(ConsoleSink(stream), "s1"))
+        self.assertEqual(stream.getvalue(), "你好，张三\n固定回复\n第三行\n")
+        self.assertFalse(builder.flush(ConsoleSink(stream)), "没有内容时不写")
+
+    def test_file_and_socket_sinks(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "out", "replies.jsonl")
+            sink = create_response_sink(f"file:{path}")
+            self.assertIsInstance(sink, FileSink)
+            sink.write("第一行\n第二行", "s1")
+            sink.write("再见", "s2")
+            sink.close()
+            with open(path, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+        self.assertEqual([(r["session_id"], r["text"]) for r in records], [("s1", "第一行\n第二行"), ("s2", "再见")])
+
+        left, right = socket.socketpair()
+        with left, right:
+            sink = SocketSink(conn=left)
+            sink.write("订单状态：配送中")
+            self.assertEqual(right.recv(1024).decode("utf-8"), "订单状态：配送中\n")
+        with self.assertRaises(ValueError):
+            SocketSink()
+
+        # 对端断开后丢弃失效的连接，下一次写入重新连接
+        server = socket.create_server(("127.0.0.1", 0))
+        with server:
+            sink = SocketSink(address=server.getsockname())
+            sink.write("第一轮")
+            peer, _ = server.accept()
+            peer.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            peer.close()  # 发送 RST
+            with self.assertRaises(OSError):
+                for _ in range(10):
+                    sink.write("第二轮")
+            self.assertIsNone(sink.conn)
+            sink.write("第三轮")
+            peer, _ = server.accept()
+            with peer:
+                self.assertEqual(peer.recv(1024).decode("utf-8"), "第三轮\n")
+            sink.close()
+
+    @patch("src.qwen.receiver.log")
+    @patch("src.qwen.worker.recognize_intent", return_value="MEMBERSHIP")
+    @patch("src.qwen.worker.get_membership_info", return_value=MEMBER)
+    def test_receiver_turn_is_one_write(self, mock_member, mock_recognize, mock_log):
+        sink = MemorySink()
+        receiver = Receiver(store=InMemorySessionStore(), admission=AdmissionController(), sink=sink)
+        receiver.phone_number = "13800138000"
+        receiver.process_turn("查一下我的会员")
+        receiver.prefetcher.cancel()
+
+        self.assertEqual(len(sink.outputs), 1, "一轮回复只写一次")
+        lines = sink.outputs[0].split("\n")
+        self.assertEqual(lines[0], "机器人: 您的会员信息如下：")
+        self.assertIn("📱 绑定手机号：138****8000", lines)
+        self.assertIn("✅ 会员积分：120 分（可用于商品兑换、订单抵扣等权益）", lines)
+
+        # 需要用户输入时，先输出已缓冲的提问
+        prompts = []
+        receiver.phone_number = None
+        with patch.object(Receiver, "_timeout_input", side_effect=lambda prompt: prompts.append(len(sink.outputs)) or "13900139000"), \
+                patch("src.qwen.worker.pharse_phone_number", return_value="13900139000"):
+            receiver._check_phone_number()
+        receiver.prefetcher.cancel()
+        self.assertEqual(prompts, [2])
+        self.assertEqual(sink.outputs[1], "机器人: 请提供您的手机号码。")
+
+    @patch("src.qwen.receiver.log")
+    def test_sink_error_does_not_escape_turn(self, mock_log):
+        with self.assertRaises(TypeError):
+            ResponseSink()
+
+        class BrokenSink(ResponseSink):
+            def write(self, text, session_id=None):
+                raise BrokenPipeError("连接已断开")
+
+        metrics.reset()
+        receiver = Receiver(store=InMemorySessionStore(), admission=AdmissionController(), sink=BrokenSink())
+        with patch("src.qwen.worker.recognize_intent", return_value="DEFAULT"), \
+                patch.object(receiver, "handle_intent", side_effect=lambda intent: receiver.response.add("你好")):
+            receiver.process_turn("你好")
+        self.assertEqual(metrics.get("response.errors"), 1)
+        self.assertEqual(receiver.response.lines, [])
+        metrics.reset()
+
+if __name__ == '__main__':
+    unittest.main()
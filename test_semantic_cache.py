@@ -0,0 +1,120 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.semantic_cache import SemanticCache, configure_semantic_cache, get_semantic_cache
+from src.qwen import worker
+
+class TestSemanticCache(unittest.TestCase):
+
+    def test_paraphrase_hit_and_unrelated_miss(self):
+        """
+        换种说法命中缓存，意思不同的输入不命中
+        """
+        cache = SemanticCache("test", threshold=0.75)
+        cache.add("快递太慢", "快递速度太慢")
+
+        hit = cache.lookup("你们快递慢死了")
+        self.assertIsNotNone(hit)
+        self.assertEqual(hit[0], "快递速度太慢")
+        self.assertIsNone(cache.lookup("我要退款"))
+
+    def test_scope_isolation(self):
+        """
+        不同 scope 之间互不命中
+        """
+        cache = SemanticCache("test", threshold=0.75)
+        cache.add("查一下我的订单", "ORDER_INQUIRY", scope="intents-v1")
+        self.assertIsNotNone(cache.lookup("查订单", scope="intents-v1"))
+        self.assertIsNone(cache.lookup("查订单", scope="intents-v2"))
+
+    def test_negation_misses(self):
+        """
+        否定词不同的输入字面相近也不命中
+        """
+        cache = SemanticCache("test", threshold=0.75)
+        cache.add("我要退货", "RETURN")
+        cache.add("查订单", "ORDER_INQUIRY")
+        self.assertIsNone(cache.lookup("我不要退货"))
+        self.assertIsNone(cache.lookup("不查订单"))
+        cache.add("我不要退货", "KEEP")
+        self.assertEqual(cache.lookup("我真的不要退货")[0], "KEEP")
+        self.assertEqual(cache.lookup("查一下订单")[0], "ORDER_INQUIRY")
+
+    def test_size_bounded_eviction(self):
+        """
+        条目数不超过 maxsize，最久未使用的条目被淘汰
+        """
+        cache = SemanticCache("test", threshold=0.9, maxsize=2)
+        cache.add("推荐手机", "A")
+        cache.add("查询会员", "B")
+        cache.add("我要投诉", "C")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.lookup("推荐手机"))
+        self.assertEqual(cache.lookup("我要投诉")[0], "C")
+
+    def test_opt_out_per_function(self):
+        """
+        关闭某个函数的语义缓存后 get_semantic_cache 返回None
+        """
+        self.assertIsNone(get_semantic_cache("pharse_phone_number"))
+        self.assertIsNone(get_semantic_cache("query_details"), "投诉归纳不使用语义缓存")
+        configure_semantic_cache("recognize_intent", enabled=False)
+        try:
+            self.assertIsNone(get_semantic_cache("recognize_intent"))
+        finally:
+            configure_semantic_cache("recognize_intent", enabled=True)
+        self.assertIsNotNone(get_semantic_cache("recognize_intent"))
+
+class TestWorkerSemanticCache(unittest.TestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+
+    def tearDown(self):
+        worker.clear_caches()
+
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.worker.os.getenv")
+    @patch("src.qwen.worker.Generation.call")
+    def test_query_details_not_shared_between_users(self, mock_api, mock_getenv, mock_log):
+        """
+        投诉归纳作为该用户的投诉记录保存，相似的投诉也各自调用大模型归纳
+        """
+        mock_getenv.return_value = "sk-fake-key"
+        mock_response = MagicMock()
+        mock_response.output.choices[0].message.content = "快递配送速度太慢"
+        mock_api.return_value = mock_response
+
+        self.assertEqual(worker.query_details("快递太慢"), "快递配送速度太慢")
+        self.assertEqual(worker.query_details("你们快递慢死了"), "快递配送速度太慢")
+        self.assertEqual(mock_api.call_count, 2)
+
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.worker.os.getenv", return_value="sk-fake-key")
+    @patch("src.qwen.worker.Generation.call")
+    def test_intent_cache_scoped_by_previous_intent(self, mock_api, mock_getenv, mock_log):
+        """
+        同一句话在不同的上一轮意图之后不复用意图；上一轮意图相同的不同会话（对话原文不同）共用缓存
+        """
+        mock_response = MagicMock(status_code=200)
+        mock_response.output.choices[0].message.content = "ORDER_INQUIRY"
+        mock_api.return_value = mock_response
+        intents = {"ORDER_INQUIRY": "查询订单", "DEFAULT": "其他"}
+
+        self.assertEqual(worker.recognize_intent("好的", intents, context="用户：查订单",
+                                                 previous_intent="ORDER_INQUIRY"), "ORDER_INQUIRY")
+        self.assertEqual(worker.recognize_intent("好的", intents, context="用户：帮我查下订单到哪了",
+                                                 previous_intent="ORDER_INQUIRY"), "ORDER_INQUIRY")
+        self.assertEqual(mock_api.call_count, 1, "另一个会话的上一轮意图相同，命中缓存")
+        mock_response.output.choices[0].message.content = "DEFAULT"
+        self.assertEqual(worker.recognize_intent("好的", intents, context="用户：你好",
+                                                 previous_intent="GREET"), "DEFAULT")
+        self.assertEqual(mock_api.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import tempfile
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.session_store import SessionStore, InMemorySessionStore, SQLiteSessionStore
+
+class TestInMemorySessionStore(unittest.TestCase):
+
+    @patch("src.utils.session_store.time.monotonic")
+    def test_idle_ttl_eviction(self, mock_time):
+        """
+        空闲超过 TTL 的会话被清理；写入会刷新空闲计时
+        """
+        mock_time.return_value = 0
+        store = InMemorySessionStore(ttl=10, max_sessions=100)
+        store.update("a", {"phone_number": "13800138000"})
+        store.update("b", {"preferences": "便宜的耳机"})
+
+        mock_time.return_value = 8
+        store.update("b", {"preferences": "3000以内的手机"})
+        mock_time.return_value = 12
+        self.assertEqual(store.get("a"), {}, "会话 a 已空闲超过 TTL")
+        self.assertEqual(store.get_value("b", "preferences"), "3000以内的手机")
+        self.assertEqual(len(store), 1)
+
+    def test_max_sessions_cap(self):
+        """
+        会话数超过上限时淘汰最久未更新的会话；值为None的字段被删除
+        """
+        store = InMemorySessionStore(ttl=1000, max_sessions=2)
+        store.update("a", {"x": 1})
+        store.update("b", {"x": 2})
+        store.update("a", {"x": None, "y": 3})
+        store.update("c", {"x": 4})
+        self.assertEqual(store.get("b"), {})
+        self.assertEqual(store.get("a"), {"y": 3})
+        self.assertEqual(len(store), 2)
+
+    def test_interface_is_abstract(self):
+        """
+        SessionStore 是抽象接口，未实现全部方法的子类不能实例化
+        """
+        with self.assertRaises(TypeError):
+            SessionStore()
+
+        class PartialStore(SessionStore):
+            def get(self, session_id):
+                return {}
+
+        with self.assertRaises(TypeError):
+            PartialStore()
+
+class TestSQLiteSessionStore(unittest.TestCase):
+
+    def test_shared_between_instances(self):
+        """
+        两个存储实例（模拟两个进程）打开同一个数据库文件，看到的是同一份会话
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "sessions.db")
+            process_a = SQLiteSessionStore(path, ttl=1000, max_sessions=10)
+            process_b = SQLiteSessionStore(path, ttl=1000, max_sessions=10)
+
+            process_a.update("s1", {"phone_number": "13888888888"})
+            process_b.update("s1", {"preferences": "华为手机"})
+            self.assertEqual(process_a.get("s1"), {"phone_number": "13888888888", "preferences": "华为手机"})
+
+            process_b.delete("s1")
+            self.assertEqual(process_a.get("s1"), {})
+
+    @patch("src.utils.session_store.time.time")
+    def test_ttl_and_cap(self, mock_time):
+        """
+        过期会话读取为空；超过上限时删除最久未更新的会话
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            mock_time.return_value = 1000.0
+            store = SQLiteSessionStore(os.path.join(tmp_dir, "sessions.db"), ttl=60, max_sessions=2)
+            store.update("a", {"v": 1})
+            mock_time.return_value = 1010.0
+            store.update("b", {"v": 2})
+            mock_time.return_value = 1020.0
+            store.update("c", {"v": 3})
+            self.assertEqual(store.get("a"), {}, "超过上限时最旧的会话被删除")
+            self.assertEqual(len(store), 2)
+
+            mock_time.return_value = 1075.0
+            self.assertEqual(store.get("b"), {}, "空闲超过 TTL 的会话视为过期")
+            self.assertEqual(store.get("c"), {"v": 3})
+
+if __name__ == "__main__":
+    unittest.main()
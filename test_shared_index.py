@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.shared_index import SharedIndex, write_index, publish_index, INDEX_SPECS
+from src.qwen import worker
+
+def lookup_in_child(index_dir, source, phones):
+    """
+    子进程只挂接已发布的索引，不自行构建
+    """
+    index = SharedIndex("orders", index_dir, source=source, auto_publish=False)
+    return [index.get(phone) for phone in phones], index.filename
+
+class TestSharedIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.index_dir = os.path.join(self.temp_dir.name, "index")
+        self.source = os.path.join(self.temp_dir.name, "orders.json")
+        self.write_source({f"138{i:08d}": {"order_id": i} for i in range(500)})
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_source(self, data):
+        with open(self.source, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    @patch("src.utils.shared_index.log")
+    def test_lookup_and_values(self, mock_log):
+        path = os.path.join(self.temp_dir.name, "test.idx")
+        count = write_index(path, [("b", {"v": 2}), ("a", {"v": 1}), ("中文", [1]), ("a", {"v": 3})], "v1")
+        self.assertEqual(count, 3, "重复的键只保留第一次出现的值")
+        index = SharedIndex("test", self.temp_dir.name, check_interval=60)
+        index._attach("test.idx")
+        index._checked_at = float("inf")
+        self.assertEqual(index.get("a"), {"v": 1})
+        self.assertEqual(index.get("中文"), [1])
+        self.assertIsNone(index.get("c"))
+        self.assertEqual(index.values(), [{"v": 1}, {"v": 2}, [1]])
+        self.assertEqual(index.version, "v1")
+        values, version = index.versioned_values()
+        self.assertIs(values, index.values(), "同一版本只解析一次")
+        self.assertEqual(version, "v1")
+        index.close()
+
+    @patch("src.utils.shared_index.log")
+    def test_new_version_published_atomically(self, mock_log):
+        index = SharedIndex("orders", self.index_dir, source=self.source, check_interval=0)
+        self.assertEqual(index.get("13800000007"), {"order_id": 7})
+        self.assertEqual(len(index), 500)
+        first = index.filename
+
+        old_values = index.values()
+        self.write_source({"13900000000": {"order_id": "new"}})
+        values, version = index.versioned_values()
+        self.assertEqual(values, [{"order_id": "new"}], "切换版本后重新解析")
+        self.assertIsNot(values, old_values)
+        self.assertEqual(version, index.version)
+        self.assertEqual(index.get("13900000000"), {"order_id": "new"})
+        self.assertIsNone(index.get("13800000007"))
+        self.assertNotEqual(index.filename, first)
+        with open(os.path.join(self.index_dir, "orders.current"), encoding="utf-8") as f:
+            self.assertEqual(f.read(), index.filename)
+
+        self.write_source({})
+        index.refresh(force=True)
+        versions = [name for name in os.listdir(self.index_dir) if name.endswith(".idx")]
+        self.assertEqual(len(versions), 2, "只保留最近两个版本")
+        self.assertFalse(any(name.endswith(".tmp") for name in os.listdir(self.index_dir)))
+
+    @patch("src.utils.shared_index.log")
+    def test_worker_processes_attach_published_index(self, mock_log):
+        filename = publish_index("orders", self.index_dir, source=self.source)
+        phones = ["13800000001", "13800000499", "13700000000"]
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=2, mp_context=context) as pool:
+            results = list(pool.map(lookup_in_child, [self.index_dir] * 2, [self.source] * 2, [phones] * 2))
+        for records, attached in results:
+            self.assertEqual(records, [{"order_id": 1}, {"order_id": 499}, None])
+            self.assertEqual(attached, filename)
+
+    @patch("src.utils.shared_index.log")
+    @patch("src.qwen.worker.log")
+    def test_worker_uses_shared_index(self, mock_worker_log, mock_log):
+        indexes = {name: SharedIndex(name, self.index_dir) for name in INDEX_SPECS}
+        expected_order = worker.get_order_info("13888888888")
+        expected_member = worker.get_membership_info("13888888888")
+        with patch.object(worker, "USE_SHARED_INDEX", True), \
+                patch("src.qwen.worker.get_shared_index", side_effect=indexes.__getitem__):
+            self.assertEqual(worker.get_order_info("13888888888"), expected_order)
+            self.assertEqual(worker.get_membership_info(" 13888888888 "), expected_member)
+            self.assertIsNone(worker.get_order_info("13000000000"))
+            product_list, version = worker._shared_catalog()
+        self.assertEqual(product_list, worker._load_catalog()[0])
+        self.assertEqual(version, indexes["products"].version)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import threading
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.singleflight import SingleFlight, AsyncSingleFlight
+from src.utils.metrics import metrics
+from src.qwen import worker
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        worker.clear_caches()
+
+    def tearDown(self):
+        worker.clear_caches()
+
+    def _burst(self, flight, key, func, size=5, timeout=None):
+        """
+        让 size 个线程几乎同时对同一 key 发起调用，返回 (结果列表, 异常列表)
+        """
+        barrier = threading.Barrier(size)
+
+        def run(_):
+            barrier.wait()
+            try:
+                return ("ok", flight.do(key, func, timeout=timeout))
+            except Exception as e:
+                return ("error", e)
+
+        with ThreadPoolExecutor(max_workers=size) as executor:
+            outcomes = list(executor.map(run, range(size)))
+        return [value for kind, value in outcomes if kind == "ok"], [value for kind, value in outcomes if kind == "error"]
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight("test_share")
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            release.wait(2)
+            return "ORDER_INQUIRY"
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self._burst(flight, "查订单", slow)
+        self.assertEqual(errors, [])
+        self.assertEqual(results, ["ORDER_INQUIRY"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.coalescing_ratio(), 0.8)
+        self.assertEqual(flight.in_flight(), 0, "调用结束后 key 应释放")
+
+    def test_errors_propagate_to_all_waiters(self):
+        flight = SingleFlight("test_error")
+        release = threading.Event()
+
+        def failing():
+            release.wait(2)
+            raise ConnectionError("backend down")
+
+        threading.Timer(0.2, release.set).start()
+        results, errors = self._burst(flight, "k", failing)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 5)
+        self.assertTrue(all(isinstance(e, ConnectionError) for e in errors))
+        # 失败后 key 已释放，下一次调用重新执行
+        self.assertEqual(flight.do("k", lambda: "recovered"), "recovered")
+
+    def test_waiter_timeout_cancels_only_the_waiter(self):
+        flight = SingleFlight("test_timeout")
+        release = threading.Event()
+        threading.Timer(0.5, release.set).start()
+        results, errors = self._burst(flight, "k", lambda: release.wait(2) and "done", size=3, timeout=0.1)
+        self.assertEqual(results, ["done"])
+        self.assertEqual(len(errors), 2)
+        self.assertTrue(all(isinstance(e, TimeoutError) for e in errors))
+        self.assertEqual(metrics.get("singleflight.test_timeout.cancelled"), 2)
+
+    @patch("src.qwen.worker.os.getenv", return_value="fake-key")
+    @patch("src.qwen.worker.Generation.call")
+    def test_recognize_intent_coalesces_identical_inputs(self, mock_call, mock_getenv):
+        release = threading.Event()
+
+        def slow_call(**kwargs):
+            release.wait(2)
+            response = MagicMock()
+            response.output.choices[0].message.content = "ORDER_INQUIRY"
+            return response
+
+        mock_call.side_effect = slow_call
+        intents = {"ORDER_INQUIRY": "查询订单", "DEFAULT": "其他"}
+        threading.Timer(0.2, release.set).start()
+        barrier = threading.Barrier(4)
+
+        def run(_):
+            barrier.wait()
+            return worker.recognize_intent("查订单", intents)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(run, range(4)))
+        self.assertEqual(results, ["ORDER_INQUIRY"] * 4)
+        self.assertEqual(mock_call.call_count, 1)
+        self.assertEqual(metrics.snapshot()["singleflight.recognize_intent.coalescing_ratio"], 0.75)
+
+class TestAsyncSingleFlight(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        metrics.reset()
+
+    async def test_coroutines_share_one_execution(self):
+        flight = AsyncSingleFlight("test_async")
+        executions = []
+
+        async def slow(value):
+            executions.append(value)
+            await asyncio.sleep(0.05)
+            if value == "boom":
+                raise ValueError(value)
+            return value.upper()
+
+        results = await asyncio.gather(*(flight.do("k", lambda: slow("ok")) for _ in range(5)))
+        self.assertEqual(results, ["OK"] * 5)
+        self.assertEqual(executions, ["ok"])
+        self.assertEqual(flight.coalescing_ratio(), 0.8)
+
+        errors = await asyncio.gather(*(flight.do("e", lambda: slow("boom")) for _ in range(3)),
+                                      return_exceptions=True)
+        self.assertTrue(all(isinstance(error, ValueError) for error in errors))
+
+        # 等待者超时只取消自己，领头协程照常完成
+        leader = asyncio.ensure_future(flight.do("t", lambda: slow("late")))
+        await asyncio.sleep(0)
+        with self.assertRaises(TimeoutError):
+            await flight.do("t", lambda: slow("late"), timeout=0.01)
+        self.assertEqual(await leader, "LATE")
+        self.assertEqual(flight.in_flight(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.utils.lazy import LazyImport
+from src.utils import config
+from src.utils.startup import print_startup_report, _display_width
+
+PROJECT_ROOT = os.path.abspath(os.path.dirname(__file__))
+
+class TestStartup(unittest.TestCase):
+
+    def test_worker_import_does_not_load_dashscope(self):
+        """
+        导入 worker / receiver 时不应加载 dashscope、asyncio，首次访问 Generation 时才加载 dashscope
+        """
+        script = (
+            "import sys, json\n"
+            "import src.qwen.receiver\n"
+            "from src.qwen import worker\n"
+            "before = 'dashscope' in sys.modules\n"
+            "uses_asyncio = 'asyncio' in sys.modules\n"
+            "worker.Generation.call\n"
+            "print(json.dumps([before, 'dashscope' in sys.modules, uses_asyncio]))\n"
+        )
+        completed = subprocess.run([sys.executable, "-c", script], cwd=PROJECT_ROOT,
+                                   capture_output=True, text=True, timeout=120)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        before, after, uses_asyncio = json.loads(completed.stdout.strip().splitlines()[-1])
+        self.assertFalse(before, "导入阶段不应加载 dashscope")
+        self.assertFalse(uses_asyncio, "同步入口不应加载 asyncio")
+        self.assertTrue(after)
+
+    def test_lazy_import_supports_patch(self):
+        """
+        LazyImport 代理要兼容 mock.patch 的写法，patch 结束后恢复为转发
+        """
+        lazy_json = LazyImport("json")
+        self.assertFalse(lazy_json.is_loaded)
+        with patch.object(lazy_json, "dumps", return_value="patched"):
+            self.assertEqual(lazy_json.dumps({}), "patched")
+        self.assertEqual(lazy_json.dumps({}), "{}")
+        self.assertTrue(lazy_json.is_loaded)
+
+    @patch("src.utils.config.log")
+    def test_load_config_cache_and_reload(self, mock_log):
+        """
+        load_config 在文件未变化时返回缓存，文件变化后重新加载
+        """
+        config.clear_config_cache()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "data.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"a": 1}, f)
+
+            first = config.load_config(path)
+            second = config.load_config(path)
+            self.assertIs(first, second, "文件未变化时应直接返回缓存对象")
+
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"a": 2, "b": 3}, f)
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000))
+            self.assertEqual(config.load_config(path), {"a": 2, "b": 3})
+        config.clear_config_cache()
+
+    def test_startup_report_columns_aligned(self):
+        """
+        表头（中文）与数据行按终端显示宽度对齐
+        """
+        stream = StringIO()
+        with redirect_stdout(stream):
+            print_startup_report([{"name": "src.qwen.worker", "median_ms": 12.5, "min_ms": 11.0, "max_ms": 30.25}])
+        header, divider, row = stream.getvalue().splitlines()
+        self.assertEqual(_display_width(header), _display_width(row))
+        self.assertEqual(len(divider), _display_width(row))
+
+if __name__ == "__main__":
+    unittest.main()
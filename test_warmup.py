@@ -0,0 +1,74 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+import json
+import tempfile
+
+# 添加项目根目录到 sys.path，确保能 import src
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
+
+from src.qwen import worker
+from src.qwen.warmup import warm_up, readiness
+from src.utils.config import CONFIG_DIR
+from src.utils.metrics import metrics
+from src.utils.dashscope_stub import DashScopeStubServer, use_stub
+
+class TestWarmup(unittest.TestCase):
+
+    def setUp(self):
+        worker.clear_caches()
+        readiness.reset(ready_file="")
+        self.server = DashScopeStubServer(seed=1).start()
+        self.stub = use_stub(self.server.base_url)
+        self.stub.__enter__()
+        self.env = patch.dict(os.environ, {"DASHSCOPE_API_KEY": "stub-key"})
+        self.env.start()
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+        self.env.stop()
+        self.stub.__exit__(None, None, None)
+        self.server.stop()
+        readiness.reset(ready_file="")
+        worker.clear_caches()
+
+    @patch("src.qwen.warmup.log")
+    def test_warm_up_marks_ready(self, mock_log):
+        ready_file = os.path.join(self.temp_dir.name, "ready.json")
+        complaints_path = os.path.join(CONFIG_DIR, "complain_summary.json")
+        with open(complaints_path, "rb") as f:
+            complaints_before = f.read()
+
+        self.assertFalse(readiness.is_ready())
+        self.assertEqual(metrics.snapshot()["ready"], 0)
+        report = warm_up(replay=True, preconnect=True, ready_file=ready_file,
+                         replay_inputs=["你好", "查一下我的订单", "推荐一款手机", "我要投诉"])
+
+        self.assertTrue(all(report[step]["ok"] for step in ("config", "prompts", "connect", "replay")), report)
+        self.assertTrue(report["connect"]["pooled"])
+        self.assertEqual(report["connect"]["status"], 404, "桩服务对根路径返回 404，说明连接已建立")
+        self.assertEqual((report["replay"]["completed"], report["replay"]["aborted"]), (3, 1),
+                         "投诉需要用户补充输入，回放在提问处中止")
+        with open(complaints_path, "rb") as f:
+            self.assertEqual(f.read(), complaints_before, "回放不应写入投诉记录")
+
+        self.assertTrue(readiness.is_ready())
+        self.assertEqual(metrics.snapshot()["ready"], 1)
+        with open(ready_file, encoding="utf-8") as f:
+            self.assertIn("total_ms", json.load(f))
+        readiness.reset(ready_file=ready_file)
+        self.assertFalse(os.path.exists(ready_file))
+
+    @patch("src.qwen.warmup.log")
+    def test_failed_step_does_not_block_readiness(self, mock_log):
+        with patch("src.qwen.warmup._warm_connection", side_effect=OSError("unreachable")):
+            report = warm_up(replay=False, preconnect=True, ready_file="")
+        self.assertFalse(report["connect"]["ok"])
+        self.assertEqual(report["connect"]["error"], "unreachable")
+        self.assertNotIn("replay", report)
+        self.assertTrue(readiness.wait(0))
+
+if __name__ == '__main__':
+    unittest.main()
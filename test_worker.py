@@ -8,6 +8,11 @@ import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '.')))
 
 from src.qwen import worker
+from src.qwen.receiver import Receiver
+from src.utils.session_store import InMemorySessionStore
+from src.utils.admission import AdmissionController
+from src.utils.response import MemorySink
+from src.utils.metrics import metrics
 
 class TestWorker(unittest.TestCase):
 
@@ -18,6 +23,11 @@ class TestWorker(unittest.TestCase):
         我们可以在这里做一些初始化工作。
         """
         self.fake_api_key = "sk-fake-key-123"
+        # 配置读取和推荐结果带缓存：清空缓存，避免上一个用例 mock 的内容影响当前用例
+        worker.clear_caches()
+
+    def tearDown(self):
+        worker.clear_caches()
 
     # ----------------------------------------------------------
     # 场景一：测试 recognize_intent (依赖 API)
@@ -53,6 +63,25 @@ class TestWorker(unittest.TestCase):
         # 验证是否真的调用了 API (验证交互)
         mock_generation.assert_called_once()
 
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.worker.os.getenv")
+    @patch("src.qwen.worker.Generation.call")
+    def test_recognize_intent_with_context(self, mock_generation, mock_getenv, mock_log):
+        """
+        传入对话上下文时，上下文要拼接进系统提示词
+        """
+        mock_getenv.return_value = self.fake_api_key
+        mock_response = MagicMock()
+        mock_response.output.choices[0].message.content = "ORDER"
+        mock_generation.return_value = mock_response
+
+        context = "最近对话：\n用户：我上周买了耳机"
+        result = worker.recognize_intent("到哪了", {"REFUND": "退款业务", "ORDER": "查询订单"}, context=context)
+
+        self.assertEqual(result, "ORDER")
+        system_prompt = mock_generation.call_args.kwargs["messages"][0]["content"]
+        self.assertIn("我上周买了耳机", system_prompt)
+
     # ----------------------------------------------------------
     # 场景二：测试 pharse_phone_number (提取手机号)
     # ----------------------------------------------------------
@@ -177,6 +206,74 @@ class TestWorker(unittest.TestCase):
         
         print("\n[通过] 产品推荐测试：文件读取正常，Prompt拼接正确，API调用模拟成功。")
 
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.worker.os.getenv")
+    @patch("src.qwen.worker.Generation.call")
+    @patch("src.qwen.worker.config_digest")
+    @patch("src.qwen.worker.os.path.exists")
+    @patch("builtins.open", new_callable=unittest.mock.mock_open,
+           read_data='[{"产品类型": "手机", "热度": 100, "品牌": "小米", "名字": "小米14", "描述": "旗舰性能", "功能": "拍照强"}]')
+    def test_product_recommendation_cache(self, mock_file, mock_exists, mock_digest, mock_api, mock_getenv, mock_log):
+        """
+        测试推荐缓存：归一化后相同的偏好命中缓存；产品库摘要变化后缓存失效
+        """
+        mock_getenv.return_value = "sk-test-key-123"
+        mock_exists.return_value = True
+        mock_digest.return_value = "catalog-v1"
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.output.choices[0].message.content = "推荐您购买：小米14"
+        mock_api.return_value = mock_response
+
+        first = worker.product_recommendation("推荐手机")
+        second = worker.product_recommendation(" 推荐 手机！")
+        self.assertEqual(first, second)
+        self.assertEqual(mock_api.call_count, 1, "相同偏好的第二次推荐应命中缓存")
+
+        # 产品库内容变化（摘要变化）后，必须重新调用大模型
+        mock_digest.return_value = "catalog-v2"
+        worker.product_recommendation("推荐手机")
+        self.assertEqual(mock_api.call_count, 2)
+
+        # 带对话上下文的推荐提示词因会话而异，不进入共享缓存，也不读取共享缓存
+        worker.product_recommendation("推荐手机", context="用户：我常出差")
+        worker.product_recommendation("推荐手机", context="用户：我常出差")
+        self.assertEqual(mock_api.call_count, 4)
+        worker.product_recommendation("推荐手机")
+        self.assertEqual(mock_api.call_count, 4)
+
+    @patch("src.qwen.receiver.log")
+    @patch("src.qwen.worker.log")
+    @patch("src.qwen.worker.os.getenv", return_value="sk-test-key-123")
+    @patch("src.qwen.worker.Generation.call")
+    @patch("src.qwen.worker._load_catalog", return_value=([
+        {"产品类型": "手机", "热度": 100, "品牌": "小米", "名字": "小米14", "描述": "旗舰性能", "功能": "拍照强"}],
+        "catalog-v1"))
+    def test_recommendation_shared_between_sessions(self, mock_catalog, mock_api, mock_getenv, mock_log,
+                                                    mock_receiver_log):
+        """
+        不同会话（对话历史不同）提出相同的偏好时，共用推荐缓存
+        """
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.output.choices[0].message.content = "推荐您购买：小米14"
+        mock_api.return_value = mock_response
+        metrics.reset()
+        replies = []
+        for history in ("你好", "我的订单到哪了"):
+            sink = MemorySink()
+            receiver = Receiver(store=InMemorySessionStore(), admission=AdmissionController(), sink=sink)
+            receiver.memory.add("user", history)
+            receiver.preferences = "适合拍照的手机"
+            receiver.memory.add("user", receiver.preferences)
+            receiver._product_recommendation()
+            receiver.flush_response()
+            replies.append(sink.text())
+        self.assertEqual(mock_api.call_count, 1, "第二个会话命中第一个会话的推荐缓存")
+        self.assertEqual(metrics.get("recommendation_cache.hits"), 1)
+        self.assertEqual(replies[0], replies[1])
+        metrics.reset()
+
     # ----------------------------------------------------------
     # 场景六：测试 get_order_info (测试异常逻辑)
     # ----------------------------------------------------------